@@ -0,0 +1,59 @@
+"""Compares per-mapping and batched filename decryption.
+
+Run from the repo root: python -m benchmarks.bench_filename_decrypt [count]
+"""
+
+import base64
+import os
+import random
+import sys
+import time
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+from smd.manifest.crypto import decrypt_filename, decrypt_filenames
+
+DEFAULT_COUNT = 250_000
+
+
+def make_names(count: int, key: bytes) -> list[str]:
+    """Encrypts filenames the same way Steam does (ECB encrypted IV + CBC)"""
+    rng = random.Random(0)
+    ecb = AES.new(key, AES.MODE_ECB)  # type: ignore
+    names: list[str] = []
+    for i in range(count):
+        depth = rng.randint(0, 6)
+        name = "/".join(f"folder_{rng.randint(0, 999)}" for _ in range(depth))
+        name += f"/file_{i}.{rng.choice(['pak', 'dll', 'ogg', 'png'])}"
+        iv = os.urandom(16)
+        ciphertext = AES.new(key, AES.MODE_CBC, iv).encrypt(  # type: ignore
+            pad(name.encode(), AES.block_size)
+        )
+        names.append(base64.b64encode(ecb.encrypt(iv) + ciphertext).decode())
+    return names
+
+
+def bench(label: str, func, count: int) -> list[str]:
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s {count / elapsed:12,.0f} mappings/sec")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    key = os.urandom(32)
+    print(f"Generating {count:,} encrypted filenames...")
+    names = make_names(count, key)
+
+    single = bench(
+        "per-item", lambda: [decrypt_filename(x, key) for x in names], count
+    )
+    batched = bench("batched", lambda: decrypt_filenames(names, key), count)
+    assert single == batched, "Batched output differs from per-item output"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Wall time and peak RSS of decrypt_and_save_manifest, comparing the old
+CopyFrom-per-mapping rewrite with the in-place one.
+
+Run from the repo root: python -m benchmarks.bench_manifest_decrypt [mappings]
+Each mode runs in its own process so peak RSS isn't shared between them.
+"""
+
+import contextlib
+import io
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from steam.protobufs.content_manifest_pb2 import (
+    ContentManifestMetadata,
+    ContentManifestPayload,
+)
+
+from benchmarks.bench_filename_decrypt import make_names
+from smd.manifest import crypto
+from smd.manifest.reader import (
+    PROTOBUF_METADATA_MAGIC,
+    PROTOBUF_PAYLOAD_MAGIC,
+    PROTOBUF_SIGNATURE_MAGIC,
+)
+
+DEFAULT_COUNT = 100_000
+MODES = ("copy", "inplace")
+
+
+def _decrypt_payload_copy(payload_bytes: bytes, key_bytes: bytes) -> bytes:
+    """How the payload used to be rewritten, kept here for comparison"""
+    original_payload = ContentManifestPayload()
+    original_payload.ParseFromString(payload_bytes)  # type: ignore
+    mappings = original_payload.mappings
+    filenames = crypto.decrypt_filenames([x.filename for x in mappings], key_bytes)
+    new_mappings: list[ContentManifestPayload.FileMapping] = []
+    for i, mapping in enumerate(mappings):
+        new_mapping = ContentManifestPayload.FileMapping()
+        new_mapping.CopyFrom(mapping)
+        new_mapping.filename = filenames[i]
+        new_mappings.append(new_mapping)
+    fixed_payload = ContentManifestPayload()
+    fixed_payload.mappings.extend(new_mappings)
+    return fixed_payload.SerializeToString()
+
+
+def make_manifest(count: int, key: bytes) -> bytes:
+    rng = random.Random(0)
+    payload = ContentManifestPayload()
+    for name in make_names(count, key):
+        mapping = payload.mappings.add()
+        mapping.filename = name
+        mapping.size = rng.randint(0, 1 << 30)
+        mapping.sha_filename = rng.randbytes(20)
+        mapping.sha_content = rng.randbytes(20)
+        for nth in range(rng.randint(1, 8)):
+            chunk = mapping.chunks.add()
+            chunk.sha = rng.randbytes(20)
+            chunk.crc = rng.getrandbits(32)
+            chunk.offset = nth << 20
+            chunk.cb_original = 1 << 20
+            chunk.cb_compressed = rng.randint(1, 1 << 20)
+    payload_bytes = payload.SerializeToString()
+    metadata = ContentManifestMetadata(filenames_encrypted=True)
+    metadata_bytes = metadata.SerializeToString()
+    return b"".join(
+        [
+            struct.pack("<II", PROTOBUF_PAYLOAD_MAGIC, len(payload_bytes)),
+            payload_bytes,
+            struct.pack("<II", PROTOBUF_METADATA_MAGIC, len(metadata_bytes)),
+            metadata_bytes,
+            struct.pack("<II", PROTOBUF_SIGNATURE_MAGIC, 0),
+        ]
+    )
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB everywhere else
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode: str, manifest: Path, key: bytes):
+    if mode == "copy":
+        crypto._decrypt_payload = _decrypt_payload_copy  # type: ignore
+    out = manifest.with_suffix(f".{mode}")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        crypto.decrypt_and_save_manifest(
+            manifest, out, key.hex(), parallel_threshold=0
+        )
+    elapsed = time.perf_counter() - start
+    rss = peak_rss_mb()
+    rss_text = f"{rss:9.1f} MB" if rss is not None else "      n/a"
+    print(f"{mode:<8} {elapsed:8.3f}s  peak RSS {rss_text}")
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "--run":
+        run_mode(sys.argv[2], Path(sys.argv[3]), bytes.fromhex(sys.argv[4]))
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    key = os.urandom(32)
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = Path(tmp) / "bench.manifest"
+        print(f"Generating a manifest with {count:,} mappings...")
+        manifest.write_bytes(make_manifest(count, key))
+        print(f"Manifest size: {manifest.stat().st_size / (1 << 20):.1f} MB")
+        for mode in MODES:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_manifest_decrypt",
+                    "--run",
+                    mode,
+                    str(manifest),
+                    key.hex(),
+                ],
+                check=True,
+            )
+        outputs = [manifest.with_suffix(f".{mode}").read_bytes() for mode in MODES]
+        assert all(x == outputs[0] for x in outputs), "Outputs differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compares the vdf package with smd.storage.vdf_text on a synthetic config.vdf
+and a folder's worth of .acf files.
+
+Run from the repo root: python -m benchmarks.bench_vdf [count]
+"""
+
+import io
+import random
+import sys
+import time
+
+import vdf  # type: ignore
+
+from smd.storage import vdf_text
+
+DEFAULT_COUNT = 2_000
+"How many .acf files"
+CONFIG_SIZE = 5_000_000
+
+
+def make_config(size: int) -> str:
+    """config.vdf with enough depot keys to be about `size` bytes"""
+    rng = random.Random(0)
+    depots: dict[str, dict[str, str]] = {}
+    # Each depot is about 115 bytes once dumped
+    for _ in range(size // 115):
+        depot_id = str(rng.randint(1_000, 3_000_000))
+        depots[depot_id] = {"DecryptionKey": rng.randbytes(32).hex()}
+    config = {
+        "InstallConfigStore": {
+            "Software": {
+                "Valve": {
+                    "Steam": {
+                        "AutoUpdateWindowEnabled": "0",
+                        "depots": depots,
+                        "Accounts": {"someone": {"SteamID": "76561190000000000"}},
+                    }
+                }
+            }
+        }
+    }
+    return vdf.dumps(config, pretty=True)
+
+
+def make_acfs(count: int) -> list[str]:
+    rng = random.Random(1)
+    acfs: list[str] = []
+    for i in range(count):
+        depots = {
+            str(i * 10 + x): {
+                "manifest": str(rng.getrandbits(63)),
+                "size": str(rng.getrandbits(34)),
+            }
+            for x in range(1, rng.randint(2, 6))
+        }
+        acf = {
+            "AppState": {
+                "appid": str(i),
+                "universe": "1",
+                "name": f"Game {i}",
+                "StateFlags": "4",
+                "installdir": f"Game {i}",
+                "SizeOnDisk": str(rng.getrandbits(34)),
+                "InstalledDepots": depots,
+                "UserConfig": {"language": "english"},
+                "MountedConfig": {"language": "english"},
+            }
+        }
+        acfs.append(vdf.dumps(acf, pretty=True))
+    return acfs
+
+
+def bench(label: str, func, count: int):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {elapsed:8.3f}s {count / elapsed:12,.0f} files/sec")
+    return result
+
+
+def dump_to_buffer(dump, obj) -> str:
+    buffer = io.StringIO()
+    dump(obj, buffer)
+    return buffer.getvalue()
+
+
+def get_accounts(config: dict) -> dict:
+    return config["InstallConfigStore"]["Software"]["Valve"]["Steam"]["Accounts"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    print(
+        f"Generating a {CONFIG_SIZE / 1e6:.0f} MB config.vdf "
+        f"and {count:,} .acf files..."
+    )
+    config = make_config(CONFIG_SIZE)
+    acfs = make_acfs(count)
+
+    print(f"\nconfig.vdf ({len(config) / 1e6:.1f} MB)")
+    old = bench("vdf load", lambda: vdf.loads(config, mapper=vdf.VDFDict), 1)
+    new = bench(
+        "vdf_text load", lambda: vdf_text.loads(config, mapper=vdf.VDFDict), 1
+    )
+    assert old == new, "Parsed config.vdf differs"
+    old_text = bench(
+        "vdf dump",
+        lambda: dump_to_buffer(lambda obj, f: vdf.dump(obj, f, pretty=True), old),
+        1,
+    )
+    new_text = bench("vdf_text dump", lambda: dump_to_buffer(vdf_text.dump, new), 1)
+    assert old_text == new_text, "Dumped config.vdf differs"
+    accounts = bench(
+        "vdf_text lazy load + Accounts",
+        lambda: get_accounts(vdf_text.loads(config, lazy=True)),
+        1,
+    )
+    assert accounts == get_accounts(vdf.loads(config)), "Lazy load differs"
+
+    print(f"\n.acf files ({count:,})")
+    old_acfs = bench("vdf load", lambda: [vdf.loads(x) for x in acfs], count)
+    new_acfs = bench(
+        "vdf_text load", lambda: [vdf_text.loads(x) for x in acfs], count
+    )
+    assert old_acfs == new_acfs, "Parsed .acf files differ"
+
+
+if __name__ == "__main__":
+    main()
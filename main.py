@@ -1,5 +1,6 @@
 import argparse
 import logging
+import multiprocessing
 import os
 import sys
 import time
@@ -79,6 +80,8 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
             f"You have provided: {Fore.YELLOW + str(path.resolve()) + Style.RESET_ALL}"
         )
         return ui.process_lua_full(path)
+    elif args.batch and first_launch:
+        return ui.process_lua_batch([Path(x) for x in args.batch])
     else:
         menu_choice: MainMenu = prompt_select(
             "Choose:", [(x.value.title, x) for x in MainMenu], exclude=exclude
@@ -92,6 +95,7 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     test_funcs = [x for x in dir(prereqs) if x.startswith("test_")]
     for func_name in test_funcs:
         try:
@@ -108,6 +112,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "-f", "--file", help="A .lua file or ZIP file you want to process"
     )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        nargs="+",
+        metavar="PATH",
+        help="Process several .lua/ZIP files (or folders of them) without prompts",
+    )
     args = parser.parse_args()
     logger.debug(f"Received args: {args}")
     color_init()
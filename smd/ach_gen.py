@@ -1,13 +1,114 @@
+import asyncio
+import hashlib
 import json
+import logging
+import os
+import re
+import uuid
 from pathlib import Path
 from typing import Any
+from urllib.parse import urlparse
 
 import httpx
+from tqdm import tqdm  # type: ignore
 
+from smd.http_clients import get_async_client, get_client, run_async
 from smd.prompts import prompt_text
 from smd.storage.settings import get_or_compute_setting
 from smd.ui.settings.types import Settings
 
+logger = logging.getLogger(__name__)
+
+ICON_CONCURRENCY = 16
+"Max number of achievement icons downloading at once"
+_SHA1_NAME = re.compile(r"[0-9a-f]{40}")
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()  # noqa: S324
+
+
+def _index_images(img_dir: Path) -> dict[str, str]:
+    """Steam names icons after the SHA1 of their contents, so the names of the
+    files in `img_dir` say what's in them without reading anything.
+    Maps those hashes to the filenames"""
+    index: dict[str, str] = {}
+    for file in img_dir.iterdir():
+        stem = file.stem.lower()
+        if _SHA1_NAME.fullmatch(stem) and file.is_file():
+            index.setdefault(stem, file.name)
+    return index
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+async def fetch_icons(
+    urls: list[str], img_dir: Path, concurrency: int = ICON_CONCURRENCY
+) -> dict[str, str]:
+    """Downloads achievement icons into `img_dir`, skipping ones whose content
+    is already there. SHA1 named icons are matched by the hash in their name,
+    anything else by filename. An icon whose name is taken by a different
+    image gets saved under its hash instead.
+
+    Returns:
+        dict[str, str]: URLs mapped to their path relative to `img_dir`'s
+            parent, or the URL itself if it couldn't be downloaded
+    """
+    index = _index_images(img_dir)
+    existing = {x.name for x in img_dir.iterdir()}
+    taken = set(existing)
+    semaphore = asyncio.Semaphore(concurrency)
+    unique_urls = list(dict.fromkeys(x for x in urls if x))
+
+    async def fetch(url: str, pbar: tqdm) -> tuple[str, str]:
+        try:
+            return url, await fetch_one(url)
+        except (httpx.HTTPError, OSError) as e:
+            print(f"Failed to download asset {url}: {e!r}")
+            return url, url
+        finally:
+            pbar.update(1)
+
+    async def fetch_one(url: str) -> str:
+        filename = Path(urlparse(url).path).name
+        if not filename:
+            return url
+        stem = Path(filename).stem.lower()
+        if stem in index:
+            return f"img/{index[stem]}"
+        if not _SHA1_NAME.fullmatch(stem) and filename in existing:
+            return f"img/{filename}"
+
+        async with semaphore:
+            response = await get_async_client(url).get(url, follow_redirects=True)
+        if response.status_code != 200:
+            print(f"Failed to download asset {url}: HTTP {response.status_code}")
+            return url
+
+        digest = _sha1(response.content)
+        if digest in index:
+            return f"img/{index[digest]}"
+        name = filename
+        if name in taken:
+            name = f"{digest}{Path(filename).suffix}"
+        # Claimed before writing, so other downloads see it straight away
+        index[digest] = name
+        taken.add(name)
+        await asyncio.to_thread(_write_atomic, img_dir / name, response.content)
+        return f"img/{name}"
+
+    logger.debug(f"Fetching {len(unique_urls)} icons, {len(index)} already in img")
+    with tqdm(desc="Downloading icons", total=len(unique_urls), unit="img") as pbar:
+        results = await asyncio.gather(*(fetch(x, pbar) for x in unique_urls))
+    return {"": "", **dict(results)}
+
 
 def gen_achievements(app_id: str, steam_settings_dir: Path):
     """Experimental method of generating achievement data for gbe_fork.
@@ -27,74 +128,60 @@ def gen_achievements(app_id: str, steam_settings_dir: Path):
     img_dir = steam_settings_dir / "img"
     img_dir.mkdir(parents=True, exist_ok=True)
 
-    def download_image(client: httpx.Client, url: str):
-        """DLs achievement image"""
-        if not url:
-            return ""
-
-        filename = Path(url).name
-        if not filename:
-            return url
-
-        filepath = img_dir / filename
-        relative_path = f"img/{filename}"
-
-        if filepath.exists():
-            return relative_path
-
-        try:
-            with client.stream("GET", url) as response:
-                if response.status_code == 200:
-                    with open(filepath, "wb") as f:
-                        for chunk in response.iter_bytes(chunk_size=1024):  # noqa: FURB122
-                            f.write(chunk)
-                    return relative_path
-        except Exception as e:
-            print(f"Failed to download asset {url}: {e}")
-        return url
-
     print(f"Fetching public schema database for AppID {app_id}...")
-    schema_url = "https://api.steampowered.com/ISteamUserStats/GetSchemaForGame/"
-    f"v0002/?key={api_key}&appid={app_id}&l={lang}&format=json"
+    schema_url = (
+        "https://api.steampowered.com/ISteamUserStats/GetSchemaForGame/"
+        f"v0002/?key={api_key}&appid={app_id}&l={lang}&format=json"
+    )
+
+    try:
+        response = get_client(schema_url).get(schema_url).json()
+        achievements_schema = (
+            response.get("game", {})
+            .get("availableGameStats", {})
+            .get("achievements", [])
+        )
+    except Exception as e:
+        print(f"Error fetching data from Steam: {e}")
+        return
 
-    with httpx.Client() as client:
-        try:
-            response = client.get(schema_url).json()
-            achievements_schema = (
-                response.get("game", {})
-                .get("availableGameStats", {})
-                .get("achievements", [])
-            )
-        except Exception as e:
-            print(f"Error fetching data from Steam: {e}")
-            return
-
-        if not achievements_schema:
-            print(
-                "No achievements found for this game, or the AppID/API Key is invalid."
-            )
-            return
-
-        final_schema_list: list[dict[str, Any]] = []
+    if not achievements_schema:
         print(
-            f"Found {len(achievements_schema)} achievements. "
-            "Processing SHA1 asset hashes..."
+            "No achievements found for this game, or the AppID/API Key is invalid."
+        )
+        return
+
+    final_schema_list: list[dict[str, Any]] = []
+    print(
+        f"Found {len(achievements_schema)} achievements. "
+        "Processing SHA1 asset hashes..."
+    )
+
+    icon_paths = run_async(
+        fetch_icons(
+            [
+                url
+                for ach in achievements_schema
+                for url in (ach.get("icon", ""), ach.get("icongray", ""))
+            ],
+            img_dir,
+        )
+    )
+
+    for ach in achievements_schema:
+        local_icon_path = icon_paths[ach.get("icon", "")]
+        local_icongray_path = icon_paths[ach.get("icongray", "")]
+
+        final_schema_list.append(
+            {
+                "description": ach.get("description", ""),
+                "displayName": ach.get("displayName", ach.get("name", "")),
+                "hidden": 1 if ach.get("hidden") == 1 else 0,
+                "icon": local_icon_path,
+                "icongray": local_icongray_path,
+                "name": ach.get("name", ""),
+            }
         )
-
-        for ach in achievements_schema:
-            local_icon_path = download_image(client, ach.get("icon", ""))
-            local_icongray_path = download_image(client, ach.get("icongray", ""))
-
-            final_schema_list.append(
-                {
-                    "description": ach.get("description", ""),
-                    "displayName": ach.get("displayName", ach.get("name", "")),
-                    "hidden": 1 if ach.get("hidden") == 1 else 0,
-                    "icon": local_icon_path,
-                    "icongray": local_icongray_path,
-                    "name": ach.get("name", ""),
-                }
-            )
 
     json_path = steam_settings_dir / "achievements.json"
     with open(json_path, "w", encoding="utf-8") as f:
@@ -1,21 +1,25 @@
 """For managing Greenluma's AppList folder"""
 
 import logging
-from collections import defaultdict
+from collections.abc import Iterable
 from pathlib import Path
 
 from colorama import Fore, Style
 from rich.console import Console
 from rich.table import Column, Table
 
+from smd.app_injector.applist_index import AppListIndex, AppListPlan
 from smd.app_injector.base import AppInjectionManager
 from smd.lua.writer import ConfigVDFWriter
 from smd.manifest.downloader import ManifestDownloader
-from smd.prompts import prompt_confirm, prompt_dir, prompt_select
+from smd.prompts import prompt_confirm, prompt_dir, prompt_select, prompt_text
 from smd.steam_client import ParsedDLC, SteamInfoProvider, get_product_info
+from smd.storage.applist_profiles import AppListProfiles
 from smd.storage.settings import get_setting, set_setting
 from smd.structs import (
+    AppListChoice,
     AppListPathAndID,
+    AppListProfileChoice,
     DLCTypes,
     LuaParsedInfo,
 )
@@ -26,10 +30,13 @@ logger = logging.getLogger(__name__)
 
 
 class AppListManager(AppInjectionManager):
+    menu_exclude: list[AppListChoice] = []
+
     def __init__(self, steam_path: Path, provider: SteamInfoProvider):
         super().__init__(provider)
         self.max_id_limit = 134
         self.steam_path = steam_path
+        self.profiles = AppListProfiles()
 
         saved_applist = get_setting(Settings.APPLIST_FOLDER)
         self.applist_folder = (
@@ -61,46 +68,48 @@ class AppListManager(AppInjectionManager):
                 + "If you are using Stealth Mode (Any folder), make sure"
                 " this points to the folder you put GreenLuma in" + Style.RESET_ALL
             )
+        self.index = AppListIndex(self.applist_folder)
         self.fix_names()
 
     def get_local_filenames(self, sort: bool = False) -> list[Path]:
         """get_local_ids but just filenames and no last_idx editing"""
-        files: list[Path] = []
-        for file in self.applist_folder.glob("*.txt"):
-            if not file.stem.isdigit():
-                logger.debug(f"[get_local_filenames] Ignored {file.name}")
-                continue
-            files.append(file)
-        if sort:
-            files.sort(key=lambda x: int(x.stem) if x.stem.isnumeric() else -1)
-        return files
+        return [x.path for x in self.index.entries(sort)]
 
     def get_local_ids(self, sort: bool = False) -> list[AppListPathAndID]:
         """Returns a list of tuple(path, app_id) and
         updates self.last_idx to the filename with the largest number"""
-        self.last_idx = -1
-        ids: list[AppListPathAndID] = []
-        for file in self.applist_folder.glob("*.txt"):
-            if not file.stem.isdigit():
-                logger.debug(f"[get_local_ids] Ignored {file.name}")
-                continue
-            file_idx = int(file.stem)
-            self.last_idx = max(self.last_idx, file_idx)
-
-            contents = file.read_text(encoding="utf-8").strip()
+        self.last_idx = self.index.last_idx
+        return self.index.entries(sort)
 
-            if contents.isnumeric():
-                appid = int(contents)
-            else:
-                raise Exception(
-                    f"{file.name} does not contain a "
-                    "number. Text files in AppList should only contain the number "
-                    "of their App ID. Please fix this and launch SMD again."
-                )
-            ids.append(AppListPathAndID(file, appid))
-        if sort:
-            ids.sort(key=lambda x: int(x.path.stem) if x.path.stem.isnumeric() else -1)
-        return ids
+    def apply_changes(
+        self,
+        add: Iterable[int] = (),
+        remove: Iterable[int] = (),
+        skip_check: bool = False,
+        track: bool = True,
+    ) -> AppListPlan:
+        """Adds and removes IDs in one go. The numbering is worked out once and
+        only the files that have to change get touched.
+        `track` also applies the changes to the active profile"""
+        plan = self.index.plan(add, remove, skip_check)
+        for old_idx, new_idx in plan.renames:
+            self.index.path(old_idx).replace(self.applist_folder / f"{new_idx}.txt")
+            self.index.record_rename(old_idx, new_idx)
+        for idx, app_id in plan.writes.items():
+            (self.applist_folder / f"{idx}.txt").write_text(str(app_id))
+            self.index.record_write(idx, app_id)
+        for idx in plan.deletes:
+            self.index.path(idx).unlink(missing_ok=True)
+            self.index.record_delete(idx)
+        self.last_idx = self.index.last_idx
+        logger.debug(
+            f"AppList: {len(plan.renames)} renamed, {len(plan.writes)} written, "
+            f"{len(plan.deletes)} deleted"
+        )
+        if track and self.profiles.active and (plan.added or plan.removed):
+            self.profiles.track(plan.added, plan.removed)
+            self.profiles.save()
+        return plan
 
     def add_ids(
         self, data: int | list[int] | LuaParsedInfo, skip_check: bool = False
@@ -113,72 +122,122 @@ class AppListManager(AppInjectionManager):
         else:
             app_ids = data
 
-        local_ids = [] if skip_check else [x.app_id for x in self.get_local_ids()]
-        for app_id in app_ids:
-            if app_id in local_ids:
-                print(f"{app_id} already in AppList")
-                continue
-            new_idx = self.last_idx + 1
-            with (self.applist_folder / f"{new_idx}.txt").open("w") as f:
-                f.write(str(app_id))
-            self.last_idx = new_idx
-            id_count = new_idx + 1
+        plan = self.apply_changes(add=app_ids, skip_check=skip_check)
+        for app_id in plan.already_in:
+            print(f"{app_id} already in AppList")
+        for app_id in plan.added:
+            print(f"{app_id} added to AppList.")
+        if not plan.added:
+            return
+        print(f"There are now {plan.count} IDs stored.")
+        if plan.count > self.max_id_limit:
             print(
-                f"{app_id} added to AppList. " f"There are now {id_count} IDs stored."
+                Fore.RED + f"WARNING: You've hit the {self.max_id_limit} ID limit "
+                "for Greenluma. "
+                "Save the AppList as a profile, split it and switch between "
+                "the parts (AppList menu > Profiles)." + Style.RESET_ALL
             )
-            if id_count > self.max_id_limit:
-                print(
-                    Fore.RED + f"WARNING: You've hit the {self.max_id_limit} ID limit "
-                    "for Greenluma. "
-                    "I haven't implemented anything to deal with this yet."
-                    + Style.RESET_ALL
-                )
-
-    def remove_ids(self, ids_to_delete: list[int]):
-        """became unused and replaced with delete_paths"""
-        local_ids = self.get_local_ids(sort=True)
-        remaining_ids = [*local_ids]
-        for local_id in local_ids:
-            if local_id.app_id in ids_to_delete:
-                local_id.path.unlink(missing_ok=True)
-                remaining_ids.remove(local_id)
-                print(f"{local_id.path.name} deleted")
-        for new_idx, remaining_id in enumerate(remaining_ids):
-            new_name = remaining_id.path.parent / f"{new_idx}.txt"
-            if remaining_id.path.name != new_name.name:
-                remaining_id.path.rename(new_name)
 
-    def delete_paths(self, paths_to_delete: list[Path], all_paths: list[Path]):
-        """Deletes all paths_to_delete and renames remaining files.
-        Assumes all_paths is already sorted in ascending order"""
-        remaining_paths = [*all_paths]
-        for path in paths_to_delete:
-            path.unlink(missing_ok=True)
-            remaining_paths.remove(path)
-            print(f"{path.name} deleted")
-        for new_idx, path in enumerate(remaining_paths):
-            new_name = path.parent / f"{new_idx}.txt"
-            if path.name != new_name.name:
-                path.rename(new_name)
+    def remove_ids(self, ids_to_delete: Iterable[int]):
+        """Deletes every file that has one of the IDs, then fills the gaps"""
+        plan = self.apply_changes(remove=ids_to_delete)
+        for app_id in plan.removed:
+            print(f"{app_id} removed from AppList")
 
     def fix_names(self):
         """Fixes filenames if they're wrong (e.g. 0.txt is missing, gap in numbering)"""
-        ids = self.get_local_filenames(sort=True)
-        for new_idx, old_path in enumerate(ids):
-            new_name = old_path.parent / f"{new_idx}.txt"
-            if new_name.name != old_path.name:
-                old_path.rename(new_name)
+        self.apply_changes()
 
-    def _get_paths_from_ids(
-        self, app_ids: set[int], path_and_ids: list[AppListPathAndID]
-    ):
-        """Converts IDs to Paths"""
-        file_map: defaultdict[int, list[Path]] = defaultdict(list)
-        # app id mapped to files that have that ID
-        for x in path_and_ids:
-            file_map[x.app_id].append(x.path)
-        paths: list[Path] = [path for app_id in app_ids for path in file_map[app_id]]
-        return paths
+    def activate_profile(self, name: str) -> AppListPlan | None:
+        """Makes the AppList folder have exactly the profile's IDs, only
+        touching the files that differ. None if it has too many IDs"""
+        ids = self.profiles.get(name)
+        if len(ids) > self.max_id_limit:
+            print(
+                Fore.RED + f"{name} has {len(ids)} IDs, more than the "
+                f"{self.max_id_limit} GreenLuma can handle. Split it into "
+                "smaller profiles first (Profiles > Split)." + Style.RESET_ALL
+            )
+            return None
+        plan = self.apply_changes(
+            add=ids, remove=self.index.app_ids() - ids, track=False
+        )
+        self.profiles.active = name
+        self.profiles.save()
+        return plan
+
+    def split_profile(self, name: str) -> list[str]:
+        """Splits a profile into ones GreenLuma can handle.
+        Returns the new names, or just `name` if it already fits"""
+        names = self.profiles.split(name, self.max_id_limit)
+        self.profiles.save()
+        return names
+
+    def _select_profile(self, msg: str) -> str | None:
+        if not self.profiles.names():
+            print("There are no profiles yet. Save the current AppList as one first.")
+            return None
+        return prompt_select(
+            msg,
+            [
+                (
+                    f"{name} ({len(self.profiles.get(name))} IDs)"
+                    + (" [Active]" if name == self.profiles.active else ""),
+                    name,
+                )
+                for name in self.profiles.names()
+            ],
+            cancellable=True,
+        )
+
+    def prompt_profiles(self):
+        """Save, switch to, or delete AppList profiles"""
+        choice: AppListProfileChoice | None = prompt_select(
+            "Choose:", list(AppListProfileChoice), cancellable=True
+        )
+        if choice is None:
+            return
+        if choice == AppListProfileChoice.SAVE:
+            name: str = prompt_text(
+                "Name of the profile:",
+                validator=lambda x: bool(x.strip()),
+                invalid_msg="The name can't be blank",
+            ).strip()
+            if name in self.profiles and not prompt_confirm(
+                f"{name} already exists. Overwrite it?", default=False
+            ):
+                return
+            self.profiles.set(name, self.index.app_ids())
+            self.profiles.active = name
+            self.profiles.save()
+            print(f"Saved {len(self.profiles.get(name))} IDs as {name}.")
+        elif choice == AppListProfileChoice.ACTIVATE:
+            if (name := self._select_profile("Switch to:")) is None:
+                return
+            plan = self.activate_profile(name)
+            if plan is not None:
+                print(
+                    Fore.GREEN + f"Switched to {name}. {len(plan.added)} added, "
+                    f"{len(plan.removed)} removed, {plan.count} IDs in total."
+                    + Style.RESET_ALL
+                )
+        elif choice == AppListProfileChoice.SPLIT:
+            if (name := self._select_profile("Split:")) is None:
+                return
+            names = self.split_profile(name)
+            if names == [name]:
+                print(f"{name} already fits in the {self.max_id_limit} ID limit.")
+                return
+            print(
+                Fore.GREEN + f"Split {name} into {', '.join(names)}. "
+                "Switch to one of them to use it." + Style.RESET_ALL
+            )
+        elif choice == AppListProfileChoice.DELETE:
+            if (name := self._select_profile("Delete:")) is None:
+                return
+            self.profiles.delete(name)
+            self.profiles.save()
+            print(f"Deleted {name}. The AppList folder wasn't changed.")
 
     def prompt_id_deletion(self):
         """Show all AppList IDs and let the user delete them"""
@@ -218,12 +277,11 @@ class AppListManager(AppInjectionManager):
         ids_to_delete = set(ids_to_delete_list)
         self._prompt_include_depots(ids_to_delete, organized)
 
-        paths_to_delete = self._get_paths_from_ids(ids_to_delete, path_and_ids)
-        all_paths = [x.path for x in path_and_ids]
-        self.delete_paths(paths_to_delete, all_paths)
+        self.remove_ids(ids_to_delete)
 
     def dlc_check(self, provider: SteamInfoProvider, base_id: int):
         print("Checking for DLC...")
+        provider.refresh_changed()
         base_info = get_product_info(provider, [base_id])
         base_info_trimmed = enter_path(base_info, "apps", base_id)
         dlcs = enter_path(base_info_trimmed, "extended", "listofdlc")
@@ -238,7 +296,7 @@ class AppListManager(AppInjectionManager):
             manifest = ManifestDownloader(self.provider, self.steam_path)
             if dlc_info and (apps := dlc_info.get("apps")):
                     unowned_non_depot_dlcs: list[int] = []
-                    local_ids = [x.app_id for x in self.get_local_ids()]
+                    local_ids = list(self.index.app_ids())
                     parsed_dlcs: list[ParsedDLC] = [
                         ParsedDLC(int(depot_id), data, base_info_trimmed, local_ids)
                         for depot_id, data in apps.items()
@@ -0,0 +1,209 @@
+"""In-memory copy of what's in the AppList folder"""
+
+import logging
+import os
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from smd.structs import AppListPathAndID
+
+logger = logging.getLogger(__name__)
+
+
+class AppListPlan(NamedTuple):
+    """File operations that take the AppList folder to its new state.
+    Targets of renames and writes are always empty or hold a removed ID, and
+    sources are always past the new end, so the order doesn't matter"""
+
+    renames: list[tuple[int, int]]
+    "(from, to) file numbers. Can be the same number if the name is off (01.txt)"
+    writes: dict[int, int]
+    "File number mapped to the app ID that gets written to it"
+    deletes: list[int]
+    "File numbers past the new end that held a removed ID"
+    added: list[int]
+    already_in: list[int]
+    removed: list[int]
+    "App IDs that were actually in there"
+    count: int
+    "How many files there'll be after"
+
+
+class AppListIndex:
+    """AppList file numbers (0.txt, 1.txt...) mapped to the app IDs inside them,
+    and the other way around. The folder only gets read once, after that the
+    `record_*` methods keep it in sync with what SMD writes. If something else
+    adds, removes or renames files (the folder's mtime or size changes), it gets
+    read again on the next lookup. Editing a file in place doesn't change the
+    folder, so that isn't noticed."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._entries: dict[int, AppListPathAndID] = {}
+        self._indexes: defaultdict[int, set[int]] = defaultdict(set)
+        "App ID mapped to the file numbers that have it"
+        self._last_idx = -1
+        self._stamp: tuple[int, int] | None = None
+
+    def _stat(self) -> tuple[int, int]:
+        stat = self.folder.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self):
+        self._entries.clear()
+        self._indexes.clear()
+        self._stamp = self._stat()
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() != ".txt" or not stem.isdigit() or not entry.is_file():
+                    logger.debug(f"[AppListIndex] Ignored {entry.name}")
+                    continue
+                path = Path(entry.path)
+                contents = path.read_text(encoding="utf-8").strip()
+                if not contents.isnumeric():
+                    raise Exception(
+                        f"{entry.name} does not contain a "
+                        "number. Text files in AppList should only contain the number "
+                        "of their App ID. Please fix this and launch SMD again."
+                    )
+                idx = int(stem)
+                if idx in self._entries:
+                    logger.warning(
+                        f"{entry.name} has the same number as "
+                        f"{self._entries[idx].path.name}, ignoring it"
+                    )
+                    continue
+                self._add(idx, AppListPathAndID(path, int(contents)))
+        self._last_idx = max(self._entries, default=-1)
+        logger.debug(f"Indexed {len(self._entries)} AppList files")
+
+    def refresh(self):
+        """Reads the folder again if something else changed it"""
+        if self._stamp is None or self._stat() != self._stamp:
+            self._build()
+
+    def _add(self, idx: int, entry: AppListPathAndID):
+        self._entries[idx] = entry
+        self._indexes[entry.app_id].add(idx)
+
+    def _remove(self, idx: int) -> AppListPathAndID:
+        entry = self._entries.pop(idx)
+        indexes = self._indexes[entry.app_id]
+        indexes.discard(idx)
+        if not indexes:
+            del self._indexes[entry.app_id]
+        return entry
+
+    def _changed(self):
+        """Call after SMD changes the folder itself, so it isn't read again"""
+        self._stamp = self._stat()
+
+    def __len__(self):
+        self.refresh()
+        return len(self._entries)
+
+    def __contains__(self, app_id: int):
+        self.refresh()
+        return app_id in self._indexes
+
+    @property
+    def last_idx(self) -> int:
+        """Biggest file number, -1 if there are none"""
+        self.refresh()
+        return self._last_idx
+
+    def entries(self, sort: bool = False) -> list[AppListPathAndID]:
+        self.refresh()
+        if sort:
+            return [self._entries[x] for x in sorted(self._entries)]
+        return list(self._entries.values())
+
+    def app_ids(self) -> set[int]:
+        self.refresh()
+        return set(self._indexes)
+
+    def paths_of(self, app_ids: set[int]) -> list[Path]:
+        """Files that have any of `app_ids`"""
+        self.refresh()
+        return [
+            self._entries[idx].path
+            for app_id in app_ids
+            for idx in sorted(self._indexes.get(app_id, ()))
+        ]
+
+    def path(self, idx: int) -> Path:
+        """Actual path of a file number, which might not be exactly `idx`.txt"""
+        self.refresh()
+        return self._entries[idx].path
+
+    def plan(
+        self, add: Iterable[int], remove: Iterable[int], skip_check: bool = False
+    ) -> AppListPlan:
+        """Works out the least file operations that add and remove IDs while
+        keeping the numbering dense. Files in the way get moved into the gaps
+        instead of everything shifting down. `skip_check` adds IDs even if
+        they're already in"""
+        self.refresh()
+        remove = set(remove)
+        removed = [x for x in remove if x in self._indexes]
+        removed_idxs = {idx for app_id in removed for idx in self._indexes[app_id]}
+        kept = sorted(self._entries.keys() - removed_idxs)
+        present = {self._entries[x].app_id for x in kept}
+        added: list[int] = []
+        already_in: list[int] = []
+        for app_id in add:
+            if not skip_check and app_id in present:
+                already_in.append(app_id)
+                continue
+            present.add(app_id)
+            added.append(app_id)
+
+        count = len(kept) + len(added)
+        kept_set = set(kept)
+        gaps = [x for x in range(count) if x not in kept_set]
+        moving = [x for x in kept if x >= count]
+        renames = list(zip(moving, gaps))
+        renames.extend(
+            (x, x)
+            for x in kept
+            if x < count and self._entries[x].path.name != f"{x}.txt"
+        )
+        return AppListPlan(
+            renames=renames,
+            writes=dict(zip(gaps[len(moving) :], added)),
+            deletes=sorted(x for x in removed_idxs if x >= count),
+            added=added,
+            already_in=already_in,
+            removed=removed,
+            count=count,
+        )
+
+    def record_write(self, idx: int, app_id: int):
+        """`idx`.txt was written with `app_id`"""
+        if idx in self._entries:
+            self._remove(idx)
+        self._add(idx, AppListPathAndID(self.folder / f"{idx}.txt", app_id))
+        self._last_idx = max(self._last_idx, idx)
+        self._changed()
+
+    def record_delete(self, idx: int):
+        self._remove(idx)
+        if idx == self._last_idx:
+            self._last_idx = max(self._entries, default=-1)
+        self._changed()
+
+    def record_rename(self, old_idx: int, new_idx: int):
+        entry = self._remove(old_idx)
+        if new_idx in self._entries:
+            self._remove(new_idx)
+        self._add(
+            new_idx, AppListPathAndID(self.folder / f"{new_idx}.txt", entry.app_id)
+        )
+        if old_idx == self._last_idx:
+            self._last_idx = max(self._entries, default=-1)
+        else:
+            self._last_idx = max(self._last_idx, new_idx)
+        self._changed()
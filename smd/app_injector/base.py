@@ -16,6 +16,9 @@ from smd.utils import enter_path
 
 
 class AppInjectionManager(ABC):
+    menu_exclude: list[AppListChoice] = [AppListChoice.PROFILES]
+    "Choices in display_menu this manager doesn't support"
+
     def __init__(self, provider: SteamInfoProvider):
         # App ID / Depot IDs mapped to their name and type
         self.id_map: dict[int, DepotOrAppID] = {}
@@ -49,7 +52,7 @@ class AppInjectionManager(ABC):
 
     def display_menu(self) -> MainReturnCode:
         applist_choice: AppListChoice | None = prompt_select(
-            "Choose:", list(AppListChoice), cancellable=True
+            "Choose:", list(AppListChoice), cancellable=True, exclude=self.menu_exclude
         )
         if applist_choice is None:
             return MainReturnCode.LOOP_NO_PROMPT
@@ -57,9 +60,14 @@ class AppInjectionManager(ABC):
             self.prompt_id_deletion()
         elif applist_choice == AppListChoice.ADD:
             self.prompt_add_ids()
+        elif applist_choice == AppListChoice.PROFILES:
+            self.prompt_profiles()
 
         return MainReturnCode.LOOP_NO_PROMPT
 
+    def prompt_profiles(self):
+        print("Profiles aren't supported here.")
+
     def tweak_last_digit(self, app_id: int):
         chars = list(str(app_id))
         chars[-1] = "0"
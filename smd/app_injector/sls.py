@@ -2,7 +2,6 @@
 
 import logging
 from pathlib import Path
-from typing import Any
 
 from colorama import Fore, Style
 from rich.console import Console
@@ -14,7 +13,7 @@ from smd.manifest.downloader import ManifestDownloader
 from smd.prompts import prompt_confirm, prompt_file, prompt_select
 from smd.steam_client import ParsedDLC, SteamInfoProvider
 from smd.storage.settings import get_setting, set_setting
-from smd.storage.yaml import YAMLParser
+from smd.storage.sls_config import SLSConfig
 from smd.structs import DLCTypes, LuaParsedInfo
 from smd.ui.settings.types import Settings
 from smd.utils import enter_path
@@ -53,42 +52,27 @@ class SLSManager(AppInjectionManager):
             set_setting(
                 Settings.SLS_CONFIG_LOCATION, str(self.sls_config_path.absolute())
             )
+        self.config = SLSConfig(self.sls_config_path)
 
     def get_local_ids(self) -> list[int]:
-        _, _, apps = self.parse_sls_config()
-        return apps
-
-    def parse_sls_config(self) -> tuple[YAMLParser, dict[str, Any], list[int]]:
-        """Parse SLS config file"""
-        parser = YAMLParser(self.sls_config_path)
-        data = parser.read()
-        apps: list[int] = YAMLParser.ensure_list("AdditionalApps", data)
-        return parser, data, apps
+        return self.config.ids()
 
     def add_ids(
         self, data: int | list[int] | LuaParsedInfo, skip_check: bool = False
     ):
-        parser = YAMLParser(self.sls_config_path)
-        yaml_data = parser.read()
-        app_ids: list[int] = YAMLParser.ensure_list("AdditionalApps", yaml_data)
-        changes = 0
         if isinstance(data, int):
             data = [data]
         if isinstance(data, LuaParsedInfo):
             data = [int(x.depot_id) for x in data.depots]
-        for new_app_id in data:
-            if new_app_id not in app_ids:
-                print(f"{new_app_id} added to SLSSteam config.")
-                app_ids.append(new_app_id)
-                changes += 1
-            else:
-                print(f"{new_app_id} already in SLSSteam config.")
-
-        if changes > 0:
-            parser.write(yaml_data)
+        added, already_in = self.config.add(data)
+        for app_id in added:
+            print(f"{app_id} added to SLSSteam config.")
+        for app_id in already_in:
+            print(f"{app_id} already in SLSSteam config.")
+        self.config.save()
 
     def prompt_id_deletion(self):
-        parser, data, local_ids = self.parse_sls_config()
+        local_ids = self.config.ids()
         if not local_ids:
             print(
                 "There's nothing added to the SLS config file. "
@@ -122,15 +106,12 @@ class SLSManager(AppInjectionManager):
         ids_to_delete = set(ids_to_delete_list)
         self._prompt_include_depots(ids_to_delete, organized)
         print(f"Deleting {ids_to_delete}")
-        for local_id in ids_to_delete:
-            try:
-                local_ids.remove(local_id)
-            except ValueError:
-                pass
-        parser.write(data)
+        self.config.remove(ids_to_delete)
+        self.config.save()
 
     def dlc_check(self, provider: SteamInfoProvider, base_id: int) -> None:
         print("Checking for DLC...")
+        provider.refresh_changed()
         base_info = provider.get_single_app_info(base_id)
         dlcs = enter_path(base_info, "extended", "listofdlc")
         logger.debug(f"listofdlc: {dlcs}")
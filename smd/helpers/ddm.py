@@ -12,9 +12,10 @@ from InquirerPy.base.control import Choice
 from pathvalidate import sanitize_filename
 
 from smd.http_utils import get_game_name
+from smd.lua.parser import parse_lua
 from smd.prompts import prompt_dir, prompt_file, prompt_select
 from smd.storage.settings import get_or_compute_setting
-from smd.structs import LuaParsedInfo
+from smd.structs import DepotKeyPair, LuaParsedInfo
 from smd.ui.settings.types import Settings
 from smd.zip import BytesIOZip
 
@@ -22,14 +23,11 @@ from smd.zip import BytesIOZip
 class KeyExtractor:
     """handles parsing of decryptions keys from lua files"""
 
-    def __init__(self, pattern: str):
-        self.pattern = re.compile(pattern, re.MULTILINE)
+    def extract_keys(self, content: str) -> list[DepotKeyPair]:
+        return parse_lua(content).depot_keys
 
-    def extract_keys(self, content: str) -> list[tuple[str, str]]:
-        return self.pattern.findall(content)
-
-    def write_keys_file(self, keys: list[tuple[str, str]], output_path: Path) -> None:
-        lines = [f"{depot};{key}\n" for depot, key in keys]
+    def write_keys_file(self, keys: list[DepotKeyPair], output_path: Path) -> None:
+        lines = [f"{x.depot_id};{x.decryption_key}\n" for x in keys]
         output_path.write_text("".join(lines), encoding="utf-8")
 
 
@@ -78,12 +76,11 @@ def process_zip(
     base_id: str,
     lib_path: Path | None = None,
     target_dir_transformer: Callable[[Path], Path] | None = None,
+    keys: list[DepotKeyPair] | None = None,
 ) -> None:
-    lua_pattern = (
-        r"^\s*addappid\s*\(\s*(\d+)\s*,\s*\d\s*,\s*(?:\"|')\s*(\S+)\s*(?:\"|')"
-    )
+    """`keys` are read from the lua inside the zip if they aren't given"""
     game_name = sanitize_filename(get_game_name(base_id)).replace("'", "")
-    extractor = KeyExtractor(lua_pattern)
+    extractor = KeyExtractor()
 
     with tempfile.TemporaryDirectory() as temp_dir_str:
         temp_dir = Path(temp_dir_str)
@@ -105,7 +102,8 @@ def process_zip(
             raise FileNotFoundError("no .lua file found inside the zip archive")
 
         keys_path = temp_dir / "depot.keys"
-        keys = extractor.extract_keys(lua_file.read_text(encoding="utf-8"))
+        if keys is None:
+            keys = extractor.extract_keys(lua_file.read_text(encoding="utf-8"))
         extractor.write_keys_file(keys, keys_path)
 
         execution_queue: list[tuple[Path, str, str]] = []
@@ -180,7 +178,12 @@ def run_ddm(
 
     try:
         process_zip(
-            b_zip.file, exe_path, parsed_lua.app_id, lib_path, target_dir_transformer
+            b_zip.file,
+            exe_path,
+            parsed_lua.app_id,
+            lib_path,
+            target_dir_transformer,
+            [x for x in parsed_lua.depots if x.decryption_key],
         )
     except Exception as e:
         print(f"An error occurred: {e}")
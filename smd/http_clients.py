@@ -0,0 +1,120 @@
+"""Shared HTTP clients, so connections get reused between requests"""
+
+import asyncio
+import atexit
+import importlib.util
+import logging
+import threading
+import weakref
+from collections.abc import Coroutine
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+"HTTP/2 needs the optional `h2` package (`httpx[http2]`)"
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=16, max_keepalive_connections=8, keepalive_expiry=30
+)
+HOST_LIMITS: dict[str, httpx.Limits] = {
+    # appdetails gets rate limited pretty quickly
+    "store.steampowered.com": httpx.Limits(
+        max_connections=4, max_keepalive_connections=4, keepalive_expiry=30
+    ),
+    "api.github.com": httpx.Limits(
+        max_connections=4, max_keepalive_connections=4, keepalive_expiry=30
+    ),
+}
+"Connection limits per host. Hosts that aren't here use DEFAULT_LIMITS"
+
+_clients_lock = threading.Lock()
+_sync_clients: dict[str, httpx.Client] = {}
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]
+] = weakref.WeakKeyDictionary()
+_thread_loops = threading.local()
+_all_loops: list[asyncio.AbstractEventLoop] = []
+
+
+def _host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def get_client(url: str) -> httpx.Client:
+    """Returns the shared sync client for the host of `url`, creating it if needed.
+    Clients are thread-safe and keep connections alive between calls"""
+    host = _host_of(url)
+    with _clients_lock:
+        client = _sync_clients.get(host)
+        if client is None:
+            client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                limits=HOST_LIMITS.get(host, DEFAULT_LIMITS),
+                timeout=10,
+            )
+            _sync_clients[host] = client
+            logger.debug(f"Created HTTP client for {host} (http2={HTTP2_AVAILABLE})")
+    return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Async version of get_client. Async clients are tied to an event loop,
+    so there's one per host for every loop. Use `run_async` instead of
+    `asyncio.run` so the loop (and its connections) survives between calls"""
+    loop = asyncio.get_running_loop()
+    host = _host_of(url)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=HOST_LIMITS.get(host, DEFAULT_LIMITS),
+                timeout=10,
+            )
+            clients[host] = client
+            logger.debug(f"Created async HTTP client for {host}")
+    return client
+
+
+def run_async[T](coro: Coroutine[Any, Any, T]) -> T:
+    """Like asyncio.run, but reuses one event loop per thread"""
+    loop: asyncio.AbstractEventLoop | None = getattr(_thread_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_loops.loop = loop
+        with _clients_lock:
+            _all_loops.append(loop)
+    return loop.run_until_complete(coro)
+
+
+def close_clients():
+    """Closes every shared client. Runs automatically at exit"""
+    with _clients_lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+        async_clients = [(loop, list(x.values())) for loop, x in _async_clients.items()]
+        _async_clients.clear()
+        loops = [*_all_loops]
+        _all_loops.clear()
+
+    for client in sync_clients:
+        client.close()
+
+    async def aclose_all(clients: list[httpx.AsyncClient]):
+        await asyncio.gather(*(x.aclose() for x in clients), return_exceptions=True)
+
+    for loop, clients in async_clients:
+        if loop.is_closed() or loop.is_running():
+            continue
+        loop.run_until_complete(aclose_all(clients))
+    for loop in loops:
+        if not loop.is_closed():
+            loop.close()
+
+
+atexit.register(close_clients)
@@ -1,17 +1,24 @@
 import asyncio
+import hashlib
+import json
 import logging
+import re
 import sys
-from collections.abc import Generator
+import time
+from collections.abc import Generator, Iterable
 from contextlib import contextmanager
-from tempfile import TemporaryFile
-from typing import TYPE_CHECKING, Any, Literal, overload
+from pathlib import Path
+from typing import Any, BinaryIO, Literal, overload
 from urllib.parse import urlparse
 
 import httpx
 from tqdm import tqdm  # type: ignore
 
+from smd.http_clients import get_async_client, get_client, run_async
 from smd.prompts import prompt_confirm, prompt_text
 from smd.secret_store import b64_decrypt
+from smd.segmented_download import RemoteFile, download_segmented
+from smd.utils import root_folder
 
 if sys.platform == "win32":
     import msvcrt
@@ -25,11 +32,17 @@ else:
         def getch():
             return None
 
-if TYPE_CHECKING:
-    from tempfile import _TemporaryFileWrapper  # pyright: ignore[reportPrivateUsage]
-
 logger = logging.getLogger(__name__)
 
+GMRC_CONCURRENCY = 8
+
+DOWNLOADS_DIR = root_folder(outside_internal=True) / "downloads"
+"Where unfinished downloads are kept so they can be resumed"
+DOWNLOAD_ATTEMPTS = 5
+DOWNLOAD_TIMEOUT = httpx.Timeout(10, read=60)
+SEGMENTED_MIN_SIZE = 32 * 1024**2
+"Files at least this big get downloaded with several connections if possible"
+
 
 @overload
 async def get_request(
@@ -37,6 +50,7 @@ async def get_request(
     type: Literal["text"] = "text",
     timeout: int = 10,
     headers: dict[str, str] | None = None,
+    client: httpx.AsyncClient | None = None,
 ) -> str | None: ...
 
 
@@ -46,6 +60,7 @@ async def get_request(
     type: Literal["json"],
     timeout: int = 10,
     headers: dict[str, str] | None = None,
+    client: httpx.AsyncClient | None = None,
 ) -> dict[Any, Any] | None: ...
 
 
@@ -54,11 +69,14 @@ async def get_request(
     type: Literal["text", "json"] = "text",
     timeout: int = 10,
     headers: dict[str, str] | None = None,
+    client: httpx.AsyncClient | None = None,
 ) -> str | dict[Any, Any] | None:
+    """Uses the shared client for the URL's host unless `client` is given"""
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            logger.debug(f"Making request to {url}")
-            response = await client.get(url, headers=headers)
+        if client is None:
+            client = get_async_client(url)
+        logger.debug(f"Making request to {url}")
+        response = await client.get(url, headers=headers, timeout=timeout)
 
         if response.status_code == 200:
             try:
@@ -74,12 +92,17 @@ async def get_request(
         print(f"An error occurred: {e!r}")
 
 
-def get_request_raw(url: str):
+def get_request_raw(url: str, interactive: bool = True):
+    """Returns the response body. If `interactive` is False, network errors
+    are logged and None is returned instead of asking the user to retry"""
     resp = None
     while True:
         try:
-            resp = httpx.get(url, timeout=None)
+            resp = get_client(url).get(url, timeout=None)
         except httpx.HTTPError as e:
+            if not interactive:
+                logger.debug(f"Network error for {url}: {e!r}")
+                break
             print(f"Network error: {e!r}")
             if prompt_confirm("Try again?"):
                 continue
@@ -105,17 +128,8 @@ def get_base_domain(url: str):
     return base_url
 
 
-# Lowkey don't remember why i wrote it like this.
-# It uses a default timeout of 10s but i think it still got stuck?
-async def get_gmrc(manifest_id: str | int) -> str | None:
-    """Gets a manifest request code, given a manifest ID
-
-    Args:
-        manifest_id (Union[str, int]): The manifest ID
-
-    Returns:
-        str: The request code
-    """
+def _gmrc_request(manifest_id: str | int) -> tuple[str, dict[str, str]]:
+    """Returns the URL and headers used to get a manifest request code"""
     # Yes, I'm aware it's not actually "encrypted" since I included the password
     # Shut up.
     template_url = b64_decrypt(
@@ -123,11 +137,32 @@ async def get_gmrc(manifest_id: str | int) -> str | None:
         b'rok2PaPQ2T0CF3RZXe+AfytF7i+Yo/kEykq4hnPSSrhRDeESOARdQD4+SzqZqeG5C5U4fAiuEUuPpr1CaXl9V/Xv9EcZdWk1BbyUqCXP8FHkqdGm',
     )
     url = template_url.format(manifest_id=manifest_id)
-    print("Getting request code...")
 
     headers = {
         "Referer": get_base_domain(url),
     }
+    return url, headers
+
+
+# Lowkey don't remember why i wrote it like this.
+# It uses a default timeout of 10s but i think it still got stuck?
+async def get_gmrc(manifest_id: str | int, interactive: bool = True) -> str | None:
+    """Gets a manifest request code, given a manifest ID
+
+    Args:
+        manifest_id (Union[str, int]): The manifest ID
+        interactive (bool): Print progress and let the user cancel the request
+            with Enter (Windows only). Turn off when running in a worker thread.
+
+    Returns:
+        str: The request code
+    """
+    url, headers = _gmrc_request(manifest_id)
+
+    if not interactive:
+        return await get_request(url, headers=headers)
+
+    print("Getting request code...")
 
     if sys.platform != "win32":
         return await get_request(url, headers=headers)
@@ -160,9 +195,34 @@ async def get_gmrc(manifest_id: str | int) -> str | None:
     return result
 
 
+async def get_gmrcs(
+    manifest_ids: Iterable[str | int], concurrency: int = GMRC_CONCURRENCY
+) -> dict[str, str | None]:
+    """Gets request codes for several manifests at once, sharing one client
+
+    Args:
+        manifest_ids (Iterable[str | int]): The manifest IDs
+        concurrency (int): Max number of requests in flight
+
+    Returns:
+        dict[str, str | None]: Manifest IDs mapped to their request code,
+            None if that request failed
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    unique_ids = list(dict.fromkeys(str(x) for x in manifest_ids))
+
+    async def resolve(manifest_id: str):
+        url, headers = _gmrc_request(manifest_id)
+        async with semaphore:
+            return manifest_id, await get_request(url, headers=headers)
+
+    results = await asyncio.gather(*(resolve(x) for x in unique_ids))
+    return dict(results)
+
+
 def get_game_name(app_id: str) -> str:
     """Converts an App ID to a game name"""
-    official_info = asyncio.run(
+    official_info = run_async(
         get_request(
             f"https://store.steampowered.com/api/appdetails/?appids={app_id}",
             "json",
@@ -180,49 +240,201 @@ def get_game_name(app_id: str) -> str:
     return app_name
 
 
+def _partial_paths(url: str, params: dict[str, str] | None) -> tuple[Path, Path]:
+    """The partial file and its state file. Named after a hash of the URL so
+    API keys in the query don't end up on disk"""
+    full_url = str(httpx.URL(url, params=params))
+    key = hashlib.sha256(full_url.encode()).hexdigest()[:32]
+    return DOWNLOADS_DIR / f"{key}.part", DOWNLOADS_DIR / f"{key}.json"
+
+
+def _load_partial_state(part: Path, state_file: Path) -> dict[str, Any]:
+    if not part.exists() or not state_file.exists():
+        return {}
+    try:
+        return json.loads(state_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _remove_partial(part: Path, state_file: Path):
+    part.unlink(missing_ok=True)
+    state_file.unlink(missing_ok=True)
+
+
+def _resume_validator(response: httpx.Response) -> str | None:
+    """What to send in If-Range. Weak ETags aren't allowed there"""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _expected_size(response: httpx.Response) -> int | None:
+    """Full size of the file, from Content-Range or Content-Length"""
+    if match := re.fullmatch(
+        r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", "")
+    ):
+        return int(match.group(1))
+    try:
+        return int(response.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _write_response(
+    response: httpx.Response,
+    part: Path,
+    offset: int,
+    total: int | None,
+    chunk_size: int,
+):
+    with part.open("ab" if offset else "wb") as f, tqdm(
+        desc="Downloading",
+        total=total,
+        initial=offset,
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        miniters=1,
+    ) as pbar:
+        for chunk in response.iter_bytes(chunk_size=chunk_size):
+            f.write(chunk)
+            pbar.update(len(chunk))
+
+
+def _download_resumable(
+    url: str,
+    headers: dict[str, str] | None,
+    params: dict[str, str] | None,
+    chunk_size: int,
+    part: Path,
+    state_file: Path,
+    allow_segments: bool = True,
+) -> bool:
+    """Downloads `url` to `part`, picking up where a previous attempt stopped
+    if the server supports ranges. Big files that support ranges get handed off
+    to the segmented downloader. Returns True once the file is complete"""
+    DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        state = _load_partial_state(part, state_file)
+        offset = part.stat().st_size if state else 0
+        req_headers = dict(headers or {})
+        if offset and state.get("validator"):
+            req_headers["Range"] = f"bytes={offset}-"
+            req_headers["If-Range"] = state["validator"]
+            logger.debug(f"Resuming {part.name} from byte {offset}")
+        else:
+            offset = 0
+        resumable = False
+        segmented: RemoteFile | None = None
+        try:
+            with get_client(url).stream(
+                "GET",
+                url,
+                headers=req_headers,
+                params=params,
+                follow_redirects=True,
+                timeout=DOWNLOAD_TIMEOUT,
+            ) as response:
+                if response.status_code == 416:
+                    logger.debug("Range not satisfiable, starting over")
+                    _remove_partial(part, state_file)
+                    continue
+                if response.status_code == 206 and offset:
+                    content_range = response.headers.get("Content-Range", "")
+                    if not content_range.startswith(f"bytes {offset}-"):
+                        logger.debug(f"Unexpected Content-Range {content_range}")
+                        _remove_partial(part, state_file)
+                        continue
+                    print(f"Resuming download from {offset / 1024**2:.1f} MiB")
+                else:
+                    # Server sent the whole thing (file changed or no ranges)
+                    offset = 0
+                total = _expected_size(response)
+                logger.debug(f"Total size is {total}")
+                validator = _resume_validator(response)
+                encoded = (
+                    response.headers.get("Content-Encoding", "identity") != "identity"
+                )
+                if encoded:
+                    # Content-Length is the compressed size, and byte offsets
+                    # don't line up with what gets written, so no resuming
+                    total = None
+                resumable = (
+                    response.status_code in (200, 206)
+                    and validator is not None
+                    and not encoded
+                )
+                if resumable:
+                    state_file.write_text(
+                        json.dumps({"validator": validator, "total": total}),
+                        encoding="utf-8",
+                    )
+                else:
+                    state_file.unlink(missing_ok=True)
+                if (
+                    allow_segments
+                    and resumable
+                    and not offset
+                    and total is not None
+                    and total >= SEGMENTED_MIN_SIZE
+                    and response.headers.get("Accept-Ranges") == "bytes"
+                ):
+                    assert validator is not None
+                    segmented = RemoteFile(str(response.url), total, validator)
+                else:
+                    _write_response(response, part, offset, total, chunk_size)
+        except httpx.HTTPError as e:
+            print(f"Network error: {e!r}")
+            if not resumable:
+                _remove_partial(part, state_file)
+            if attempt < DOWNLOAD_ATTEMPTS:
+                delay = min(2**attempt, 10)
+                print(f"Retrying in {delay}s ({attempt}/{DOWNLOAD_ATTEMPTS - 1})...")
+                time.sleep(delay)
+            continue
+
+        if segmented is not None:
+            state_file.unlink(missing_ok=True)
+            if download_segmented(segmented, part, headers):
+                return True
+            allow_segments = False  # try again with a single connection
+            continue
+
+        size = part.stat().st_size
+        if total is not None and size != total:
+            print(f"Downloaded {size} bytes but expected {total}. Starting over")
+            _remove_partial(part, state_file)
+            continue
+        state_file.unlink(missing_ok=True)
+        return True
+    return False
+
+
 @contextmanager
 def download_to_tempfile(
     url: str,
     headers: dict[str, str] | None = None,
     params: dict[str, str] | None = None,
     chunk_size: int = (1024**2) // 2,
-) -> Generator["_TemporaryFileWrapper[bytes] | None", None, None]:
-    """Downloads and yields a tempfile, Defaults to 0.5MiB for chunk size"""
-    temp_f = TemporaryFile()  # noqa: SIM115
-    success = True
-    try:
-        with httpx.stream(
-            "GET",
-            url,
-            headers=headers,
-            params=params,
-            follow_redirects=True,
-            timeout=None,
-        ) as response:
-
-            try:
-                total = int(response.headers.get("Content-Length", "0"))
-            except Exception as e:
-                print(f"Could not parse Content-Length header: {e}")
-                total = 0
-            logger.debug(f"Total size is {total}")
-            with tqdm(
-                desc="Downloading",
-                total=total,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                miniters=1,
-            ) as pbar:
-                for chunk in response.iter_bytes(chunk_size=chunk_size):
-                    temp_f.write(chunk)
-                    pbar.update(len(chunk))
-        temp_f.seek(0)
-    except httpx.HTTPError as e:
-        print(f"Network error: {e!r}")
-        success = False
-
+    allow_segments: bool = True,
+) -> Generator[BinaryIO | None, None, None]:
+    """Downloads and yields the file, Defaults to 0.5MiB for chunk size.
+    Network errors are retried a few times, resuming from where it stopped when
+    the server supports it. If it still fails, None is yielded and the partial
+    file is kept, so calling this again with the same URL resumes it.
+    Set `allow_segments` to False for endpoints where every request counts
+    towards a limit, since big files get downloaded with several requests."""
+    part, state_file = _partial_paths(url, params)
+    if not _download_resumable(
+        url, headers, params, chunk_size, part, state_file, allow_segments
+    ):
+        yield None
+        return
+    f = part.open("rb")
     try:
-        yield temp_f if success else None
+        yield f
     finally:
-        temp_f.close()
+        f.close()
+        _remove_partial(part, state_file)
@@ -0,0 +1,82 @@
+"""Loads a bunch of luas at once, for processing them without prompts"""
+
+import logging
+from pathlib import Path
+from typing import Any
+
+from smd.lua.parser import parse_lua
+from smd.structs import DepotKeyPair, LuaParsedInfo
+from smd.utils import enter_path
+from smd.zip import read_lua_from_zip
+
+logger = logging.getLogger(__name__)
+
+LUA_SUFFIXES = (".lua", ".zip")
+
+
+def collect_lua_files(paths: list[Path]) -> list[Path]:
+    """Folders get expanded into the .lua and .zip files directly inside them"""
+    files: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(
+                sorted(
+                    x
+                    for x in path.iterdir()
+                    if x.is_file() and x.suffix.lower() in LUA_SUFFIXES
+                )
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def load_lua(path: Path) -> LuaParsedInfo | str:
+    """Same checks as LuaManager.fetch_lua, but returns the reason instead of
+    asking again when the file can't be used"""
+    if not path.is_file():
+        return "File not found"
+    if path.suffix.lower() == ".zip":
+        contents = read_lua_from_zip(path)
+        if contents is None:
+            return "No .lua in the ZIP"
+    else:
+        try:
+            contents = path.read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            return "Not a text file"
+    parsed = parse_lua(contents)
+    if (app_id := parsed.base_app_id) is None:
+        return "App ID not found"
+    if not (depots := parsed.depot_keys):
+        return "Decryption keys not found"
+    depots.extend([DepotKeyPair(x, "") for x in parsed.ids_without_key])
+    return LuaParsedInfo(path, contents, app_id, depots)
+
+
+def load_luas(paths: list[Path]) -> tuple[list[LuaParsedInfo], dict[Path, str]]:
+    """Returns the luas that can be used, and the files that were skipped
+    mapped to why. If a game shows up twice, the first one wins"""
+    luas: dict[str, LuaParsedInfo] = {}
+    skipped: dict[Path, str] = {}
+    for path in collect_lua_files(paths):
+        result = load_lua(path)
+        if isinstance(result, str):
+            skipped[path] = result
+        elif result.app_id in luas:
+            skipped[path] = f"Same game as {luas[result.app_id].path.name}"
+        else:
+            luas[result.app_id] = result
+    logger.debug(f"Loaded {len(luas)} luas, skipped {len(skipped)} files")
+    return list(luas.values()), skipped
+
+
+def app_names(luas: list[LuaParsedInfo], app_info: dict[int, Any]) -> dict[str, str]:
+    """App ID mapped to its name. Product info can be False or missing for IDs
+    that aren't valid base apps, those get "App <id>" instead"""
+    names: dict[str, str] = {}
+    for lua in luas:
+        info = app_info.get(int(lua.app_id))
+        name = enter_path(info, "common", "name") if isinstance(info, dict) else None
+        names[lua.app_id] = name or f"App {lua.app_id}"
+    return names
@@ -1,16 +1,16 @@
-import json
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any, cast
+from typing import cast
 
 from colorama import Fore, Style
 
 from smd.fzf import run_fzf
-from smd.http_utils import download_to_tempfile
 from smd.lua.endpoints import get_morrenus, get_oureverday
 from smd.prompts import prompt_confirm, prompt_file, prompt_select, prompt_text
-from smd.storage.settings import get_or_compute_setting
+from smd.search import SearchIndex
+from smd.storage.app_catalog import AppCatalog
+from smd.storage.settings import get_or_compute_setting, get_setting
 from smd.structs import (
     LuaChoice,
     LuaChoiceReturnCode,
@@ -20,7 +20,6 @@ from smd.structs import (
     OSType,
 )
 from smd.ui.settings.types import Settings
-from smd.utils import enter_path, root_folder
 from smd.zip import read_lua_from_zip
 
 
@@ -79,8 +78,34 @@ def add_new_lua(file: Path | None = None) -> LuaResult:
     return LuaResult(lua_path, None, LuaChoiceReturnCode.LOOP)
 
 
+def search_catalog(catalog: AppCatalog) -> str | None:
+    """Searches the app catalog in-process, then returns game ID"""
+    index = SearchIndex.for_catalog(catalog)
+    while True:
+        query = prompt_text("Search for a game. Leave it blank to go back:")
+        if not query:
+            return None
+        results = index.search(query)
+        if not results:
+            print("No games found. Try something else.")
+            continue
+        app_id: str | None = prompt_select(
+            "Choose a game:",
+            [(f"{x.name} [ID={x.app_id}]", str(x.app_id)) for x in results]
+            + [("[Search again]", "")],
+            cancellable=True,
+        )
+        if app_id is None:
+            return None
+        if app_id:
+            name = catalog.apps[int(app_id)]
+            print(f"{Fore.YELLOW + name + Style.RESET_ALL} has been selected")
+            return app_id
+
+
 def search_game(os_type: OSType) -> str | None:
-    """Using fzf, lets a user search for a game, then returns game ID"""
+    """Lets a user search for a game, then returns game ID.
+    Uses fzf instead of the built-in search if it's enabled in settings"""
 
     def prompt_web_api_key() -> str:
         print(
@@ -89,11 +114,10 @@ def search_game(os_type: OSType) -> str | None:
         )
         return prompt_text("Paste your Steam Web API Key:")
 
-    all_games_file = root_folder(True) / "all_games.txt"
-    if all_games_file.exists():
-        mtime = all_games_file.stat().st_mtime
+    catalog = AppCatalog()
+    if catalog.synced_at is not None:
         local_tz = datetime.now().astimezone().tzinfo
-        mtime_str = datetime.fromtimestamp(mtime, tz=local_tz).strftime(
+        mtime_str = datetime.fromtimestamp(catalog.synced_at, tz=local_tz).strftime(
             "%Y-%m-%d %I:%M %p"
         )
         download = prompt_confirm(
@@ -105,33 +129,13 @@ def search_game(os_type: OSType) -> str | None:
         download = True
     if download:
         api_key = cast(str, get_or_compute_setting(Settings.STEAM_WEB_API_KEY, prompt_web_api_key))
-        params: dict[str, str] = {"key": api_key, "max_results": "50000"}
-        games: list[dict[str, Any]] = []
-        print(
-            "Steam has limited this endpoint to 50k IDs per requests, so "
-            "it'll be downloading a couple times. Don't be alarmed."
-        )
-        while True:
-            with download_to_tempfile(
-                "https://api.steampowered.com/IStoreService/GetAppList/v1/",
-                params=params,
-            ) as tf:
-                if tf is None:
-                    continue
-                resp = json.load(tf)
-            games.extend(enter_path(resp, "response", "apps"))
-            more = enter_path(resp, "response", "have_more_results")
-            if not more:
-                break
-            params["last_appid"] = enter_path(resp, "response", "last_appid")
-        games_str = [
-            x.get("name", "UNKNOWN GAME") + f" [ID={x.get('appid')}]" for x in games
-        ]
-        with all_games_file.open("w", encoding="utf=-8") as f:
-            f.write("\n".join(games_str))
-    else:
-        games_str = all_games_file
-    selection = run_fzf(games_str, os_type)
+        if not catalog.update(api_key):
+            print("Could not download the list of games.")
+            if not len(catalog):
+                return None
+    if not get_setting(Settings.USE_FZF):
+        return search_catalog(catalog)
+    selection = run_fzf(catalog.lines(), os_type)
     if selection:
         match = re.search(r"(?<=\[ID=)\d+(?=\]$)", selection)
         assert match is not None
@@ -1,6 +1,5 @@
 """API endpoints are in here"""
 
-import asyncio
 import io
 import json
 import logging
@@ -10,6 +9,7 @@ from urllib.parse import urljoin
 
 from colorama import Fore, Style
 
+from smd.http_clients import run_async
 from smd.http_utils import download_to_tempfile, get_request
 from smd.prompts import prompt_confirm
 from smd.steam_client import SteamInfoProvider
@@ -27,7 +27,7 @@ logger = logging.getLogger(__name__)
 
 def get_oureverday(dest: Path, app_id: str):
     def get_latest_hash():
-        commit_data = asyncio.run(
+        commit_data = run_async(
             get_request(
                 OUREVERYDAY_COMMIT_INFO_URL,
                 "json",
@@ -39,7 +39,7 @@ def get_oureverday(dest: Path, app_id: str):
         latest_hash = get_latest_hash()
         if latest_hash is None:
             return
-        json_data = asyncio.run(
+        json_data = run_async(
             get_request(
                 OUREVERYDAY_RAW_JSON_URL.format(commit_hash=latest_hash),
                 "json",
@@ -127,7 +127,7 @@ def get_morrenus(dest: Path, app_id: str) -> Path | None:
         "Authorization": f"Bearer {morrenus_key}",
     }
 
-    data = asyncio.run(
+    data = run_async(
         get_request(
             urljoin(MORRENUS_BASE_URL, "/api/v1/user/stats"),
             type="json",
@@ -160,7 +160,8 @@ def get_morrenus(dest: Path, app_id: str) -> Path | None:
         logger.debug(f"Downloading lua files from {url}")
         lua_bytes = b""
         while True:
-            with download_to_tempfile(url, headers) as tf:
+            # Every request might count towards the daily limit
+            with download_to_tempfile(url, headers, allow_segments=False) as tf:
                 if tf is None:
                     if prompt_confirm("Try again?"):
                         continue
@@ -1,5 +1,4 @@
 import logging
-import re
 import shutil
 from pathlib import Path
 from typing import cast
@@ -7,6 +6,7 @@ from typing import cast
 from colorama import Fore, Style
 
 from smd.lua.choices import add_new_lua, download_lua, select_from_saved_luas
+from smd.lua.parser import parse_lua
 from smd.prompts import prompt_select
 from smd.storage.named_ids import get_named_ids
 from smd.structs import (
@@ -72,20 +72,7 @@ class LuaManager:
         strict: bool = False,
     ) -> LuaParsedInfo | None:
         """Depending on the choice, fetch a lua file then parse the contents"""
-        depot_no_key_regex = re.compile(
-            r"^\s*addappid\s*\(\s*(\d+)\s*\)", flags=re.MULTILINE
-        )
-        # addappid with just 1 arg
-        depot_dec_key_regex = re.compile(
-            r"^\s*addappid\s*\(\s*(\d+)\s*,\s*\d\s*,\s*(?:\"|\')(\S+)(?:\"|\')\s*\)",
-            flags=re.MULTILINE,
-        )
-        # addappid with decryption key
-        general_regex = re.compile(r"^\s*addappid\s*\(\s*(\d+)", flags=re.MULTILINE)
-        # any addappid command
-
         while True:
-            ids_with_no_key: list[str] = []
             choice: LuaChoice | None = (
                 override_choice
                 if override_choice
@@ -98,21 +85,18 @@ class LuaManager:
             lua = self.get_raw_lua(choice, override_path)
             if lua is None:
                 continue
-            if not (any_addappid := general_regex.search(lua.contents)):
+            parsed = parse_lua(lua.contents)
+            if (app_id := parsed.base_app_id) is None:
                 print("App ID not found. Try again.")
                 continue
 
-            app_id = any_addappid.group(1)
             print(f"App ID is {app_id}")
 
-            ids_with_no_key = depot_no_key_regex.findall(lua.contents)
-
-            if not (depot_dec_key := depot_dec_key_regex.findall(lua.contents)):
+            if not (depot_dec_key := parsed.depot_keys):
                 print("Decryption keys not found. Try again.")
                 continue
             break
-        depot_dec_key = [DepotKeyPair(*x) for x in depot_dec_key]
-        depot_dec_key.extend([DepotKeyPair(x, "") for x in ids_with_no_key])
+        depot_dec_key.extend([DepotKeyPair(x, "") for x in parsed.ids_without_key])
         return LuaParsedInfo(lua.path, lua.contents, app_id, depot_dec_key)
 
     def backup_lua(self, lua: LuaParsedInfo):
@@ -0,0 +1,187 @@
+"""Reads the function calls in a lua file (addappid, setManifestid, etc.)"""
+
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple, cast
+
+from smd.structs import DepotKeyPair
+
+LuaValue = str | int | float | bool | None
+
+_STATEMENT = re.compile(
+    r"""
+    --\[(=*)\[.*?\]\1\]                          # block comment, skipped
+    | ^[ \t]*addappid[ \t]*\([ \t]*(\d+)[ \t]*    # the common calls get their
+      (?:,[ \t]*(\d+)[ \t]*                       # fields pulled out here so
+      (?:,[ \t]*(?:"([^"\n]*)"|'([^'\n]*)')[ \t]*  # they don't need _parse_args
+      )?)?\)
+    | ^[ \t]*setManifestid[ \t]*\([ \t]*(\d+)[ \t]*,
+      [ \t]*["']?(\d+)["']?[ \t]*(?:,[ \t]*(\d+)[ \t]*)?\)
+    | ^[ \t]*addtoken[ \t]*\([ \t]*(\d+)[ \t]*,
+      [ \t]*["']?(\d+)["']?[ \t]*\)
+    | ^[ \t]*([A-Za-z_]\w*)[ \t]*\(([^()\n]*)\)   # any other call
+    """,
+    re.MULTILINE | re.DOTALL | re.VERBOSE,
+)
+_ARG = re.compile(r""""([^"]*)"|'([^']*)'|([^\s,]+)""")
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+_KEYWORDS: dict[str, LuaValue] = {"true": True, "false": False, "nil": None}
+
+
+class LuaCall(NamedTuple):
+    name: str
+    args: tuple[LuaValue, ...]
+    "Quoted strings stay as str, numbers/true/false/nil get converted"
+
+
+class AddAppId(NamedTuple):
+    app_id: str
+    flag: LuaValue
+    "Second argument, usually 0 or 1. Missing if it only had the ID"
+    key: str | None
+    "Depot decryption key, if it had one"
+
+
+class SetManifestId(NamedTuple):
+    depot_id: str
+    manifest_id: str
+    size: LuaValue
+
+
+class AddToken(NamedTuple):
+    app_id: str
+    token: str
+
+
+@dataclass
+class ParsedLua:
+    app_ids: list[AddAppId] = field(default_factory=list)
+    "Every addappid, in order"
+    manifests: list[SetManifestId] = field(default_factory=list)
+    tokens: list[AddToken] = field(default_factory=list)
+    other: list[LuaCall] = field(default_factory=list)
+    "Calls that don't have their own type"
+
+    @property
+    def base_app_id(self) -> str | None:
+        """The first addappid is the game itself"""
+        return self.app_ids[0].app_id if self.app_ids else None
+
+    @property
+    def depot_keys(self) -> list[DepotKeyPair]:
+        """Depots that came with a decryption key"""
+        return [
+            DepotKeyPair(x.app_id, x.key)
+            for x in self.app_ids
+            if x.key is not None and isinstance(x.flag, int)
+        ]
+
+    @property
+    def ids_without_key(self) -> list[str]:
+        """addappid calls that only had the ID (usually DLCs)"""
+        return [x.app_id for x in self.app_ids if x.flag is None and x.key is None]
+
+
+def _convert(token: str) -> LuaValue:
+    if token.isdigit():
+        return int(token)
+    if token in _KEYWORDS:
+        return _KEYWORDS[token]
+    if _NUMBER.fullmatch(token):
+        return float(token) if "." in token else int(token)
+    return token
+
+
+def _parse_args_slow(args: str) -> tuple[LuaValue, ...]:
+    values: list[LuaValue] = []
+    for match in _ARG.finditer(args):
+        double, single, raw = match.groups()
+        if double is not None or single is not None:
+            values.append(double if double is not None else single)
+        else:
+            values.append(_convert(raw))
+    return tuple(values)
+
+
+def _parse_args(args: str) -> tuple[LuaValue, ...]:
+    values: list[LuaValue] = []
+    for token in args.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        quote = token[0]
+        if quote in "\"'":
+            if len(token) < 2 or token[-1] != quote:
+                # A string with a comma in it, split properly instead
+                return _parse_args_slow(args)
+            values.append(token[1:-1])
+        else:
+            values.append(_convert(token))
+    return tuple(values)
+
+
+def parse_lua(contents: str) -> ParsedLua:
+    """Goes through the lua once and sorts the calls by type"""
+    parsed = ParsedLua()
+    add_app_id = parsed.app_ids.append
+    for (
+        _,
+        app_id,
+        flag,
+        double_key,
+        single_key,
+        depot_id,
+        manifest_id,
+        size,
+        token_app_id,
+        token,
+        name,
+        args,
+    ) in _STATEMENT.findall(contents):
+        if app_id:
+            key = (double_key or single_key).strip()
+            add_app_id(AddAppId(app_id, int(flag) if flag else None, key or None))
+        elif depot_id:
+            parsed.manifests.append(
+                SetManifestId(depot_id, manifest_id, int(size) if size else None)
+            )
+        elif token_app_id:
+            parsed.tokens.append(AddToken(token_app_id, token))
+        elif name:
+            _parse_call(parsed, LuaCall(name, _parse_args(args)))
+    return parsed
+
+
+def _id(value: LuaValue) -> str | None:
+    """App/depot IDs can be written as numbers or strings"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str) and value.isdigit():
+        return value
+    return None
+
+
+def _parse_call(parsed: ParsedLua, call: LuaCall):
+    """Calls that are written in an unusual way (e.g. IDs as strings)"""
+    name, args = call.name, call.args
+    first = _id(args[0]) if args else None
+    if first is None:
+        parsed.other.append(call)
+    elif name == "addappid":
+        key = args[2] if len(args) > 2 else None
+        parsed.app_ids.append(
+            AddAppId(
+                first,
+                args[1] if len(args) > 1 else None,
+                key.strip() if isinstance(key, str) and key.strip() else None,
+            )
+        )
+    elif name == "setManifestid" and len(args) > 1 and _id(args[1]) is not None:
+        size = args[2] if len(args) > 2 else None
+        parsed.manifests.append(SetManifestId(first, cast(str, _id(args[1])), size))
+    elif name == "addtoken" and len(args) > 1:
+        parsed.tokens.append(AddToken(first, str(args[1])))
+    else:
+        parsed.other.append(call)
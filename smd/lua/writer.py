@@ -1,5 +1,4 @@
 import logging
-import shutil
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -7,9 +6,9 @@ from pathvalidate import sanitize_filename
 
 from smd.http_utils import get_game_name
 from smd.prompts import prompt_confirm
-from smd.storage.vdf import VDFLoadAndDumper, vdf_dump, vdf_load
+from smd.storage.config_vdf import ConfigVDF, read_depots
+from smd.storage.vdf import vdf_dump
 from smd.structs import LuaParsedInfo
-from smd.utils import enter_path
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +17,19 @@ logger = logging.getLogger(__name__)
 class ACFWriter:
     steam_lib_path: Path
 
-    def write_acf(self, lua: LuaParsedInfo):
+    def write_acf(
+        self,
+        lua: LuaParsedInfo,
+        app_name: str | None = None,
+        overwrite: bool | None = None,
+    ) -> bool:
+        """Writes a fresh .acf for the game. `overwrite` decides what happens to an
+        existing .acf instead of asking. Returns whether it was written"""
         acf_file = self.steam_lib_path / f"steamapps/appmanifest_{lua.app_id}.acf"
         do_write_acf = True
-        if acf_file.exists():
+        if acf_file.exists() and overwrite is not None:
+            do_write_acf = overwrite
+        elif acf_file.exists():
             do_write_acf = not prompt_confirm(
                 ".acf file found. Are you updating a game you already have installed"
                 " or is this a new installation?",
@@ -31,7 +39,8 @@ class ACFWriter:
             )
 
         if do_write_acf:
-            app_name = get_game_name(lua.app_id)
+            if app_name is None:
+                app_name = get_game_name(lua.app_id)
             acf_contents: dict[str, dict[str, str]] = {
                 "AppState": {
                     "appid": lua.app_id,
@@ -45,57 +54,45 @@ class ACFWriter:
             print(f"Wrote .acf file to {acf_file}")
         else:
             print("Skipped writing to .acf file")
+        return do_write_acf
 
 
 @dataclass
 class ConfigVDFWriter:
     steam_path: Path
 
-    def add_decryption_keys_to_config(self, lua: LuaParsedInfo):
-        """Adds decryption keys from parsed lua to config.vdf"""
-        vdf_file = self.steam_path / "config/config.vdf"
-        shutil.copyfile(vdf_file, (self.steam_path / "config/config.vdf.backup"))
-        with VDFLoadAndDumper(vdf_file) as vdf_data:
-            for pair in lua.depots:
-                depot_id = pair.depot_id
-                dec_key = pair.decryption_key
-                if dec_key == "":
-                    logger.debug(f"Skipping {depot_id} because it's not a depot")
-                    continue
-                print(
-                    f"Depot {depot_id} has decryption key {dec_key}... ",
-                    end="",
-                    flush=True,
-                )
-                depots = enter_path(
-                    vdf_data,
-                    "InstallConfigStore",
-                    "Software",
-                    "Valve",
-                    "Steam",
-                    "depots",
-                    mutate=True,
-                    ignore_case=True,
-                )
-                if depot_id not in depots:
-                    depots[depot_id] = {"DecryptionKey": dec_key}
-                    print("Added to config.vdf succesfully.")
-                else:
-                    print("Already in config.vdf.")
+    def add_decryption_keys_to_config(
+        self, luas: LuaParsedInfo | list[LuaParsedInfo]
+    ) -> dict[str, int]:
+        """Adds decryption keys from parsed luas to config.vdf, in one write.
+        Returns how many keys got added for each app ID"""
+        if isinstance(luas, LuaParsedInfo):
+            luas = [luas]
+        added: dict[str, int] = {}
+        with ConfigVDF.from_steam_path(self.steam_path) as config:
+            for lua in luas:
+                new_pairs = config.add_keys(lua.depots)
+                added[lua.app_id] = len(new_pairs)
+                new_ids = {id(x) for x in new_pairs}
+                for pair in lua.depots:
+                    depot_id = pair.depot_id
+                    dec_key = pair.decryption_key
+                    if dec_key == "":
+                        logger.debug(f"Skipping {depot_id} because it's not a depot")
+                        continue
+                    print(
+                        f"Depot {depot_id} has decryption key {dec_key}... ",
+                        end="",
+                        flush=True,
+                    )
+                    if id(pair) in new_ids:
+                        print("Added to config.vdf succesfully.")
+                    else:
+                        print("Already in config.vdf.")
+        return added
 
     def ids_in_config(self, ids: list[int]):
         """Checks if IDs are in config.vdf and returns a
         dict mapping IDs to their existence"""
-        vdf_file = self.steam_path / "config/config.vdf"
-        data = vdf_load(vdf_file)
-        depots = enter_path(
-            data,
-            "InstallConfigStore",
-            "Software",
-            "Valve",
-            "Steam",
-            "depots",
-            mutate=True,
-            ignore_case=True,
-        )
-        return {x: (str(x) in depots) for x in ids}
+        depots = read_depots(self.steam_path / "config/config.vdf")
+        return {x: str(x) in depots for x in ids}
@@ -1,7 +1,14 @@
 import base64
-import io
+import logging
+import math
+import multiprocessing
+import os
 import struct
+import threading
 import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
 from pathlib import Path
 
 from colorama import Fore, Style
@@ -13,13 +20,25 @@ from steam.protobufs.content_manifest_pb2 import (
     ContentManifestSignature,
 )
 
-from smd.zip import read_nth_file_from_zip_bytes
+from smd.manifest.reader import (
+    PROTOBUF_ENDOFMANIFEST_MAGIC,
+    PROTOBUF_METADATA_MAGIC,
+    PROTOBUF_PAYLOAD_MAGIC,
+    PROTOBUF_SIGNATURE_MAGIC,
+    ManifestSource,
+    open_manifest,
+    split_fields,
+)
+from smd.storage.settings import resolve_parallel_decrypt_threshold
+
+logger = logging.getLogger(__name__)
 
-# Magic numbers
-PROTOBUF_PAYLOAD_MAGIC = 0x71F617D0
-PROTOBUF_METADATA_MAGIC = 0x1F4812BE
-PROTOBUF_SIGNATURE_MAGIC = 0x1B81B817
-PROTOBUF_ENDOFMANIFEST_MAGIC = 0x32C415AB
+MIN_MAPPINGS_PER_SHARD = 10_000
+"Shards smaller than this aren't worth sending to another process"
+
+_pool: ProcessPoolExecutor | None = None
+"Shared by every sharded decrypt, so they queue up instead of each spawning a pool"
+_pool_lock = threading.Lock()
 
 
 def decrypt_filename(b64_encrypted_name: str, key_bytes: bytes) -> str:
@@ -55,28 +74,157 @@ def decrypt_filename(b64_encrypted_name: str, key_bytes: bytes) -> str:
         return b64_encrypted_name
 
 
-def view_manifest(manifest_file: bytes, show_chunk_data: bool = False):
-    """View contents of a manifest file. Does not decrypt"""
+def decrypt_filenames(b64_encrypted_names: list[str], key_bytes: bytes) -> list[str]:
+    """Batched version of `decrypt_filename` for whole manifests.
 
-    stream = io.BytesIO(manifest_file)
-
-    magic, payload_length = struct.unpack("<II", stream.read(8))
-    if magic != PROTOBUF_PAYLOAD_MAGIC:
-        raise ValueError("Bad payload magic")
-    payload_bytes = stream.read(payload_length)
+    All names are decrypted with a single ECB call over one concatenated buffer,
+    then the CBC chaining is undone with one XOR over the whole thing. Names that
+    fail to decrypt are returned as-is, same as `decrypt_filename`.
+    """
+    block = AES.block_size
+    results = list(b64_encrypted_names)
+    # (index in results, offset in the concatenated buffer, length)
+    spans: list[tuple[int, int, int]] = []
+    blobs: list[bytes] = []
+    offset = 0
+    for i, name in enumerate(b64_encrypted_names):
+        try:
+            decoded_data = base64.b64decode(name)
+        except Exception:
+            continue
+        # Needs an IV block and at least one ciphertext block
+        if len(decoded_data) < block * 2 or len(decoded_data) % block:
+            continue
+        spans.append((i, offset, len(decoded_data)))
+        blobs.append(decoded_data)
+        offset += len(decoded_data)
+    if not spans:
+        return results
+
+    # Decrypts the IVs and the ciphertext blocks in one go
+    encrypted = b"".join(blobs)
+    decrypted = AES.new(key_bytes, AES.MODE_ECB).decrypt(encrypted)  # type: ignore
+
+    # CBC: plaintext block = decrypted block XOR previous ciphertext block,
+    # and the first block uses the real IV (the decrypted first block)
+    masks: list[bytes] = []
+    for _, start, length in spans:
+        masks.append(decrypted[start : start + block])
+        masks.append(encrypted[start + block : start + length - block])
+    mask = b"".join(masks)
+    with memoryview(decrypted) as view:
+        ciphertext = b"".join(
+            view[start + block : start + length] for _, start, length in spans
+        )
+    plaintext = (
+        int.from_bytes(ciphertext) ^ int.from_bytes(mask)
+    ).to_bytes(len(ciphertext))
+
+    pos = 0
+    for i, _, length in spans:
+        end = pos + length - block
+        # PKCS#7 unpad, same checks as Crypto.Util.Padding.unpad
+        padding = plaintext[end - 1]
+        padding_ok = 0 < padding <= block and plaintext.endswith(
+            bytes([padding]) * padding, pos, end
+        )
+        if padding_ok:
+            unpadded = plaintext[pos : end - padding]
+            try:
+                results[i] = unpadded.rstrip(b"\x00").decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        pos = end
+    return results
+
+
+def _decrypt_payload(payload_bytes: bytes | memoryview, key_bytes: bytes) -> bytes:
+    """Decrypts the filenames and linktargets of a serialized ContentManifestPayload
+    (or a shard of one) and returns it serialized again.
+    The mappings are edited in place, so the chunks never get copied"""
+    payload = ContentManifestPayload()
+    payload.ParseFromString(payload_bytes)  # type: ignore
+
+    # Decrypt filenames and linktargets (if they exist) in bulk
+    mappings = payload.mappings
+    filenames = decrypt_filenames([x.filename for x in mappings], key_bytes)
+    for mapping, filename in zip(mappings, filenames):
+        mapping.filename = filename
+    linked = [x for x in mappings if x.linktarget]
+    linktargets = decrypt_filenames([x.linktarget for x in linked], key_bytes)
+    for mapping, linktarget in zip(linked, linktargets):
+        mapping.linktarget = linktarget
+
+    return payload.SerializeToString()
+
+
+def _decrypt_payload_sharded(
+    payload: memoryview,
+    mapping_spans: list[tuple[int, int]],
+    key_bytes: bytes,
+    workers: int,
+) -> bytes:
+    """Splits the mappings between multiple processes.
+    The payload only has the repeated `mappings` field, so the serialized shards
+    can just be stitched back together in order."""
+    per_shard = math.ceil(len(mapping_spans) / workers)
+    shards: list[bytes] = []
+    for i in range(0, len(mapping_spans), per_shard):
+        group = mapping_spans[i : i + per_shard]
+        shards.append(bytes(payload[group[0][0] : group[-1][1]]))
+    pool = _get_pool()
+    try:
+        return b"".join(pool.map(_decrypt_payload, shards, repeat(key_bytes)))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The process pool, started the first time it's needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn since this can get called from the manifest download threads
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drops a pool whose processes died, the next decrypt starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _decrypt_workers(mapping_count: int, threshold: int | None) -> int:
+    """How many processes to use for a manifest. 1 means don't use a pool"""
+    if threshold is None:
+        threshold = resolve_parallel_decrypt_threshold()
+    if threshold == 0 or mapping_count < threshold:
+        return 1
+    return max(
+        1,
+        min(os.cpu_count() or 1, math.ceil(mapping_count / MIN_MAPPINGS_PER_SHARD)),
+    )
 
-    magic, metadata_length = struct.unpack("<II", stream.read(8))
-    if magic != PROTOBUF_METADATA_MAGIC:
-        raise ValueError("Bad metadata magic")
-    metadata_bytes = stream.read(metadata_length)
 
-    magic, metadata_length = struct.unpack("<II", stream.read(8))
-    if magic != PROTOBUF_SIGNATURE_MAGIC:
-        raise ValueError("Bad signature magic")
-    signature_bytes = stream.read(metadata_length)
+def view_manifest(manifest_file: ManifestSource, show_chunk_data: bool = False):
+    """View contents of a manifest file. Does not decrypt"""
 
     original_payload = ContentManifestPayload()
-    original_payload.ParseFromString(payload_bytes)
+    metadata = ContentManifestMetadata()
+    signature = ContentManifestSignature()
+    with open_manifest(manifest_file) as sections:
+        original_payload.ParseFromString(sections.payload)  # type: ignore
+        metadata.ParseFromString(sections.metadata)  # type: ignore
+        if sections.signature is not None:
+            signature.ParseFromString(sections.signature)  # type: ignore
 
     print(f"{len(original_payload.mappings)} file mappings found.")
 
@@ -97,9 +245,6 @@ def view_manifest(manifest_file: bytes, show_chunk_data: bool = False):
                     f"Offset: {chunk.offset}\n"
                     f"CB Original: {chunk.cb_original}\n"
                     f"CB Compressed: {chunk.cb_compressed}")
-    # Update and re-serialize the metadata
-    metadata = ContentManifestMetadata()
-    metadata.ParseFromString(metadata_bytes)
     print("METADATA")
     print(f"\n---\nDepot ID: {metadata.depot_id}\n"
           f"Manifest ID: {metadata.gid_manifest}\n"
@@ -111,77 +256,65 @@ def view_manifest(manifest_file: bytes, show_chunk_data: bool = False):
           f"CRC (Encrypted): {hex(metadata.crc_encrypted)[2:]}\n"
           f"CRC (Clear): {hex(metadata.crc_clear)[2:]}\n"
           "---\n")
-    signature = ContentManifestSignature()
-    signature.ParseFromString(signature_bytes)
     print(
         f"Signature: {signature.signature.hex() if signature.signature else 'Missing'}"
     )
 
 
 def decrypt_and_save_manifest(
-    encrypted_file: bytes, output_filepath: Path, dec_key: str
+    encrypted_file: ManifestSource,
+    output_filepath: Path,
+    dec_key: str,
+    parallel_threshold: int | None = None,
 ):
     """Decrypts a manifest file, given a decryption key
 
     Args:
-        encrypted_file (io.BytesIO): The encrypted manifest file
+        encrypted_file (bytes | Path): The encrypted manifest file. Can be zipped
         output_filepath (Path): Where you want the decrypted file to go
         dec_key (str): The decryption key as a hex string
+        parallel_threshold (int | None): Mapping count where decryption gets split
+            between processes. 0 disables it, None uses the setting
     """
-    # Check if it's a ZIP file, then extract the first file
-    if x := read_nth_file_from_zip_bytes(0, encrypted_file):
-        stream = x
-    else:
-        stream = io.BytesIO(encrypted_file)
-
-    magic, payload_length = struct.unpack("<II", stream.read(8))
-    if magic != PROTOBUF_PAYLOAD_MAGIC:
-        raise ValueError("Bad payload magic")
-    payload_bytes = stream.read(payload_length)
-
-    magic, metadata_length = struct.unpack("<II", stream.read(8))
-    if magic != PROTOBUF_METADATA_MAGIC:
-        raise ValueError("Bad metadata magic")
-    metadata_bytes = stream.read(metadata_length)
-
-    original_payload = ContentManifestPayload()
-    original_payload.ParseFromString(payload_bytes)
-
-    print(
-        f"Decrypting {len(original_payload.mappings)} file mappings... ",
-        end="",
-        flush=True,
-    )
-
-    # Decrypt filenames
     key_bytes = bytes.fromhex(dec_key)
-    new_mappings: list[ContentManifestPayload.FileMapping] = []
-    for mapping in original_payload.mappings:
-        new_mapping = ContentManifestPayload.FileMapping()
-        new_mapping.CopyFrom(mapping)
-
-        # Decrypt filename and linktarget if they exist
-        new_mapping.filename = decrypt_filename(mapping.filename, key_bytes)
-        if mapping.linktarget:
-            new_mapping.linktarget = decrypt_filename(mapping.linktarget, key_bytes)
+    metadata = ContentManifestMetadata()
+    with open_manifest(encrypted_file, require_signature=False) as sections:
+        metadata.ParseFromString(sections.metadata)  # type: ignore
+        # FileMapping is field 1 of ContentManifestPayload
+        mapping_spans = [
+            (start, end)
+            for field, start, end in split_fields(sections.payload)
+            if field == 1
+        ]
+        workers = _decrypt_workers(len(mapping_spans), parallel_threshold)
+
+        print(
+            f"Decrypting {len(mapping_spans)} file mappings"
+            + (f" with {workers} processes" if workers > 1 else "")
+            + "... ",
+            end="",
+            flush=True,
+        )
+        fixed_payload_bytes = None
+        if workers > 1:
+            try:
+                fixed_payload_bytes = _decrypt_payload_sharded(
+                    sections.payload, mapping_spans, key_bytes, workers
+                )
+            except Exception:
+                logger.exception("Multi-core decryption failed, using one core")
+        if fixed_payload_bytes is None:
+            fixed_payload_bytes = _decrypt_payload(sections.payload, key_bytes)
 
-        new_mappings.append(new_mapping)
     print("Done!")
 
-    # Create the new payload object with the sorted, decrypted data
-    fixed_payload = ContentManifestPayload()
-    fixed_payload.mappings.extend(new_mappings)
-
-    # Serialize the new payload and recalculate crc_clear
-    fixed_payload_bytes = fixed_payload.SerializeToString()
+    # Recalculate crc_clear
     length_bytes = struct.pack("<I", len(fixed_payload_bytes))
     data_to_checksum = length_bytes + fixed_payload_bytes
     new_crc = zlib.crc32(data_to_checksum) & 0xFFFFFFFF
     print(f"Recalculated CRC-32 checksum of decrypted data: {hex(new_crc)[2:]}")
 
     # Update and re-serialize the metadata
-    metadata = ContentManifestMetadata()
-    metadata.ParseFromString(metadata_bytes)
     metadata.crc_clear = new_crc
     metadata.filenames_encrypted = False  # Mark the filenames as decrypted
     fixed_metadata_bytes = metadata.SerializeToString()
@@ -208,6 +341,5 @@ def decrypt_and_save_manifest(
 
 if __name__ == "__main__":
     file_a = Path(r"C:\GAMES\Steam\depotcache\1392821_4740032384826825263.manifest")
-    with file_a.open("rb") as f:
-        print(f"Reading {file_a.name}")
-        view_manifest(f.read())
+    print(f"Reading {file_a.name}")
+    view_manifest(file_a)
@@ -1,16 +1,16 @@
-import asyncio
 import logging
-import shutil
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, cast
 from urllib.parse import urljoin
 
 import gevent
 from colorama import Fore, Style
+from rich.progress import Progress, SpinnerColumn, TextColumn
 from steam.client.cdn import CDNClient, ContentServer  # type: ignore
 
-from smd.http_utils import get_gmrc, get_request_raw
+from smd.http_clients import run_async
+from smd.http_utils import get_gmrc, get_gmrcs, get_request_raw
 from smd.manifest.crypto import decrypt_and_save_manifest
 from smd.manifest.id_resolver import (
     IManifestStrategy,
@@ -19,18 +19,22 @@ from smd.manifest.id_resolver import (
     ManifestIDResolver,
     ManualManifestStrategy,
     SharedDepotManifestStrategy,
+    SkipManifestStrategy,
     StandardManifestStrategy,
 )
+from smd.manifest.store import ManifestStore
 from smd.prompts import prompt_select, prompt_text
 from smd.steam_client import SteamInfoProvider, get_product_info
-from smd.storage.settings import resolve_morrenus_key
+from smd.storage.settings import resolve_manifest_workers, resolve_morrenus_key
 from smd.strings import MORRENUS_BASE_URL
 from smd.structs import (  # type: ignore
+    BatchManifestResult,
     DepotManifestMap,
     LuaParsedInfo,
     ManifestGetModes,
+    ManifestJob,
 )
-from smd.zip import read_nth_file_from_zip_bytes
+from smd.zip import extract_nth_file_from_zip_bytes
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +43,7 @@ class ManifestDownloader:
     def __init__(self, provider: SteamInfoProvider, steam_path: Path):
         self.steam_path = steam_path
         self.provider = provider
+        self.store = ManifestStore.default()
 
     def get_dlc_manifest_status(self, depot_ids: list[int]):
         # A dict of Depot IDs mapped to Manifest IDs
@@ -57,23 +62,28 @@ class ManifestDownloader:
                     .get("public", {})
                     .get("gid")
                 )
-                if manifest is not None:
-                    print(f"Depot {depot_id} has manifest {manifest}")
+                if manifest is None:
+                    manifest_ids[depot_id] = False
+                    continue
+                print(f"Depot {depot_id} has manifest {manifest}")
                 manifest_file = (
                     self.steam_path / f"depotcache/{depot_id}_{manifest}.manifest"
                 )
-                manifest_ids[depot_id] = manifest_file.exists()
+                manifest_ids[depot_id] = self._restore_from_store(
+                    str(depot_id), str(manifest), manifest_file
+                ) or manifest_file.exists()
             break
         return manifest_ids
 
     def get_manifest_ids(
-        self, lua: LuaParsedInfo, auto: bool = False
+        self, lua: LuaParsedInfo, auto: bool = False, interactive: bool = True
     ) -> DepotManifestMap:
-        """Returns a dict of depot IDs mapped to manifest IDs"""
+        """Returns a dict of depot IDs mapped to manifest IDs.
+        Non-interactive skips depots that the auto methods can't find"""
         # A dict of Depot IDs mapped to Manifest IDs
         manifest_ids: dict[str, str] = {}
         app_id = int(lua.app_id)
-        if not auto:
+        if not auto and interactive:
             mode = prompt_select(
                 "How would you like to obtain the manifest ID?",
                 list(ManifestGetModes),
@@ -99,7 +109,9 @@ class ManifestDownloader:
             strats.append(StandardManifestStrategy())
             strats.append(SharedDepotManifestStrategy())
             strats.append(InnerDepotManifestStrategy())
-        strats.append(ManualManifestStrategy())
+        strats.append(
+            ManualManifestStrategy() if interactive else SkipManifestStrategy()
+        )
 
         resolver = ManifestIDResolver(strats)
 
@@ -138,12 +150,18 @@ class ManifestDownloader:
         return get_request_raw(url)
 
     def download_single_manifest(
-        self, depot_id: str, manifest_id: str, cdn_client: CDNClient | None = None
+        self,
+        depot_id: str,
+        manifest_id: str,
+        cdn_client: CDNClient | None = None,
+        req_code: str | None = None,
     ) -> tuple[bytes | None, bool]:
-        """Returns (encrypted manifest file as bytes, is_zipped (direct from Steam) )"""
+        """Returns (encrypted manifest file as bytes, is_zipped (direct from Steam) )
+        Pass in `req_code` if it was already resolved (e.g. via resolve_gmrcs)"""
         if cdn_client is None:
             cdn_client = self.get_cdn_client()
-        req_code = self.resolve_gmrc(manifest_id)
+        if req_code is None:
+            req_code = self.resolve_gmrc(manifest_id)
         if req_code is None:
             print("Failed to get request code. Trying Morrenus... ", end="", flush=True)
             manifest = self.download_morrenus_manifest(depot_id, manifest_id)
@@ -152,18 +170,29 @@ class ManifestDownloader:
                 return manifest, False
             print("Failed!")
             return manifest, False
-        cdn_server = cast(ContentServer, cdn_client.get_content_server())
-        cdn_server_name = f"http{'s' if cdn_server.https else ''}://{cdn_server.host}"
-        manifest_url = urljoin(
-            cdn_server_name, f"depot/{depot_id}/manifest/{manifest_id}/5/{req_code}"
-        )
+        manifest_url = self._manifest_url(cdn_client, depot_id, manifest_id, req_code)
 
         logger.debug(f"Download manifest from {manifest_url}")
         return get_request_raw(manifest_url), True
 
+    def resolve_gmrcs(self, manifest_ids: list[str]) -> dict[str, str | None]:
+        """Resolves the request codes of several manifests in one batch.
+        Manifests mapped to None failed and should go through resolve_gmrc"""
+        if not manifest_ids:
+            return {}
+        print(
+            f"Getting request codes for {len(manifest_ids)} manifest(s)... ",
+            end="",
+            flush=True,
+        )
+        req_codes = run_async(get_gmrcs(manifest_ids))
+        resolved = sum(x is not None for x in req_codes.values())
+        print(f"{resolved}/{len(req_codes)} found")
+        return req_codes
+
     def resolve_gmrc(self, manifest_id: str):
         while True:
-            req_code = asyncio.run(get_gmrc(manifest_id))
+            req_code = run_async(get_gmrc(manifest_id))
             if req_code is not None:
                 print(f"Request code is: {req_code}")
                 break
@@ -187,30 +216,181 @@ class ManifestDownloader:
         return req_code
 
     def download_workshop_item(self, app_id: str, ugc_id: str, out_dir: Path | None = None):
+        depotcache = self.steam_path / "depotcache"
+        depotcache.mkdir(exist_ok=True)
+        final_manifest_loc = (out_dir if out_dir else depotcache) / f"{app_id}_{ugc_id}.manifest"
+        if self.store.materialize(app_id, ugc_id, final_manifest_loc):
+            print("Workshop item manifest was already downloaded before.")
+            return final_manifest_loc
         manifest, is_zipped = self.download_single_manifest(app_id, ugc_id)
         if manifest:
-            if is_zipped:
-                extracted = read_nth_file_from_zip_bytes(0, manifest)
-                if not extracted:
-                    raise Exception("File isn't a ZIP. This shouldn't happen.")
-            else:
-                extracted = BytesIO(manifest)
-            depotcache = self.steam_path / "depotcache"
-            depotcache.mkdir(exist_ok=True)
-            final_manifest_loc = (out_dir if out_dir else depotcache) / f"{app_id}_{ugc_id}.manifest"
-            with final_manifest_loc.open("wb") as f:
-                f.write(extracted.read())
+            self._write_manifest(manifest, is_zipped, final_manifest_loc)
+            self.store.add(final_manifest_loc, app_id, ugc_id)
             return final_manifest_loc
 
-    def download_manifests(
-        self, lua: LuaParsedInfo, decrypt: bool = False, auto_manifest: bool = False
+    def _manifest_url(
+        self, cdn_client: CDNClient, depot_id: str, manifest_id: str, req_code: str
     ):
-        """Gets latest manifest IDs and downloads respective manifests to depotcache folder"""
-        cdn = self.get_cdn_client()
-        manifest_ids = self.get_manifest_ids(lua, auto_manifest)
+        cdn_server = cast(ContentServer, cdn_client.get_content_server())
+        cdn_server_name = f"http{'s' if cdn_server.https else ''}://{cdn_server.host}"
+        return urljoin(
+            cdn_server_name, f"depot/{depot_id}/manifest/{manifest_id}/5/{req_code}"
+        )
+
+    def _write_manifest(self, manifest: bytes, is_zipped: bool, dest: Path):
+        """Writes a downloaded manifest as-is, unzipping it on the way if needed"""
+        # could be a hardlink to the manifest store
+        dest.unlink(missing_ok=True)
+        if is_zipped:
+            if not extract_nth_file_from_zip_bytes(0, manifest, dest):
+                raise Exception("File isn't a ZIP. This shouldn't happen.")
+        else:
+            dest.write_bytes(manifest)
+
+    def _save_manifest(
+        self, manifest: bytes, is_zipped: bool, job: ManifestJob, decrypt: bool
+    ):
+        if not decrypt:
+            self._write_manifest(manifest, is_zipped, job.dest)
+            self.store.add(job.dest, job.depot_id, job.manifest_id)
+            return
+        # Keep the original too, so it never has to be downloaded again
+        original = job.dest.with_name(job.dest.name + ".original")
+        self._write_manifest(manifest, is_zipped, original)
+        stored = self.store.add(original, job.depot_id, job.manifest_id, move=True)
+        job.dest.unlink(missing_ok=True)  # could be a hardlink to the store
+        decrypt_and_save_manifest(stored, job.dest, job.decryption_key)
+        self.store.add(job.dest, job.depot_id, job.manifest_id, decrypted=True)
+
+    def _restore_from_store(
+        self,
+        depot_id: str,
+        manifest_id: str,
+        dest: Path,
+        decrypt: bool = False,
+        decryption_key: str | None = None,
+    ) -> bool:
+        """Puts an already downloaded manifest at `dest`.
+        If a decrypted one is wanted but only the original is stored, it gets
+        decrypted from there instead of being downloaded again"""
+        if self.store.materialize(depot_id, manifest_id, dest, decrypted=decrypt):
+            return True
+        if not decrypt or decryption_key is None:
+            return False
+        original = self.store.get(depot_id, manifest_id)
+        if original is None:
+            return False
+        dest.unlink(missing_ok=True)
+        decrypt_and_save_manifest(original, dest, decryption_key)
+        self.store.add(dest, depot_id, manifest_id, decrypted=True)
+        return True
+
+    def _download_job_quietly(
+        self,
+        job: ManifestJob,
+        cdn_client: CDNClient,
+        decrypt: bool,
+        req_code: str | None,
+    ) -> bool:
+        """Non-interactive version of the download steps, meant for worker threads.
+        Returns False if the job has to go through the interactive path instead"""
+        if req_code is None:
+            return False
+        manifest_url = self._manifest_url(
+            cdn_client, job.depot_id, job.manifest_id, req_code
+        )
+        logger.debug(f"Download manifest from {manifest_url}")
+        manifest = get_request_raw(manifest_url, interactive=False)
+        if not manifest:
+            return False
+        self._save_manifest(manifest, True, job, decrypt)
+        return True
+
+    def _download_concurrently(
+        self,
+        jobs: list[ManifestJob],
+        cdn_client: CDNClient,
+        decrypt: bool,
+        max_workers: int,
+        req_codes: dict[str, str | None],
+        failed_status: str = "[yellow]Retrying later",
+    ) -> list[ManifestJob]:
+        """Downloads manifests with a pool of worker threads.
+        Returns the jobs that failed"""
+        failed: list[ManifestJob] = []
+        with Progress(
+            SpinnerColumn(finished_text="•"),
+            TextColumn("{task.description}"),
+            TextColumn("{task.fields[status]}"),
+        ) as progress:
+            task_ids = {
+                job.slot: progress.add_task(
+                    f"[cyan]Depot {job.depot_id} - Manifest {job.manifest_id}",
+                    total=1,
+                    status="Queued",
+                )
+                for job in jobs
+            }
+
+            def work(job: ManifestJob) -> bool:
+                task_id = task_ids[job.slot]
+                progress.update(task_id, status="Downloading...")
+                try:
+                    success = self._download_job_quietly(
+                        job, cdn_client, decrypt, req_codes.get(job.manifest_id)
+                    )
+                except Exception:
+                    logger.exception(f"Concurrent download of {job} failed")
+                    success = False
+                progress.update(
+                    task_id,
+                    completed=1,
+                    status="[green]Done" if success else failed_status,
+                )
+                return success
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {pool.submit(work, job): job for job in jobs}
+                for future in as_completed(futures):
+                    if not future.result():
+                        failed.append(futures[future])
+        failed.sort(key=lambda x: x.slot)
+        return failed
 
-        manifest_paths: list[Path] = []
-        # Download and decrypt manifests
+    def _download_job(
+        self,
+        job: ManifestJob,
+        cdn_client: CDNClient,
+        decrypt: bool,
+        req_code: str | None = None,
+    ) -> bool:
+        """Interactive download steps for a single manifest"""
+        print(
+            Fore.CYAN
+            + f"\nDepot {job.depot_id} - Manifest {job.manifest_id}"
+            + Style.RESET_ALL
+        )
+        manifest, is_zipped = self.download_single_manifest(
+            job.depot_id, job.manifest_id, cdn_client, req_code
+        )
+        if not manifest:
+            return False
+        self._save_manifest(manifest, is_zipped, job, decrypt)
+        return True
+
+    def _plan_jobs(
+        self,
+        lua: LuaParsedInfo,
+        manifest_ids: DepotManifestMap,
+        manifest_paths: list[Path | None],
+        decrypt: bool,
+    ) -> list[ManifestJob]:
+        """Reuses manifests that are already around and makes jobs for the rest.
+        Appends to `manifest_paths` (None for the ones that need downloading)"""
+        depotcache = self.steam_path / "depotcache"
+        depotcache.mkdir(exist_ok=True)
+
+        jobs: list[ManifestJob] = []
         for pair in lua.depots:
             depot_id = pair.depot_id
             dec_key = pair.decryption_key
@@ -220,41 +400,137 @@ class ManifestDownloader:
             manifest_id = manifest_ids.get(depot_id)
             if manifest_id is None:
                 continue
-            print(
-                Fore.CYAN
-                + f"\nDepot {depot_id} - Manifest {manifest_id}"
-                + Style.RESET_ALL
-            )
 
             possible_saved_manifest = (
                 Path.cwd() / f"manifests/{depot_id}_{manifest_id}.manifest"
             )
-            depotcache = self.steam_path / "depotcache"
-            depotcache.mkdir(exist_ok=True)
             final_manifest_loc = depotcache / f"{depot_id}_{manifest_id}.manifest"
 
-            if possible_saved_manifest.exists():
-                print("One of the endpoints had a manifest. Skipping download...")
-                if not final_manifest_loc.exists():
-                    shutil.move(possible_saved_manifest, final_manifest_loc)
+            from_endpoint = possible_saved_manifest.exists()
+            if from_endpoint:
+                print(
+                    f"Depot {depot_id} - One of the endpoints had a manifest. "
+                    "Skipping download..."
+                )
+                self.store.add(
+                    possible_saved_manifest, depot_id, manifest_id, move=True
+                )
+            if self._restore_from_store(
+                depot_id, manifest_id, final_manifest_loc, decrypt, dec_key
+            ):
+                if not from_endpoint:
+                    print(
+                        f"Depot {depot_id} - Manifest was downloaded before. "
+                        "Skipping download..."
+                    )
                 manifest_paths.append(final_manifest_loc)
                 continue
-            manifest, is_zipped = self.download_single_manifest(
-                depot_id, manifest_id, cdn
+            jobs.append(
+                ManifestJob(
+                    len(manifest_paths),
+                    depot_id,
+                    manifest_id,
+                    dec_key,
+                    final_manifest_loc,
+                )
             )
+            manifest_paths.append(None)
+        return jobs
 
-            if manifest:
-                if decrypt:
-                    decrypt_and_save_manifest(manifest, final_manifest_loc, dec_key)
-                else:
-                    if is_zipped:
-                        extracted = read_nth_file_from_zip_bytes(0, manifest)
-                        if not extracted:
-                            raise Exception("File isn't a ZIP. This shouldn't happen.")
-                    else:
-                        extracted = BytesIO(manifest)
-                    with final_manifest_loc.open("wb") as f:
-                        f.write(extracted.read())
+    def download_manifests(
+        self,
+        lua: LuaParsedInfo,
+        decrypt: bool = False,
+        auto_manifest: bool = False,
+        max_workers: int | None = None,
+    ):
+        """Gets latest manifest IDs and downloads respective manifests to
+        depotcache folder. `max_workers` is how many manifests get downloaded
+        at once, defaults to the Manifest Download Workers setting"""
+        cdn = self.get_cdn_client()
+        manifest_ids = self.get_manifest_ids(lua, auto_manifest)
 
-                manifest_paths.append(final_manifest_loc)
-        return manifest_paths
+        # None for manifests that still have to be downloaded
+        manifest_paths: list[Path | None] = []
+        jobs = self._plan_jobs(lua, manifest_ids, manifest_paths, decrypt)
+
+        if max_workers is None:
+            max_workers = resolve_manifest_workers()
+
+        req_codes = self.resolve_gmrcs([job.manifest_id for job in jobs])
+
+        remaining = jobs
+        if max_workers > 1 and len(jobs) > 1:
+            remaining = self._download_concurrently(
+                jobs, cdn, decrypt, max_workers, req_codes
+            )
+            done = set(jobs) - set(remaining)
+            for job in done:
+                manifest_paths[job.slot] = job.dest
+            if remaining:
+                print(
+                    Fore.YELLOW
+                    + f"{len(remaining)} manifest(s) need extra steps."
+                    + Style.RESET_ALL
+                )
+
+        for job in remaining:
+            if self._download_job(job, cdn, decrypt, req_codes.get(job.manifest_id)):
+                manifest_paths[job.slot] = job.dest
+
+        return [x for x in manifest_paths if x is not None]
+
+    def download_manifests_batch(
+        self,
+        luas: list[LuaParsedInfo],
+        decrypt: bool = False,
+        max_workers: int | None = None,
+    ) -> dict[str, BatchManifestResult]:
+        """download_manifests for several games at once, without any prompts.
+        Every game's app info comes from one request and all the manifests
+        share the same pool of workers. Results are keyed by app ID"""
+        # Caches them all in one go, get_manifest_ids reads from that cache
+        self.provider.get_app_info([int(x.app_id) for x in luas])
+        cdn = self.get_cdn_client()
+
+        manifest_paths: list[Path | None] = []
+        jobs: list[ManifestJob] = []
+        spans: list[tuple[str, int, int]] = []
+        "App ID and the range of manifest_paths that belongs to it"
+        missing: dict[str, list[str]] = {}
+        for lua in luas:
+            print(Fore.CYAN + f"\nApp {lua.app_id}" + Style.RESET_ALL)
+            manifest_ids = self.get_manifest_ids(lua, auto=True, interactive=False)
+            missing[lua.app_id] = [
+                x.depot_id
+                for x in lua.depots
+                if x.decryption_key
+                and x.depot_id != lua.app_id
+                and x.depot_id not in manifest_ids
+            ]
+            start = len(manifest_paths)
+            jobs.extend(self._plan_jobs(lua, manifest_ids, manifest_paths, decrypt))
+            spans.append((lua.app_id, start, len(manifest_paths)))
+
+        if max_workers is None:
+            max_workers = resolve_manifest_workers()
+
+        failed: list[ManifestJob] = []
+        if jobs:
+            req_codes = self.resolve_gmrcs([job.manifest_id for job in jobs])
+            failed = self._download_concurrently(
+                jobs, cdn, decrypt, max(max_workers, 1), req_codes, "[red]Failed"
+            )
+        failed_slots = {job.slot: job.depot_id for job in failed}
+        for job in jobs:
+            if job.slot not in failed_slots:
+                manifest_paths[job.slot] = job.dest
+
+        return {
+            app_id: BatchManifestResult(
+                [x for x in manifest_paths[start:end] if x is not None],
+                missing[app_id]
+                + [failed_slots[x] for x in range(start, end) if x in failed_slots],
+            )
+            for app_id, start, end in spans
+        }
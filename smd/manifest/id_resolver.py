@@ -116,6 +116,25 @@ class ManualManifestStrategy(IManifestStrategy):
         return prompt_text(f"Depot {depot_id}: ").strip()
 
 
+class SkipManifestStrategy(ManualManifestStrategy):
+    """Takes the place of ManualManifestStrategy when nobody is there to type
+    the ID in. Depots that get here are skipped"""
+
+    @property
+    def name(self):
+        return "Skipped"
+
+    def get_manifest_id(self, ctx: ManifestContext, depot_id: str) -> str | None:
+        if ctx.app_id == int(depot_id):
+            return super().get_manifest_id(ctx, depot_id)
+        print(
+            Fore.YELLOW
+            + f"Could not find the manifest ID of depot {depot_id}. Skipping..."
+            + Style.RESET_ALL
+        )
+        return ""
+
+
 class ManifestIDResolver:
     def __init__(self, strategies: list[IManifestStrategy]):
         self.strategies = strategies
@@ -0,0 +1,170 @@
+"""Zero-copy access to the sections of a manifest file"""
+
+import mmap
+import struct
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple
+
+# Magic numbers
+PROTOBUF_PAYLOAD_MAGIC = 0x71F617D0
+PROTOBUF_METADATA_MAGIC = 0x1F4812BE
+PROTOBUF_SIGNATURE_MAGIC = 0x1B81B817
+PROTOBUF_ENDOFMANIFEST_MAGIC = 0x32C415AB
+
+_SECTION_HEADER = struct.Struct("<II")
+_ZIP_MAGIC = b"PK\x03\x04"
+
+ManifestSource = bytes | Path
+"Raw/zipped manifest bytes, or the path to a manifest file"
+
+
+class ManifestSections(NamedTuple):
+    """Views into the buffer a manifest was loaded into. Nothing is copied"""
+
+    payload: memoryview
+    metadata: memoryview
+    signature: memoryview | None
+    "None if the manifest ends right after the metadata"
+
+
+def _read_section(
+    view: memoryview, offset: int, magic: int, name: str
+) -> tuple[memoryview, int]:
+    if offset + _SECTION_HEADER.size > len(view):
+        raise ValueError(f"Manifest ends before the {name} section")
+    found_magic, length = _SECTION_HEADER.unpack_from(view, offset)
+    if found_magic != magic:
+        raise ValueError(f"Bad {name} magic")
+    start = offset + _SECTION_HEADER.size
+    end = start + length
+    if end > len(view):
+        raise ValueError(f"{name.capitalize()} section is truncated")
+    return view[start:end], end
+
+
+def parse_sections(
+    buffer: bytes | bytearray | memoryview | mmap.mmap, require_signature: bool = True
+) -> ManifestSections:
+    """Finds the payload, metadata and signature sections of a manifest"""
+    sections: list[memoryview] = []
+    with memoryview(buffer) as view:
+        offset = 0
+        try:
+            for magic, name in (
+                (PROTOBUF_PAYLOAD_MAGIC, "payload"),
+                (PROTOBUF_METADATA_MAGIC, "metadata"),
+                (PROTOBUF_SIGNATURE_MAGIC, "signature"),
+            ):
+                if name == "signature" and not require_signature:
+                    if offset == len(view):
+                        break
+                section, offset = _read_section(view, offset, magic, name)
+                sections.append(section)
+        except ValueError:
+            # don't leave anything pointing at the buffer so it can be closed
+            for section in sections:
+                section.release()
+            raise
+    return ManifestSections(
+        sections[0], sections[1], sections[2] if len(sections) > 2 else None
+    )
+
+
+def _read_zip_member(source: ManifestSource, nth: int = 0) -> bytearray | None:
+    """Inflates a ZIP member straight into a single preallocated buffer.
+    Returns None if it's an invalid ZIP file"""
+    try:
+        file = source if isinstance(source, Path) else BytesIO(source)
+        with zipfile.ZipFile(file) as f:
+            info = f.filelist[nth]
+            out = bytearray(info.file_size)
+            with memoryview(out) as view, f.open(info) as member:
+                pos = 0
+                while pos < len(out):
+                    read = member.readinto(view[pos:])  # type: ignore
+                    if not read:
+                        raise ValueError("ZIP member is shorter than expected")
+                    pos += read
+            return out
+    except zipfile.BadZipFile:
+        return
+
+
+@contextmanager
+def open_manifest(
+    source: ManifestSource, require_signature: bool = True
+) -> Iterator[ManifestSections]:
+    """Loads a manifest into one buffer and yields views of its sections.
+
+    Paths get memory mapped. ZIPs (like the ones from the manifest endpoints) are
+    extracted once. The views are only valid inside the `with` block."""
+    mapped: mmap.mmap | None = None
+    buffer: bytes | bytearray | mmap.mmap = b""
+    if isinstance(source, Path):
+        with source.open("rb") as f:
+            is_zip = f.read(4) == _ZIP_MAGIC
+            if not is_zip and source.stat().st_size > 0:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                buffer = mapped
+    else:
+        is_zip = source[:4] == _ZIP_MAGIC
+        buffer = source
+    if is_zip:
+        extracted = _read_zip_member(source)
+        if extracted is not None:
+            buffer = extracted
+        elif isinstance(source, Path):
+            buffer = source.read_bytes()
+
+    try:
+        sections = parse_sections(buffer, require_signature)
+        try:
+            yield sections
+        finally:
+            for view in sections:
+                if view is not None:
+                    view.release()
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def _read_varint(view: memoryview, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def split_fields(message: memoryview) -> list[tuple[int, int, int]]:
+    """Finds the top level fields of a serialized protobuf message without
+    parsing it. Returns (field number, start, end) for each field"""
+    fields: list[tuple[int, int, int]] = []
+    pos = 0
+    while pos < len(message):
+        start = pos
+        tag, pos = _read_varint(message, pos)
+        wire_type = tag & 0x7
+        if wire_type == 0:
+            _, pos = _read_varint(message, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(message, pos)
+            pos += length
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        if pos > len(message):
+            raise ValueError("Message is truncated")
+        fields.append((tag >> 3, start, pos))
+    return fields
@@ -0,0 +1,228 @@
+"""Content-addressed storage for every manifest SMD has downloaded"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, ClassVar, NamedTuple, cast
+
+import msgpack  # type: ignore
+
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_STORE_DIR = root_folder(outside_internal=True) / "manifest_store"
+_FORMAT_VERSION = 2
+_COMPACT_SLACK = 256
+"Records the index file can have on top of the live entries before a rewrite"
+
+
+class StoredManifest(NamedTuple):
+    sha256: str
+    "Hash of the file contents, also its name in the store"
+    size: int
+
+
+StoreKey = tuple[str, str, bool]
+"(Depot ID, Manifest ID, decrypted by SMD)"
+
+
+def _hash_file(path: Path) -> str:
+    sha = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(1 << 20):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:  # other drive, FAT32, no permission, etc
+        shutil.copyfile(src, dest)
+
+
+class ManifestStore:
+    """Manifests keyed by (depot ID, manifest ID, decrypted) -> sha256.
+    Files are only stored once and get hardlinked (or copied) to wherever
+    they're needed. Never write to a materialized file without unlinking it
+    first, or the stored copy gets overwritten too.
+
+    The index file is a header followed by one msgpack record per change, so
+    adding a manifest only appends to it. It gets rewritten once the old
+    records pile up."""
+
+    _default: ClassVar["ManifestStore | None"] = None
+
+    def __init__(self, folder: Path = MANIFEST_STORE_DIR):
+        self.folder = folder
+        self.objects = folder / "objects"
+        self.index_file = folder / "index.bin"
+        self.index: dict[StoreKey, StoredManifest] = {}
+        self._records = 0
+        "How many records are in the index file, replaced ones included"
+        self._verified: set[str] = set()
+        "Hashes of objects that were checked against their contents"
+        self._lock = threading.RLock()
+        self._load()
+
+    @classmethod
+    def default(cls) -> "ManifestStore":
+        """The store shared by everything in this process"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def _apply(self, record: list[Any]):
+        depot_id, manifest_id, decrypted, sha256, size = record
+        key = (depot_id, manifest_id, decrypted)
+        if sha256 is None:
+            self.index.pop(key, None)
+        else:
+            self.index[key] = StoredManifest(sha256, size)
+
+    def _load(self):
+        if not self.index_file.exists():
+            return
+        try:
+            with self.index_file.open("rb") as f:
+                unpacker = msgpack.Unpacker(f)
+                header = cast(dict[str, Any], next(unpacker))
+                version = header.get("version")
+                if version == 1:
+                    # Everything was in the header back then
+                    for record in header["manifests"]:
+                        self._apply(record)
+                    self._rewrite()
+                elif version == _FORMAT_VERSION:
+                    for record in unpacker:
+                        self._apply(record)
+                        self._records += 1
+                else:
+                    logger.debug("Manifest store index has an unknown format")
+        except Exception:
+            # A record cut off by a crash only loses that record
+            logger.exception("Could not read all of the manifest store index")
+        logger.debug(f"Manifest store has {len(self.index)} manifests")
+
+    def _rewrite(self):
+        """Writes the index with only the live entries"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            f.write(msgpack.packb({"version": _FORMAT_VERSION}))  # type: ignore
+            for key, x in self.index.items():
+                f.write(msgpack.packb([*key, x.sha256, x.size]))  # type: ignore
+        os.replace(tmp, self.index_file)
+        self._records = len(self.index)
+
+    def _append(self, key: StoreKey, entry: StoredManifest | None):
+        """Records one change to the index. None means it was removed"""
+        if self._records > 2 * len(self.index) + _COMPACT_SLACK:
+            self._rewrite()
+            return
+        if not self.index_file.exists():
+            self._rewrite()
+            return
+        record = [*key, *(entry if entry is not None else (None, 0))]
+        with self.index_file.open("ab") as f:
+            f.write(msgpack.packb(record))  # type: ignore
+        self._records += 1
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects / sha256[:2] / f"{sha256}.manifest"
+
+    def _intact(self, entry: StoredManifest) -> bool:
+        """Hashes the object the first time it's used in this session"""
+        if entry.sha256 in self._verified:
+            return True
+        path = self._object_path(entry.sha256)
+        try:
+            if path.stat().st_size != entry.size or _hash_file(path) != entry.sha256:
+                return False
+        except FileNotFoundError:
+            return False
+        self._verified.add(entry.sha256)
+        return True
+
+    def _evict(self, sha256: str):
+        """Forgets every key that points at a missing or corrupt object"""
+        self._object_path(sha256).unlink(missing_ok=True)
+        for key in [k for k, v in self.index.items() if v.sha256 == sha256]:
+            logger.debug(f"Stored manifest {key} is missing or corrupt, forgetting it")
+            del self.index[key]
+            self._append(key, None)
+
+    def get(
+        self, depot_id: str, manifest_id: str, decrypted: bool = False
+    ) -> Path | None:
+        """Path of the stored manifest, if it's there and its contents still
+        match their hash"""
+        key = (str(depot_id), str(manifest_id), decrypted)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            if not self._intact(entry):
+                self._evict(entry.sha256)
+                return None
+            return self._object_path(entry.sha256)
+
+    def has(self, depot_id: str, manifest_id: str) -> bool:
+        """Whether any version of the manifest is stored"""
+        return any(
+            self.get(depot_id, manifest_id, decrypted) is not None
+            for decrypted in (False, True)
+        )
+
+    def add(
+        self,
+        path: Path,
+        depot_id: str,
+        manifest_id: str,
+        decrypted: bool = False,
+        move: bool = False,
+    ) -> Path:
+        """Stores a manifest file. If the same contents are already stored,
+        the existing copy is reused. `move` removes the original file"""
+        sha256 = _hash_file(path)
+        obj = self._object_path(sha256)
+        with self._lock:
+            if not obj.exists():
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                tmp = obj.with_name(f"{uuid.uuid4().hex}.tmp")
+                if move:
+                    shutil.move(path, tmp)
+                else:
+                    _link_or_copy(path, tmp)
+                os.replace(tmp, obj)
+            elif move:
+                path.unlink()
+            key = (str(depot_id), str(manifest_id), decrypted)
+            entry = StoredManifest(sha256, obj.stat().st_size)
+            if self.index.get(key) != entry:
+                self.index[key] = entry
+                self._append(key, entry)
+        logger.debug(f"Stored manifest {key} as {sha256}")
+        return obj
+
+    def materialize(
+        self, depot_id: str, manifest_id: str, dest: Path, decrypted: bool = False
+    ) -> bool:
+        """Puts the stored manifest at `dest`. False if it isn't stored"""
+        obj = self.get(depot_id, manifest_id, decrypted)
+        if obj is None:
+            return False
+        try:
+            if dest.exists() and os.path.samefile(obj, dest):
+                return True
+        except OSError:
+            pass
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.unlink(missing_ok=True)
+        _link_or_copy(obj, dest)
+        return True
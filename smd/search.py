@@ -0,0 +1,207 @@
+"""Fuzzy search over the app catalog using a trigram index"""
+
+import heapq
+import logging
+import os
+import re
+import sys
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, NamedTuple, cast
+
+import msgpack  # type: ignore
+
+from smd.storage.app_catalog import AppCatalog
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_FILE = root_folder(outside_internal=True) / "search_index.bin"
+DEFAULT_LIMIT = 20
+MIN_TRIGRAM_RATIO = 0.5
+"Names must share at least this fraction of the query's trigrams to be scored"
+_FORMAT_VERSION = 1
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+class SearchResult(NamedTuple):
+    app_id: int
+    name: str
+    score: float
+
+
+def normalize(text: str) -> str:
+    """Lowercase, no accents, and anything that isn't a letter or number
+    becomes a single space"""
+    text = text.casefold()
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = decomposed.encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(normalized: str, pad_end: bool = True) -> set[str]:
+    padded = f" {normalized} " if pad_end else f" {normalized}"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _to_bytes(postings: array) -> bytes:
+    if sys.byteorder == "big":
+        postings = array(postings.typecode, postings)
+        postings.byteswap()
+    return postings.tobytes()
+
+
+def _from_bytes(raw: bytes) -> array:
+    postings = array("I")
+    postings.frombytes(raw)
+    if sys.byteorder == "big":
+        postings.byteswap()
+    return postings
+
+
+class SearchIndex:
+    """Maps every trigram of every normalized name to the (sorted) positions
+    of the names that contain it. Searching only looks at names that share
+    trigrams with the query instead of the whole list."""
+
+    def __init__(
+        self,
+        app_ids: array,
+        names: list[str],
+        postings: dict[str, array],
+        revision: str = "",
+    ):
+        self.app_ids = app_ids
+        self.names = names
+        self._normalized: dict[int, str] = {}
+        self.postings = postings
+        self.revision = revision
+        "Revision of the AppCatalog this was built from"
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(
+        cls, apps: Iterable[tuple[int, str]], revision: str = ""
+    ) -> "SearchIndex":
+        app_ids = array("I")
+        names: list[str] = []
+        lists: defaultdict[str, list[int]] = defaultdict(list)
+        for pos, (app_id, name) in enumerate(apps):
+            app_ids.append(app_id)
+            names.append(name)
+            for tri in trigrams(normalize(name)):
+                lists[tri].append(pos)
+        postings = {tri: array("I", x) for tri, x in lists.items()}
+        logger.debug(
+            f"Built search index with {len(names)} names, {len(postings)} trigrams"
+        )
+        return cls(app_ids, names, postings, revision)
+
+    @classmethod
+    def load(cls, path: Path = SEARCH_INDEX_FILE) -> "SearchIndex | None":
+        if not path.exists():
+            return None
+        try:
+            raw = cast(dict[str, Any], msgpack.unpackb(path.read_bytes()))
+            if raw.get("version") != _FORMAT_VERSION:
+                logger.debug("Search index has an old format, ignoring it")
+                return None
+            return cls(
+                _from_bytes(raw["app_ids"]),
+                raw["names"],
+                {tri: _from_bytes(x) for tri, x in raw["postings"].items()},
+                raw["revision"],
+            )
+        except Exception:
+            logger.exception("Could not read search index")
+            return None
+
+    def save(self, path: Path = SEARCH_INDEX_FILE):
+        raw = {
+            "version": _FORMAT_VERSION,
+            "revision": self.revision,
+            "app_ids": _to_bytes(self.app_ids),
+            "names": self.names,
+            "postings": {tri: _to_bytes(x) for tri, x in self.postings.items()},
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(msgpack.packb(raw))  # type: ignore
+        os.replace(tmp, path)
+
+    @classmethod
+    def for_catalog(
+        cls, catalog: AppCatalog, path: Path = SEARCH_INDEX_FILE
+    ) -> "SearchIndex":
+        """Loads the saved index, rebuilding it if the catalog changed"""
+        index = cls.load(path)
+        if index is not None and index.revision == catalog.revision:
+            return index
+        print(f"Indexing {len(catalog)} games, only needed when the list changes...")
+        index = cls.build(sorted(catalog.apps.items()), catalog.revision)
+        index.save(path)
+        return index
+
+    def _normalized_name(self, pos: int) -> str:
+        if (name := self._normalized.get(pos)) is None:
+            name = self._normalized[pos] = normalize(self.names[pos])
+        return name
+
+    def _score(self, pos: int, query: str, ratio: float) -> float:
+        name = self._normalized_name(pos)
+        score = ratio
+        if name == query:
+            score += 2
+        elif name.startswith(query):
+            score += 1
+        elif f" {query}" in f" {name}":  # starts at a word
+            score += 0.6
+        elif query in name:
+            score += 0.3
+        # Prefer shorter names (base games over DLC, soundtracks, etc)
+        return score - len(name) / 1000
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[SearchResult]:
+        """Best matches for `query`, best first"""
+        query = normalize(query)
+        if not query:
+            return []
+        query_trigrams = trigrams(query, pad_end=False)
+        if len(query) < 2:
+            # Too short for a trigram, so use every trigram that starts a word
+            # with it instead
+            candidates = {
+                pos: 1.0
+                for tri, postings in self.postings.items()
+                if tri.startswith(f" {query}")
+                for pos in postings
+            }
+        else:
+            counts: Counter[int] = Counter()
+            for tri in query_trigrams:
+                if (postings := self.postings.get(tri)) is not None:
+                    counts.update(postings)
+            needed = max(1, round(len(query_trigrams) * MIN_TRIGRAM_RATIO))
+            candidates = {
+                pos: count / len(query_trigrams)
+                for pos, count in counts.items()
+                if count >= needed
+            }
+        best = heapq.nlargest(
+            limit,
+            candidates,
+            key=lambda pos: self._score(pos, query, candidates[pos]),
+        )
+        return [
+            SearchResult(
+                self.app_ids[pos],
+                self.names[pos],
+                self._score(pos, query, candidates[pos]),
+            )
+            for pos in best
+        ]
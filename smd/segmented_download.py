@@ -0,0 +1,230 @@
+"""Multi-connection downloads, like aria2c/axel but without the binaries"""
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import httpx
+from tqdm import tqdm  # type: ignore
+
+from smd.http_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 16
+"Same as the per-host connection limit of the shared clients"
+MIN_SEGMENT_SIZE = 1024**2
+SEGMENT_ATTEMPTS = 5
+CHUNK_SIZE = 256 * 1024
+SEGMENT_TIMEOUT = httpx.Timeout(10, read=60)
+
+
+class RemoteFile(NamedTuple):
+    url: str
+    "Final URL after redirects"
+    size: int
+    validator: str | None
+    "Strong ETag or Last-Modified, sent in If-Range so segments match"
+
+
+class _PositionalWriter:
+    """Writes at an offset. Uses os.pwrite where it exists (not on Windows),
+    otherwise seeks and writes under a lock"""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.lock = threading.Lock()
+
+    def write_at(self, data: bytes, offset: int):
+        if hasattr(os, "pwrite"):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self.f.fileno(), view, offset)
+                view = view[written:]
+                offset += written
+        else:
+            with self.lock:
+                self.f.seek(offset)
+                self.f.write(data)
+
+
+def probe(url: str, headers: dict[str, str] | None = None) -> RemoteFile | None:
+    """Checks if `url` can be downloaded in ranges. None if it can't"""
+    req_headers = {**(headers or {}), "Range": "bytes=0-0"}
+    try:
+        with get_client(url).stream(
+            "GET", url, headers=req_headers, follow_redirects=True
+        ) as response:
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code != 206 or "/" not in content_range:
+                return None
+            total = content_range.rsplit("/", 1)[1]
+            if not total.isdigit():
+                return None
+            etag = response.headers.get("ETag")
+            validator = (
+                etag
+                if etag and not etag.startswith("W/")
+                else response.headers.get("Last-Modified")
+            )
+            return RemoteFile(str(response.url), int(total), validator)
+    except httpx.HTTPError as e:
+        logger.debug(f"Range probe for {url} failed: {e!r}")
+        return None
+
+
+def _split(size: int, segments: int) -> list[tuple[int, int]]:
+    """Inclusive (start, end) byte ranges"""
+    count = max(1, min(segments, math.ceil(size / MIN_SEGMENT_SIZE)))
+    per_segment = math.ceil(size / count)
+    return [
+        (start, min(start + per_segment, size) - 1)
+        for start in range(0, size, per_segment)
+    ]
+
+
+def _download_segment(
+    remote: RemoteFile,
+    headers: dict[str, str] | None,
+    start: int,
+    end: int,
+    writer: _PositionalWriter,
+    pbar: tqdm,
+    cancelled: threading.Event,
+):
+    pos = start
+    for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+        if cancelled.is_set():
+            return
+        req_headers = {**(headers or {}), "Range": f"bytes={pos}-{end}"}
+        if remote.validator:
+            req_headers["If-Range"] = remote.validator
+        try:
+            with get_client(remote.url).stream(
+                "GET",
+                remote.url,
+                headers=req_headers,
+                follow_redirects=True,
+                timeout=SEGMENT_TIMEOUT,
+            ) as response:
+                content_range = response.headers.get("Content-Range", "")
+                if response.status_code != 206 or not content_range.startswith(
+                    f"bytes {pos}-"
+                ):
+                    # The file changed since the probe, other segments won't match
+                    raise RuntimeError(
+                        f"Server sent {response.status_code} {content_range!r} "
+                        f"for bytes {pos}-{end}"
+                    )
+                for chunk in response.iter_bytes(chunk_size=CHUNK_SIZE):
+                    if cancelled.is_set():
+                        return
+                    chunk = chunk[: end + 1 - pos]
+                    writer.write_at(chunk, pos)
+                    pos += len(chunk)
+                    pbar.update(len(chunk))
+            if pos > end:
+                return
+            logger.debug(f"Segment {start}-{end} ended early at {pos}")
+        except httpx.HTTPError as e:
+            logger.debug(f"Segment {start}-{end} failed at {pos}: {e!r}")
+        if attempt < SEGMENT_ATTEMPTS:
+            time.sleep(min(2**attempt, 10))
+    raise RuntimeError(f"Segment {start}-{end} failed {SEGMENT_ATTEMPTS} times")
+
+
+def download_segmented(
+    remote: RemoteFile,
+    dest: Path,
+    headers: dict[str, str] | None = None,
+    segments: int = DEFAULT_SEGMENTS,
+    desc: str = "Downloading",
+) -> bool:
+    """Downloads a file that was probed with `probe` using several connections.
+    Returns False (and removes `dest`) if it fails"""
+    ranges = _split(remote.size, segments)
+    logger.debug(f"Downloading {remote.url} in {len(ranges)} segments")
+    cancelled = threading.Event()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with dest.open("wb") as f, tqdm(
+            desc=desc,
+            total=remote.size,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+            miniters=1,
+        ) as pbar:
+            f.truncate(remote.size)
+            writer = _PositionalWriter(f)
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [
+                    pool.submit(
+                        _download_segment,
+                        remote,
+                        headers,
+                        start,
+                        end,
+                        writer,
+                        pbar,
+                        cancelled,
+                    )
+                    for start, end in ranges
+                ]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    cancelled.set()
+                    raise
+    except (RuntimeError, OSError) as e:
+        print(f"Download failed: {e}")
+        dest.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    headers: dict[str, str] | None = None,
+    segments: int = DEFAULT_SEGMENTS,
+) -> bool:
+    """Downloads `url` to `dest`, using several connections if the server
+    supports ranges. Returns False if it fails"""
+    remote = probe(url, headers)
+    if remote is not None:
+        return download_segmented(remote, dest, headers, segments)
+
+    logger.debug(f"{url} doesn't support ranges, downloading normally")
+    try:
+        with get_client(url).stream(
+            "GET",
+            url,
+            headers=headers,
+            follow_redirects=True,
+            timeout=SEGMENT_TIMEOUT,
+        ) as response:
+            response.raise_for_status()
+            total = response.headers.get("Content-Length")
+            with dest.open("wb") as f, tqdm(
+                desc="Downloading",
+                total=int(total) if total and total.isdigit() else None,
+                unit="B",
+                unit_scale=True,
+                unit_divisor=1024,
+                miniters=1,
+            ) as pbar:
+                for chunk in response.iter_bytes(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    pbar.update(len(chunk))
+    except httpx.HTTPError as e:
+        print(f"Network error: {e!r}")
+        dest.unlink(missing_ok=True)
+        return False
+    return True
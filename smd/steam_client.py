@@ -1,13 +1,19 @@
 import json
 import logging
 import time
+from collections.abc import Callable
 from dataclasses import dataclass
 from typing import Any, ClassVar
 
 import gevent
+import gevent.lock
+import gevent.pool
 from steam.client import SteamClient  # type: ignore
 
+from smd.storage.product_info import ProductInfoCache
+from smd.storage.settings import get_setting, resolve_product_info_batch_size
 from smd.structs import DLCTypes, ProductInfo  # type: ignore
+from smd.ui.settings.types import Settings
 from smd.utils import enter_path
 
 logger = logging.getLogger(__name__)
@@ -18,36 +24,106 @@ def get_product_info(provider: "SteamInfoProvider", app_ids: list[int]) -> Produ
     return ProductInfo({"apps": provider.get_app_info(app_ids), "packages": {}})
 
 
-def _get_product_info(client: SteamClient, app_ids: list[int]) -> ProductInfo:
-    if len(app_ids) == 0:
-        raise ValueError("app_ids cannot be empty.")
-    if not client.logged_on:
-        print("Logging in anonymously...", end="", flush=True)
-        client.anonymous_login()
-        print(" Done!")
+PRODUCT_INFO_CONCURRENCY = 4
+"Max number of product info batches in flight at once"
+PRODUCT_INFO_MAX_BACKOFF = 30
+"Max seconds to wait before retrying a batch that timed out"
+
+_login_lock = gevent.lock.Semaphore()
+
+
+def _login(client: SteamClient):
+    with _login_lock:
+        if not client.logged_on:
+            print("Logging in anonymously...", end="", flush=True)
+            client.anonymous_login()
+            print(" Done!")
+
+
+def _relogin(client: SteamClient):
+    with _login_lock:
+        try:
+            client.anonymous_login()  # might fix the endless timeout loop
+        except RuntimeError:  # Alr logged in error
+            pass
+
+
+def _get_product_info_batch(
+    client: SteamClient, app_ids: list[int], meta_data_only: bool
+) -> dict[str, Any]:
+    """A single get_product_info request. Retries with backoff until it works"""
+    delay = 1
     while True:
         try:
-            print("Getting app info...")
             logger.debug(f"Getting info for {', '.join([str(x) for x in app_ids])}")
             start = time.time()
             info = client.get_product_info(  # pyright: ignore[reportUnknownMemberType]
-                app_ids
+                app_ids, meta_data_only=meta_data_only
             )
             # only none when app_ids is empty, which never happens
             assert info is not None
             logger.debug(f"Product info request took: {time.time() - start}s")
         except gevent.Timeout:
-            print("Request timed out. Trying again")
-            try:
-                client.anonymous_login()  # might fix the endless timeout loop
-            except RuntimeError:  # Alr logged in error
-                pass
+            print(f"Request for {len(app_ids)} apps timed out. Trying again")
+            _relogin(client)
+            gevent.sleep(delay)
+            delay = min(delay * 2, PRODUCT_INFO_MAX_BACKOFF)
             continue
-        break
+        return info
+
+
+def _get_product_info(
+    client: SteamClient,
+    app_ids: list[int],
+    meta_data_only: bool = False,
+    on_batch: Callable[[list[int], ProductInfo], None] | None = None,
+) -> ProductInfo:
+    """`meta_data_only` skips the actual app data, which is enough to compare
+    change numbers. Big lists get split up into batches that run at the same time.
+    `on_batch` gets called as each batch finishes"""
+    if len(app_ids) == 0:
+        raise ValueError("app_ids cannot be empty.")
+    _login(client)
+    batch_size = resolve_product_info_batch_size()
+    batches = [
+        app_ids[i : i + batch_size] for i in range(0, len(app_ids), batch_size)
+    ]
+    print(
+        ("Checking app info for changes" if meta_data_only else "Getting app info")
+        + (f" ({len(batches)} batches)..." if len(batches) > 1 else "...")
+    )
+
+    info: dict[str, Any] = {"apps": {}, "packages": {}}
+
+    def fetch(batch: list[int]):
+        batch_info = _get_product_info_batch(client, batch, meta_data_only)
+        info["apps"].update(batch_info.get("apps", {}))
+        info["packages"].update(batch_info.get("packages", {}))
+        if on_batch is not None:
+            on_batch(batch, ProductInfo(batch_info))
+
+    if len(batches) == 1:
+        fetch(batches[0])
+    else:
+        pool = gevent.pool.Pool(PRODUCT_INFO_CONCURRENCY)
+        for batch in batches:
+            pool.spawn(fetch, batch)
+        pool.join(raise_error=True)
     logger.debug(f"get_product_info retured: {json.dumps(info)}")
     return ProductInfo(info)
 
 
+def _get_changes_since(client: SteamClient, change_number: int) -> Any | None:
+    """Returns a CMsgClientPICSChangesSinceResponse, or None if it timed out"""
+    _login(client)
+    start = time.time()
+    resp = client.get_changes_since(  # pyright: ignore[reportUnknownMemberType]
+        change_number, app_changes=True, package_changes=False
+    )
+    logger.debug(f"Changes since request took: {time.time() - start}s")
+    return resp
+
+
 @dataclass
 class SteamInfoProvider:
     """Wrapper for SteamClient to handle API calls and caching.
@@ -59,6 +135,16 @@ class SteamInfoProvider:
     """A cache of app IDs and their data taken
     from the `apps` key of `get_product_info`.
     Values are False if it's not a base app ID"""
+    _disk_cache: ClassVar[ProductInfoCache | None] = None
+
+    @property
+    def disk_cache(self) -> ProductInfoCache:
+        """Product info saved from previous sessions"""
+        disk_cache = type(self)._disk_cache
+        if disk_cache is None:
+            disk_cache = ProductInfoCache()
+            type(self)._disk_cache = disk_cache
+        return disk_cache
 
     @property
     def client(self) -> SteamClient:
@@ -70,14 +156,117 @@ class SteamInfoProvider:
             type(self)._client = client
         return client
 
+    def _load_from_disk(self, app_ids: list[int]) -> list[int]:
+        """Moves up to date apps from the disk cache to `_cache`.
+        Apps that aren't saved yet or have changed since are returned"""
+        if get_setting(Settings.REFRESH_APP_INFO) is True:
+            return app_ids
+        disk_cache = self.disk_cache
+        absent: list[int] = []
+        stale: list[int] = []
+        for app_id in app_ids:
+            entry = disk_cache.get(app_id)
+            if entry is None:
+                absent.append(app_id)
+            elif disk_cache.is_fresh(entry):
+                self._cache[app_id] = entry.data
+            else:
+                stale.append(app_id)
+
+        changed: list[int] = []
+        if stale:
+            meta = _get_product_info(self.client, stale, meta_data_only=True)
+            meta_apps: dict[int, Any] = meta.get("apps", {})
+            unchanged: list[int] = []
+            for app_id in stale:
+                entry = disk_cache.apps[app_id]
+                change_number = meta_apps.get(app_id, {}).get("_change_number")
+                if (entry.data is False and app_id not in meta_apps) or (
+                    entry.data is not False and entry.change_number == change_number
+                ):
+                    unchanged.append(app_id)
+                    self._cache[app_id] = entry.data
+                else:
+                    changed.append(app_id)
+            disk_cache.mark_checked(unchanged)
+            logger.debug(f"{len(changed)}/{len(stale)} stale apps have changed")
+        disk_cache.save()
+        return absent + changed
+
+    def _save_to_cache(self, app_ids: list[int], info: ProductInfo):
+        """Merges one batch of product info into the caches.
+        The disk cache still has to be saved after"""
+        apps: dict[int, Any] = info.get("apps", {})
+        valid_ids = set(apps.keys())
+        invalid_ids = set(app_ids) - valid_ids
+        self._cache.update({**apps, **{x: False for x in invalid_ids}})
+
+        disk_cache = self.disk_cache
+        for app_id, data in apps.items():
+            disk_cache.put(app_id, data, data.get("_change_number", 0))
+        for app_id in invalid_ids:
+            disk_cache.put(app_id, False, 0)
+
+    def refresh_changed(self):
+        """Asks Steam which apps changed since the cache was last checked.
+        Those get dropped from the cache and everything else is marked as up to
+        date, so the next `get_app_info` only refetches what actually changed"""
+        if get_setting(Settings.REFRESH_APP_INFO) is True:
+            return
+        disk_cache = self.disk_cache
+        if not disk_cache.apps:
+            return
+        since = disk_cache.change_number or disk_cache.oldest_change_number()
+        if since is None:
+            return
+        print("Checking for app info changes...")
+        resp = _get_changes_since(self.client, since)
+        if resp is None:
+            logger.debug("Changes since request timed out")
+            return
+        logger.debug(
+            f"Changes since {since}: now at {resp.current_change_number}, "
+            f"{len(resp.app_changes)} app changes, "
+            f"force_full_update={resp.force_full_update}, "
+            f"force_full_app_update={resp.force_full_app_update}"
+        )
+        if resp.force_full_update or resp.force_full_app_update:
+            # Too far behind for Steam to give a delta, so there's no telling
+            # which apps changed. Every cached app gets checked against its own
+            # change number before it's used, and later deltas can't skip that
+            disk_cache.mark_unchecked()
+            disk_cache.set_change_number(resp.current_change_number)
+            disk_cache.save()
+            return
+        changed_ids = {x.appid for x in resp.app_changes}
+        cached_ids = list(disk_cache.apps)
+        changed = [x for x in cached_ids if x in changed_ids]
+        disk_cache.invalidate(changed)
+        # Apps that still need a check could've changed before `since`, where
+        # this delta doesn't reach
+        disk_cache.mark_checked(
+            [
+                x
+                for x in cached_ids
+                if x not in changed_ids and not disk_cache.needs_check(x)
+            ]
+        )
+        disk_cache.set_change_number(resp.current_change_number)
+        disk_cache.save()
+        for app_id in changed:
+            self._cache.pop(app_id, None)
+        print(f"{len(changed)}/{len(cached_ids)} cached apps have changed")
+
     def get_app_info(self, app_ids: list[int]) -> dict[int, Any]:
         missing = [app_id for app_id in app_ids if app_id not in self._cache]
         if missing:
-            info = _get_product_info(self.client, missing)
-            apps: dict[int, Any] = info.get("apps", {})
-            valid_ids = set(apps.keys())
-            invalid_ids = set(missing) - valid_ids
-            self._cache.update({**apps, **{x: False for x in invalid_ids}})
+            missing = self._load_from_disk(missing)
+        if missing:
+            try:
+                _get_product_info(self.client, missing, on_batch=self._save_to_cache)
+            finally:
+                # keep whatever batches made it even if another one failed
+                self.disk_cache.save()
         else:
             print("Reading app info from cache...")
 
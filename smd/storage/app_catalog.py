@@ -0,0 +1,288 @@
+"""Every app on Steam (ID + name), used for searching games"""
+
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, cast
+
+import httpx
+import msgpack  # type: ignore
+from tqdm import tqdm  # type: ignore
+
+from smd.http_clients import get_client
+from smd.http_utils import download_to_tempfile
+from smd.utils import enter_path, root_folder
+
+logger = logging.getLogger(__name__)
+
+APP_CATALOG_FILE = root_folder(outside_internal=True) / "app_catalog.bin"
+LEGACY_GAMES_FILE = root_folder(outside_internal=True) / "all_games.txt"
+APP_LIST_URL = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+APP_LIST_PAGE_SIZE = 50_000
+"Steam won't return more than this per request"
+APP_LIST_CONCURRENCY = 8
+"How many app ID ranges get downloaded at once during a full update"
+PARALLEL_PAGE_SIZE = 10_000
+"Smaller pages than usual, so ranges don't overshoot into the next one by much"
+APP_ID_PROBE_STEP = 500_000
+APP_ID_PROBE_LIMIT = 8_000_000
+"Probes for the highest app ID stop here. IDs are around 4 million as of 2025"
+PAGE_ATTEMPTS = 4
+_FORMAT_VERSION = 1
+_LEGACY_LINE = re.compile(r"^(.*) \[ID=(\d+)\]$")
+
+
+def _get_page(params: dict[str, str]) -> dict[str, Any]:
+    """One GetAppList response. Raises httpx.HTTPError if it keeps failing"""
+    for attempt in range(1, PAGE_ATTEMPTS + 1):
+        try:
+            response = get_client(APP_LIST_URL).get(
+                APP_LIST_URL, params=params, timeout=30
+            )
+            response.raise_for_status()
+            return response.json().get("response", {})
+        except httpx.HTTPError as e:
+            if attempt == PAGE_ATTEMPTS:
+                raise
+            logger.debug(f"App list page failed ({attempt}/{PAGE_ATTEMPTS}): {e!r}")
+            time.sleep(min(2**attempt, 10))
+    raise AssertionError("unreachable")
+
+
+def _probe_max_app_id(api_key: str, concurrency: int = APP_LIST_CONCURRENCY) -> int:
+    """Rough upper bound of app IDs, found by asking for the first app after
+    evenly spaced IDs, `concurrency` at a time"""
+    points = range(0, APP_ID_PROBE_LIMIT, APP_ID_PROBE_STEP)
+
+    def has_apps_after(app_id: int) -> bool:
+        page = _get_page(
+            {"key": api_key, "last_appid": str(app_id), "max_results": "1"}
+        )
+        return bool(page.get("apps"))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        more = list(pool.map(has_apps_after, points))
+    found = [x for x, has_more in zip(points, more) if has_more]
+    if not found:
+        return 0
+    if found[-1] == points[-1]:
+        logger.warning(f"There are app IDs above {points[-1]}, raise the probe limit")
+    return found[-1] + APP_ID_PROBE_STEP
+
+
+def _fetch_range(
+    api_key: str, start: int, end: int | None, pbar: tqdm
+) -> list[dict[str, Any]]:
+    """Apps with IDs in (start, end]. The last page can go past `end`,
+    those apps get dropped since another range has them"""
+    params = {
+        "key": api_key,
+        "last_appid": str(start),
+        "max_results": str(PARALLEL_PAGE_SIZE),
+    }
+    apps: list[dict[str, Any]] = []
+    while True:
+        page = _get_page(params)
+        batch = page.get("apps", [])
+        in_range = [x for x in batch if end is None or x["appid"] <= end]
+        apps.extend(in_range)
+        pbar.update(len(in_range))
+        last_app_id = page.get("last_appid")
+        if last_app_id is None and batch:
+            last_app_id = batch[-1]["appid"]
+        if (
+            not page.get("have_more_results")
+            or last_app_id is None
+            or len(in_range) < len(batch)
+            or (end is not None and last_app_id >= end)
+        ):
+            return apps
+        params["last_appid"] = str(last_app_id)
+
+
+def fetch_all_parallel(
+    api_key: str, concurrency: int = APP_LIST_CONCURRENCY
+) -> list[dict[str, Any]]:
+    """Every app sorted by ID, downloaded as several app ID ranges at once.
+    Raises httpx.HTTPError if a range can't be downloaded"""
+    max_app_id = _probe_max_app_id(api_key, concurrency)
+    logger.debug(f"App IDs go up to about {max_app_id}")
+    step = -(-max_app_id // concurrency) or 1
+    starts = list(range(0, max_app_id, step)) or [0]
+    ends: list[int | None] = [*starts[1:], None]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        with tqdm(desc="Downloading app list", unit=" apps") as pbar:
+            ranges = pool.map(
+                lambda x: _fetch_range(api_key, x[0], x[1], pbar), zip(starts, ends)
+            )
+            return [app for apps in ranges for app in apps]
+
+
+class AppCatalog:
+    """App IDs mapped to names, persisted with msgpack.
+    Apps that get removed from Steam stay in here until a full update."""
+
+    def __init__(self, path: Path = APP_CATALOG_FILE):
+        self.path = path
+        self.apps: dict[int, str] = {}
+        self.synced_at: float | None = None
+        "When the catalog was last updated from Steam"
+        self.modified_since: int | None = None
+        "Newest `last_modified` Steam has sent, where the next sync starts from"
+        self.sync_cursor: tuple[int, int] | None = None
+        "(if_modified_since, last_appid) of a sync that didn't finish"
+        self.revision = ""
+        "Changes every time the catalog is saved, so indexes know they're stale"
+        self._load()
+
+    def __len__(self):
+        return len(self.apps)
+
+    def _load(self):
+        if not self.path.exists():
+            self._import_legacy()
+            return
+        try:
+            raw = cast(
+                dict[str, Any],
+                msgpack.unpackb(self.path.read_bytes(), strict_map_key=False),
+            )
+            if raw.get("version") != _FORMAT_VERSION:
+                logger.debug("App catalog has an old format, ignoring it")
+                return
+            self.synced_at = raw["synced_at"]
+            self.revision = raw["revision"]
+            self.modified_since = raw.get("modified_since")
+            if cursor := raw.get("sync_cursor"):
+                self.sync_cursor = (cursor[0], cursor[1])
+            self.apps = dict(raw["apps"])
+        except Exception:
+            logger.exception("Could not read app catalog, starting fresh")
+            self.apps = {}
+            self.synced_at = None
+            self.modified_since = None
+            self.sync_cursor = None
+        logger.debug(f"Loaded {len(self.apps)} apps from the app catalog")
+
+    def _import_legacy(self):
+        """Reuses the all_games.txt that older versions made"""
+        if not LEGACY_GAMES_FILE.exists():
+            return
+        with LEGACY_GAMES_FILE.open(encoding="utf-8") as f:
+            for line in f:
+                if match := _LEGACY_LINE.match(line.rstrip("\n")):
+                    self.apps[int(match.group(2))] = match.group(1)
+        self.synced_at = LEGACY_GAMES_FILE.stat().st_mtime
+        logger.debug(f"Imported {len(self.apps)} apps from {LEGACY_GAMES_FILE.name}")
+        try:
+            self.save()
+        except OSError:
+            # Keep the old file, it gets imported again next time
+            logger.exception("Could not save the imported app catalog")
+            return
+        LEGACY_GAMES_FILE.unlink()
+
+    def save(self):
+        self.revision = uuid.uuid4().hex
+        raw = {
+            "version": _FORMAT_VERSION,
+            "synced_at": self.synced_at,
+            "revision": self.revision,
+            "modified_since": self.modified_since,
+            "sync_cursor": self.sync_cursor,
+            "apps": sorted(self.apps.items()),
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(msgpack.packb(raw))  # type: ignore
+        os.replace(tmp, self.path)
+
+    def _fetch_pages(
+        self,
+        params: dict[str, str],
+        on_page: Callable[[list[dict[str, Any]], int | None], None],
+    ) -> bool:
+        """Walks GetAppList pages, calling `on_page` with each page's apps and
+        the `last_appid` to continue from (None on the last page)"""
+        params = {**params, "max_results": str(APP_LIST_PAGE_SIZE)}
+        while True:
+            with download_to_tempfile(APP_LIST_URL, params=params) as tf:
+                if tf is None:
+                    return False
+                resp = json.load(tf)
+            apps = enter_path(resp, "response", "apps")
+            if not enter_path(resp, "response", "have_more_results"):
+                on_page(apps, None)
+                return True
+            last_app_id = enter_path(resp, "response", "last_appid")
+            on_page(apps, last_app_id)
+            params["last_appid"] = str(last_app_id)
+
+    def _merge(self, apps: list[dict[str, Any]]):
+        for app in apps:
+            self.apps[app["appid"]] = app.get("name", "UNKNOWN GAME")
+            modified = app.get("last_modified") or 0
+            if self.modified_since is None or modified > self.modified_since:
+                self.modified_since = modified
+
+    def update(self, api_key: str) -> bool:
+        """Gets apps that were added or changed since the last sync, or every
+        app if there's nothing to go off of. False if it failed"""
+        if self.modified_since is None or not self.apps:
+            return self.update_all(api_key)
+        since = self.sync_cursor[0] if self.sync_cursor else self.modified_since
+        params = {"key": api_key, "if_modified_since": str(since)}
+        if self.sync_cursor:
+            logger.debug(f"Resuming app list sync from {self.sync_cursor}")
+            params["last_appid"] = str(self.sync_cursor[1])
+        count = len(self.apps)
+        started_at = time.time()
+
+        def on_page(apps: list[dict[str, Any]], last_app_id: int | None):
+            self._merge(apps)
+            logger.debug(f"Got {len(apps)} changed apps")
+            if last_app_id is not None:
+                # Save progress so an interrupted sync picks up from here
+                self.sync_cursor = (since, last_app_id)
+                self.save()
+
+        if not self._fetch_pages(params, on_page):
+            return False
+        self.sync_cursor = None
+        self.synced_at = started_at
+        self.save()
+        print(f"App list updated. {len(self.apps) - count} new apps.")
+        return True
+
+    def update_all(self, api_key: str) -> bool:
+        """Downloads the whole app list from Steam. False if it failed"""
+        old_apps, old_since = self.apps, self.modified_since
+        self.apps, self.modified_since = {}, None
+        started_at = time.time()
+        try:
+            self._merge(fetch_all_parallel(api_key))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.debug(f"Parallel app list download failed: {e!r}")
+            print(
+                "Could not download the app list in parallel, "
+                "downloading it page by page instead."
+            )
+            self.apps = {}
+            if not self._fetch_pages(
+                {"key": api_key}, lambda apps, _: self._merge(apps)
+            ):
+                self.apps, self.modified_since = old_apps, old_since
+                return False
+        self.sync_cursor = None
+        self.synced_at = started_at
+        self.save()
+        return True
+
+    def lines(self) -> list[str]:
+        """Every app as "Name [ID=123]", the format fzf gets"""
+        return [f"{name} [ID={app_id}]" for app_id, name in self.apps.items()]
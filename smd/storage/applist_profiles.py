@@ -0,0 +1,118 @@
+"""Named sets of AppList IDs that can be swapped in and out"""
+
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, cast
+
+import msgpack  # type: ignore
+
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+APPLIST_PROFILES_FILE = root_folder(outside_internal=True) / "applist_profiles.bin"
+_FORMAT_VERSION = 1
+
+
+def _pack(ids: set[int]) -> list[int]:
+    """Sorted and stored as the gaps between IDs, which msgpack fits in
+    fewer bytes than the IDs themselves"""
+    prev = 0
+    deltas: list[int] = []
+    for app_id in sorted(ids):
+        deltas.append(app_id - prev)
+        prev = app_id
+    return deltas
+
+
+def _unpack(deltas: list[int]) -> set[int]:
+    ids: set[int] = set()
+    app_id = 0
+    for delta in deltas:
+        app_id += delta
+        ids.add(app_id)
+    return ids
+
+
+class AppListProfiles:
+    """Profile names mapped to their IDs. A profile can have any number of IDs,
+    but only ones within GreenLuma's limit can be activated"""
+
+    def __init__(self, path: Path = APPLIST_PROFILES_FILE):
+        self.path = path
+        self.profiles: dict[str, set[int]] = {}
+        self.active: str | None = None
+        "The profile that's in the AppList folder right now"
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            raw = cast(dict[str, Any], msgpack.unpackb(self.path.read_bytes()))
+            if raw.get("version") != _FORMAT_VERSION:
+                logger.debug("AppList profiles have an old format, ignoring them")
+                return
+            self.profiles = {
+                name: _unpack(deltas) for name, deltas in raw["profiles"].items()
+            }
+            self.active = raw["active"]
+        except Exception:
+            logger.exception("Could not read AppList profiles")
+            self.profiles = {}
+            self.active = None
+
+    def save(self):
+        raw = {
+            "version": _FORMAT_VERSION,
+            "active": self.active,
+            "profiles": {name: _pack(ids) for name, ids in self.profiles.items()},
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(msgpack.packb(raw))  # type: ignore
+        os.replace(tmp, self.path)
+
+    def __contains__(self, name: str):
+        return name in self.profiles
+
+    def names(self) -> list[str]:
+        return sorted(self.profiles, key=str.casefold)
+
+    def get(self, name: str) -> set[int]:
+        return self.profiles[name]
+
+    def set(self, name: str, ids: Iterable[int]):
+        self.profiles[name] = set(ids)
+
+    def delete(self, name: str):
+        del self.profiles[name]
+        if self.active == name:
+            self.active = None
+
+    def split(self, name: str, size: int) -> list[str]:
+        """Replaces a profile with profiles of at most `size` IDs, named
+        "name (1)", "name (2)"... The IDs get sorted first, so a game's DLCs and
+        depots (usually numbered right after it) mostly end up together.
+        Returns the new names"""
+        ids = sorted(self.profiles[name])
+        if len(ids) <= size:
+            return [name]
+        self.delete(name)
+        names: list[str] = []
+        number = 1
+        for start in range(0, len(ids), size):
+            while (part := f"{name} ({number})") in self.profiles:
+                number += 1
+            self.profiles[part] = set(ids[start : start + size])
+            names.append(part)
+        return names
+
+    def track(self, added: Iterable[int] = (), removed: Iterable[int] = ()):
+        """Keeps the active profile in sync with changes to the AppList folder"""
+        if self.active is None or self.active not in self.profiles:
+            return
+        ids = self.profiles[self.active]
+        ids.update(added)
+        ids.difference_update(removed)
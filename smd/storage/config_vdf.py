@@ -0,0 +1,93 @@
+"""Steam's config.vdf, where the depot decryption keys go"""
+
+import logging
+import os
+import shutil
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+import vdf  # type: ignore
+
+from smd.storage.vdf import vdf_dump, vdf_load
+from smd.structs import DepotKeyPair
+from smd.utils import enter_path
+
+logger = logging.getLogger(__name__)
+
+DEPOTS_PATH = ("InstallConfigStore", "Software", "Valve", "Steam", "depots")
+
+
+def read_depots(path: Path) -> dict[str, Any]:
+    """Just the depots node, for when nothing gets written. The rest of
+    config.vdf and the blocks inside each depot are never parsed"""
+    return enter_path(vdf_load(path, lazy=True), *DEPOTS_PATH, ignore_case=True)
+
+
+class ConfigVDF:
+    """config.vdf parsed once, with the depots node and its IDs ready to go.
+    Changes stay in memory until `save`, which only writes if something
+    changed. As a context manager, it saves on a clean exit."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data: vdf.VDFDict = vdf_load(path, mapper=vdf.VDFDict)
+        self.depots: vdf.VDFDict = enter_path(
+            self.data, *DEPOTS_PATH, mutate=True, ignore_case=True
+        )
+        self.depot_ids: set[str] = set(self.depots)
+        self.changed = False
+
+    @classmethod
+    def from_steam_path(cls, steam_path: Path) -> "ConfigVDF":
+        return cls(steam_path / "config/config.vdf")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ):
+        if exc_type is None:
+            self.save()
+
+    def has_key(self, depot_id: str | int) -> bool:
+        return str(depot_id) in self.depot_ids
+
+    def add_key(self, depot_id: str | int, decryption_key: str) -> bool:
+        """False if the depot already had a key"""
+        depot_id = str(depot_id)
+        if depot_id in self.depot_ids:
+            return False
+        self.depots[depot_id] = {"DecryptionKey": decryption_key}
+        self.depot_ids.add(depot_id)
+        self.changed = True
+        return True
+
+    def add_keys(self, pairs: Iterable[DepotKeyPair]) -> list[DepotKeyPair]:
+        """Adds the ones that aren't in yet and returns them.
+        Pairs without a key (not depots) are ignored"""
+        return [
+            x
+            for x in pairs
+            if x.decryption_key and self.add_key(x.depot_id, x.decryption_key)
+        ]
+
+    def save(self, backup: bool = True) -> bool:
+        """Writes to a temp file then swaps it in, so Steam never sees half
+        a file. The old one goes to config.vdf.backup. False if there was
+        nothing to write"""
+        if not self.changed:
+            logger.debug("config.vdf unchanged, not writing")
+            return False
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        vdf_dump(tmp, self.data)
+        if backup:
+            shutil.copyfile(self.path, self.path.with_name(f"{self.path.name}.backup"))
+        os.replace(tmp, self.path)
+        self.changed = False
+        return True
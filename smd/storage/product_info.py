@@ -0,0 +1,157 @@
+"""On-disk cache of product info, used by SteamInfoProvider"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+import msgpack  # type: ignore
+
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_INFO_FILE = root_folder(outside_internal=True) / "product_info.bin"
+PRODUCT_INFO_TTL = 60 * 60
+"Seconds before a cached app has to be checked against its change number again"
+PRODUCT_INFO_MAX_ENTRIES = 5000
+"Least recently used apps get evicted past this"
+_FORMAT_VERSION = 1
+
+
+@dataclass
+class CachedAppInfo:
+    data: dict[str, Any] | bool
+    "Same as SteamInfoProvider._cache values. False if it's not a base app ID"
+    change_number: int
+    "PICS change number of the app when it was fetched"
+    checked_at: float
+    """Last time this was fetched or confirmed to be up to date. 0 if it has to
+    be checked against its change number before it's used again"""
+    used_at: float
+    "Last time this was read, used for eviction"
+
+
+class ProductInfoCache:
+    """Product info keyed by app ID, persisted with msgpack"""
+
+    def __init__(
+        self,
+        path: Path = PRODUCT_INFO_FILE,
+        ttl: float = PRODUCT_INFO_TTL,
+        max_entries: int = PRODUCT_INFO_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.apps: dict[int, CachedAppInfo] = {}
+        self.change_number: int | None = None
+        "Global PICS change number that every cached app was last checked against"
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            raw = cast(
+                dict[str, Any],
+                msgpack.unpackb(self.path.read_bytes(), strict_map_key=False),
+            )
+            if raw.get("version") != _FORMAT_VERSION:
+                logger.debug("Product info cache has an old format, ignoring it")
+                return
+            self.change_number = raw.get("change_number")
+            for app_id, (data, change_number, checked_at, used_at) in raw[
+                "apps"
+            ].items():
+                self.apps[int(app_id)] = CachedAppInfo(
+                    data, change_number, checked_at, used_at
+                )
+        except Exception:
+            logger.exception("Could not read product info cache, starting fresh")
+            self.apps = {}
+            self.change_number = None
+        logger.debug(f"Loaded {len(self.apps)} apps from product info cache")
+
+    def get(self, app_id: int) -> CachedAppInfo | None:
+        entry = self.apps.get(app_id)
+        if entry is not None:
+            entry.used_at = time.time()
+            self._dirty = True
+        return entry
+
+    def is_fresh(self, entry: CachedAppInfo) -> bool:
+        return time.time() - entry.checked_at < self.ttl
+
+    def put(self, app_id: int, data: dict[str, Any] | bool, change_number: int):
+        now = time.time()
+        self.apps[app_id] = CachedAppInfo(data, change_number, now, now)
+        self._dirty = True
+
+    def mark_checked(self, app_ids: list[int]):
+        """Marks apps as up to date without refetching them"""
+        now = time.time()
+        for app_id in app_ids:
+            if entry := self.apps.get(app_id):
+                entry.checked_at = now
+                self._dirty = True
+
+    def mark_unchecked(self):
+        """Every app has to be checked against its change number before it's
+        used again, for when it's unknown what changed"""
+        for entry in self.apps.values():
+            entry.checked_at = 0
+        self._dirty = True
+
+    def needs_check(self, app_id: int) -> bool:
+        """True if `mark_unchecked` was called and the app wasn't checked since"""
+        entry = self.apps.get(app_id)
+        return entry is not None and entry.checked_at == 0
+
+    def set_change_number(self, change_number: int):
+        if change_number != self.change_number:
+            self.change_number = change_number
+            self._dirty = True
+
+    def oldest_change_number(self) -> int | None:
+        """Where to start asking for changes if there's no global change number
+        saved yet. Invalid apps are skipped since they don't have one"""
+        return min(
+            (x.change_number for x in self.apps.values() if x.change_number),
+            default=None,
+        )
+
+    def invalidate(self, app_ids: list[int]):
+        for app_id in app_ids:
+            if self.apps.pop(app_id, None) is not None:
+                self._dirty = True
+
+    def _evict(self):
+        overflow = len(self.apps) - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = sorted(self.apps, key=lambda x: self.apps[x].used_at)[:overflow]
+        for app_id in oldest:
+            del self.apps[app_id]
+        logger.debug(f"Evicted {overflow} apps from product info cache")
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._evict()
+        raw = {
+            "version": _FORMAT_VERSION,
+            "change_number": self.change_number,
+            "apps": {
+                str(app_id): [x.data, x.change_number, x.checked_at, x.used_at]
+                for app_id, x in self.apps.items()
+            },
+        }
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            f.write(msgpack.packb(raw))  # type: ignore
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -13,6 +13,9 @@ from smd.utils import root_folder
 logger = logging.getLogger(__name__)
 
 SETTINGS_FILE = root_folder(outside_internal=True) / "settings.bin"
+DEFAULT_MANIFEST_WORKERS = 8
+DEFAULT_PRODUCT_INFO_BATCH_SIZE = 100
+DEFAULT_PARALLEL_DECRYPT_THRESHOLD = 100_000
 
 
 def load_all_settings() -> dict[Any, Any]:
@@ -96,3 +99,33 @@ def resolve_morrenus_key() -> str:
         ).strip()
         set_setting(Settings.MORRENUS_KEY, morrenus_key)
     return morrenus_key
+
+
+def _resolve_int(setting: Settings, default: int, minimum: int = 1) -> int:
+    value = get_or_default_setting(setting, str(default))
+    if isinstance(value, str) and value.strip().isdigit():
+        return max(minimum, int(value))
+    logger.debug(f"Invalid value for {setting.key_name}: {value!r}, using default")
+    return default
+
+
+def resolve_manifest_workers() -> int:
+    """Number of manifests that get downloaded at the same time"""
+    return _resolve_int(Settings.MANIFEST_WORKERS, DEFAULT_MANIFEST_WORKERS)
+
+
+def resolve_product_info_batch_size() -> int:
+    """Max number of apps per get_product_info request"""
+    return _resolve_int(
+        Settings.PRODUCT_INFO_BATCH_SIZE, DEFAULT_PRODUCT_INFO_BATCH_SIZE
+    )
+
+
+def resolve_parallel_decrypt_threshold() -> int:
+    """Manifests with at least this many file mappings get decrypted with
+    multiple processes. 0 means never"""
+    return _resolve_int(
+        Settings.PARALLEL_DECRYPT_THRESHOLD,
+        DEFAULT_PARALLEL_DECRYPT_THRESHOLD,
+        minimum=0,
+    )
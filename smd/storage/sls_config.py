@@ -0,0 +1,176 @@
+"""SLSsteam's config.yaml, or at least the AdditionalApps part of it"""
+
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# libyaml's version is a lot faster, but PyYAML can be built without it
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+APPS_KEY = "AdditionalApps"
+
+
+class _Span:
+    """Where AdditionalApps is in the text, and how it was written"""
+
+    def __init__(self, start: int, end: int, indent: int, flow: bool):
+        self.start = start
+        self.end = end
+        self.indent = indent
+        "Column of the `-` in a block list"
+        self.flow = flow
+        "Written like [1, 2, 3]"
+
+
+class SLSConfig:
+    """config.yaml parsed once and read again only if its mtime/size changes.
+    Saving only rewrites the AdditionalApps section, so comments and the
+    order of everything else stay the same."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data: dict[str, Any] = {}
+        self.apps: list[int] = []
+        "AdditionalApps, in order"
+        self._app_set: set[int] = set()
+        self._text = ""
+        self._span: _Span | None = None
+        self._stamp: tuple[int, int] | None = None
+        self.changed = False
+
+    def _stat(self) -> tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parse(self):
+        self._stamp = self._stat()
+        self._text = self.path.read_text(encoding="utf-8")
+        loader = SafeLoader(self._text)
+        try:
+            node = loader.get_single_node()
+            data = loader.construct_document(node) if node is not None else None
+        finally:
+            loader.dispose()
+        self.data = data if isinstance(data, dict) else {}
+        self._span = None
+        if isinstance(node, yaml.MappingNode):
+            for key, value in node.value:
+                if key.value == APPS_KEY:
+                    self._span = self._span_of(key, value, self._text)
+                    break
+        apps = self.data.get(APPS_KEY)
+        self.apps = apps if isinstance(apps, list) else []
+        self._app_set = set(self.apps)
+        self.changed = False
+        logger.debug(f"Parsed SLSsteam config, {len(self.apps)} apps")
+
+    @staticmethod
+    def _content_end(node: yaml.Node) -> int:
+        """Where the last value in `node` ends. A block list or mapping ends at
+        the start of whatever comes after it, comments included, so that
+        isn't used"""
+        while (
+            isinstance(node, (yaml.SequenceNode, yaml.MappingNode))
+            and not node.flow_style
+            and node.value
+        ):
+            last = node.value[-1]
+            node = last[1] if isinstance(node, yaml.MappingNode) else last
+        return node.end_mark.index
+
+    @classmethod
+    def _span_of(cls, key: yaml.Node, value: yaml.Node, text: str) -> _Span:
+        flow = isinstance(value, yaml.SequenceNode) and bool(value.flow_style)
+        start = key.start_mark.index
+        end = cls._content_end(value)
+        # The line break stays, so the next key keeps its own line
+        while end > start and text[end - 1] in "\r\n":
+            end -= 1
+        indent = 0
+        if isinstance(value, yaml.SequenceNode) and not flow and value.value:
+            indent = value.start_mark.column
+        return _Span(start, end, indent, flow)
+
+    def refresh(self):
+        """Parses the file again if something else changed it.
+        Changes that weren't saved are thrown away in that case"""
+        if self._stamp is None or self._stat() != self._stamp:
+            if self.changed:
+                logger.warning("SLSsteam config changed on disk, unsaved changes lost")
+            self._parse()
+
+    def __contains__(self, app_id: int):
+        self.refresh()
+        return app_id in self._app_set
+
+    def ids(self) -> list[int]:
+        self.refresh()
+        return list(self.apps)
+
+    def add(self, app_ids: Iterable[int]) -> tuple[list[int], list[int]]:
+        """Returns the IDs that were added, and the ones that were already in"""
+        self.refresh()
+        added: list[int] = []
+        already_in: list[int] = []
+        for app_id in app_ids:
+            if app_id in self._app_set:
+                already_in.append(app_id)
+                continue
+            self.apps.append(app_id)
+            self._app_set.add(app_id)
+            added.append(app_id)
+        self.changed |= bool(added)
+        return added, already_in
+
+    def remove(self, app_ids: Iterable[int]) -> list[int]:
+        """Returns the IDs that were actually in there"""
+        self.refresh()
+        to_remove = self._app_set.intersection(app_ids)
+        if to_remove:
+            self.apps[:] = [x for x in self.apps if x not in to_remove]
+            self._app_set -= to_remove
+            self.changed = True
+        return list(to_remove)
+
+    def _render(self, indent: int, flow: bool) -> str:
+        if not self.apps or flow:
+            return f"{APPS_KEY}: [{', '.join(str(x) for x in self.apps)}]"
+        items = "".join(f"\n{' ' * indent}- {x}" for x in self.apps)
+        return f"{APPS_KEY}:{items}"
+
+    def save(self) -> bool:
+        """Writes the new AdditionalApps into the text it was read from, to a
+        temp file that then replaces config.yaml. False if nothing changed"""
+        if not self.changed:
+            return False
+        text = self._text
+        if self._span is not None:
+            section = self._render(self._span.indent, self._span.flow)
+            start = self._span.start
+            text = text[:start] + section + text[self._span.end :]
+        else:
+            section = self._render(0, False)
+            if text and not text.endswith("\n"):
+                text += "\n"
+            start = len(text)
+            text += section + "\n"
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._text = text
+        self._span = _Span(
+            start,
+            start + len(section),
+            self._span.indent if self._span else 0,
+            self._span.flow if self._span else False,
+        )
+        self.data[APPS_KEY] = self.apps
+        self._stamp = self._stat()
+        self.changed = False
+        return True
@@ -1,17 +1,16 @@
 import logging
 from collections import OrderedDict
 from pathlib import Path
-from types import TracebackType
 from typing import Any, overload
 
-import vdf  # type: ignore
+from smd.storage import vdf_text
 
 logger = logging.getLogger(__name__)
 
 
 def vdf_dump(vdf_file: Path, obj: dict[str, Any]):
     with vdf_file.open("w", encoding="utf-8") as f:
-        vdf.dump(obj, f, pretty=True)  # type: ignore
+        vdf_text.dump(obj, f)
 
 
 @overload
@@ -27,37 +26,15 @@ def vdf_load[DictType: dict[Any, Any]](
 
 
 @overload
-def vdf_load(vdf_file: Path) -> dict[Any, Any]: ...
+def vdf_load(vdf_file: Path, *, lazy: bool = False) -> dict[Any, Any]: ...
 
 
 def vdf_load[DictType: dict[Any, Any]](
-    vdf_file: Path, mapper: type[DictType] = dict
+    vdf_file: Path, mapper: type[DictType] = dict, lazy: bool = False
 ) -> DictType:
-    with vdf_file.open(encoding="utf-8") as f:
-        data: DictType = vdf.load(f, mapper=mapper)  # type: ignore
-    return data
-
-
-class VDFLoadAndDumper:
-    """For when you need to load and dump a vdf file in one line.
-    Use `vdf_load` or `vdf_dump` to do just one of the two"""
-
-    def __init__(self, path: Path):
-        self.path = path
-        self.data = vdf.VDFDict()
-
-    def __enter__(self):
-        self.data = vdf_load(self.path, mapper=vdf.VDFDict)
-        return self.data
-
-    def __exit__(
-        self,
-        exc_type: type[BaseException] | None,
-        exc_value: BaseException | None,
-        exc_traceback: TracebackType | None,
-    ):
-        if exc_type is None:
-            vdf_dump(self.path, self.data)
+    """`lazy` only parses blocks once they're used, for when just a few
+    values are needed (see `vdf_text.loads`)"""
+    return vdf_text.loads(vdf_file.read_text(encoding="utf-8"), mapper, lazy=lazy)
 
 
 def get_steam_libs(steam_path: Path):
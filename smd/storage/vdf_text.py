@@ -0,0 +1,293 @@
+"""Reading and writing text VDF (KeyValues), the format of config.vdf and .acf
+files. Gives the same results as the vdf package, but the whole file gets
+split up by one regex instead of being matched line by line, and dumping
+writes straight to the file instead of going through nested generators."""
+
+import re
+from collections.abc import Callable, Mapping
+from typing import Any, TextIO
+
+_TOKEN = re.compile(
+    r"[ \t\r\n]*"
+    r'(?:("[^"\\]*(?:\\.[^"\\]*)*")'  # quoted
+    r"|([{}])"
+    r"|//[^\n]*|\[[^\]\n]*\]"  # comments and conditionals like [$WIN32]
+    r'|([^\s{}"]+)'  # unquoted
+    r'|("))',  # quote that never gets closed
+    re.DOTALL,
+)
+# Possessive, so failing to match a block doesn't backtrack through every
+# way of splitting up the text
+_SKIP = r'[^{}"/]++|"[^"\\]*+(?:\\.[^"\\]*+)*+"|//[^\n]*+|/'
+_BLOCK_BODY = re.compile(rf"(?:{_SKIP}|\{{(?:{_SKIP})*+\}})*+", re.DOTALL)
+"""Everything up to the next brace, skipping braces in strings and comments.
+Blocks with no blocks inside get skipped whole"""
+_LEVEL_TOKEN = re.compile(
+    _TOKEN.pattern.replace(r"|([{}])", rf"|(\{{(?:{_SKIP})*+\}})|([{{}}])"),
+    re.DOTALL,
+)
+"_TOKEN, but a block with no blocks inside is one token"
+
+_UNESCAPE_MAP = {
+    r"\n": "\n",
+    r"\t": "\t",
+    r"\v": "\v",
+    r"\b": "\b",
+    r"\r": "\r",
+    r"\f": "\f",
+    r"\a": "\a",
+    r"\\": "\\",
+    r"\?": "?",
+    r"\"": '"',
+    r"\'": "'",
+}
+_ESCAPE_MAP = {v: k for k, v in _UNESCAPE_MAP.items()}
+_UNESCAPE = re.compile(r"\\[ntvbrfa\\?\"']")
+_ESCAPE = re.compile(r"[\n\t\v\b\r\f\a\\?\"']")
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    return _UNESCAPE.sub(lambda m: _UNESCAPE_MAP[m[0]], text)
+
+
+def _escape(text: str) -> str:
+    return _ESCAPE.sub(lambda m: _ESCAPE_MAP[m[0]], text)
+
+
+class _LazyText:
+    """The text a lazy load came from, and the blocks found in it so far"""
+
+    __slots__ = ("text", "ends")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.ends: dict[int, int] = {}
+        "Where a block's contents start mapped to its closing brace"
+
+    def block_end(self, pos: int) -> int:
+        """Index of the `}` that closes the block whose contents start at `pos`.
+        Blocks inside it that get passed over are remembered, so opening them
+        later doesn't scan the same text again"""
+        if (end := self.ends.get(pos)) is not None:
+            return end
+        text = self.text
+        size = len(text)
+        opened = [pos]
+        while True:
+            match = _BLOCK_BODY.match(text, pos)
+            pos = match.end() if match else pos
+            if pos >= size:
+                raise SyntaxError("VDF: unexpected end of file, missing }")
+            char = text[pos]
+            if char == '"':
+                raise SyntaxError("VDF: unclosed quote")
+            if char == "{":
+                opened.append(pos + 1)
+            else:
+                self.ends[opened.pop()] = pos
+                if not opened:
+                    return pos
+            pos += 1
+
+
+class LazyVDFDict(dict[str, Any]):
+    """A block that only gets parsed the first time something looks inside it.
+    Blocks inside it are lazy too"""
+
+    __slots__ = ("_sources",)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._sources: list[tuple[_LazyText, int, int]] = []
+        "(source, start, end) of each time the block showed up, merged in order"
+
+    def _materialize(self):
+        if self._sources:
+            sources, self._sources = self._sources, []
+            for source, start, end in sources:
+                _parse_level(self, source, start, end)
+
+    def __eq__(self, other: object) -> bool:
+        self._materialize()
+        if isinstance(other, LazyVDFDict):
+            other._materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    __hash__ = None  # type: ignore
+
+
+def _materializes_first(name: str) -> Callable[..., Any]:
+    method = getattr(dict, name)
+
+    def wrapper(self: LazyVDFDict, *args: Any, **kwargs: Any) -> Any:
+        self._materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__getitem__",
+    "__setitem__",
+    "__delitem__",
+    "__contains__",
+    "__iter__",
+    "__reversed__",
+    "__len__",
+    "__repr__",
+    "__or__",
+    "__ror__",
+    "__ior__",
+    "get",
+    "keys",
+    "values",
+    "items",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+    "clear",
+    "copy",
+):
+    setattr(LazyVDFDict, _name, _materializes_first(_name))
+
+
+def _parse_level(target: LazyVDFDict, source: _LazyText, start: int, end: int):
+    """Parses one level of a block into `target`, leaving the blocks inside
+    it as unparsed LazyVDFDicts"""
+    # dict's own methods, the wrappers would only check _sources again
+    get = dict.get.__get__(target)
+    setitem = dict.__setitem__.__get__(target)
+    key: str | None = None
+    pos = start
+    while match := _LEVEL_TOKEN.search(source.text, pos, end):
+        pos = match.end()
+        quoted, leaf, brace, bare, unclosed = match.groups()
+        if quoted is not None:
+            value = _unescape(quoted[1:-1])
+        elif bare is not None:
+            value = _unescape(bare)
+        elif leaf is not None or brace == "{":
+            if key is None:
+                raise SyntaxError("VDF: { without a key before it")
+            block = get(key)
+            if not isinstance(block, LazyVDFDict):
+                block = LazyVDFDict()
+                setitem(key, block)
+            if leaf is not None:
+                block._sources.append((source, pos - len(leaf) + 1, pos - 1))
+            else:
+                close = source.block_end(pos)
+                block._sources.append((source, pos, close))
+                pos = close + 1
+            key = None
+            continue
+        elif brace == "}":
+            raise SyntaxError("VDF: too many closing braces")
+        elif unclosed is not None:
+            raise SyntaxError("VDF: unclosed quote")
+        else:
+            continue
+        if key is None:
+            key = value
+        else:
+            setitem(key, value)
+            key = None
+    if key is not None:
+        raise SyntaxError(f'VDF: "{key}" has no value')
+
+
+def _parse[DictType: dict[Any, Any]](text: str, mapper: type[DictType]) -> DictType:
+    root = mapper()
+    stack: list[DictType] = []
+    current = root
+    key: str | None = None
+    for quoted, brace, bare, unclosed in _TOKEN.findall(text):
+        if quoted:
+            value = _unescape(quoted[1:-1])
+        elif bare:
+            value = _unescape(bare)
+        elif brace == "{":
+            if key is None:
+                raise SyntaxError("VDF: { without a key before it")
+            # Same as vdf's merge_duplicate_keys, a block that shows up twice
+            # gets merged into the first one
+            if key in current:
+                block = current[key]
+                if not isinstance(block, mapper):
+                    block = current[key] = mapper()
+            else:
+                block = current[key] = mapper()
+            stack.append(current)
+            current = block
+            key = None
+            continue
+        elif brace == "}":
+            if key is not None:
+                raise SyntaxError(f'VDF: "{key}" has no value')
+            if not stack:
+                raise SyntaxError("VDF: too many closing braces")
+            current = stack.pop()
+            continue
+        elif unclosed:
+            raise SyntaxError("VDF: unclosed quote")
+        else:
+            continue
+        if key is None:
+            key = value
+        else:
+            current[key] = value
+            key = None
+    if stack or key is not None:
+        raise SyntaxError("VDF: unexpected end of file, missing }")
+    return root
+
+
+def loads[DictType: dict[Any, Any]](
+    text: str, mapper: type[DictType] = dict, lazy: bool = False
+) -> DictType:
+    """`lazy` leaves blocks unparsed until they're used, which is quicker when
+    only a few values are needed. Blocks become LazyVDFDicts, so it can't be
+    used with another mapper, and syntax errors in a block only come up once
+    it's used"""
+    if text.startswith("\ufeff"):
+        text = text[1:]
+    if lazy:
+        if mapper is not dict:
+            raise ValueError("lazy only works with the dict mapper")
+        root = LazyVDFDict()
+        _parse_level(root, _LazyText(text), 0, len(text))
+        return root  # type: ignore
+    return _parse(text, mapper)
+
+
+def _dump_level(obj: Mapping[Any, Any], write: Callable[[str], Any], indent: str):
+    inner = indent + "\t"
+    for key, value in obj.items():
+        if isinstance(key, str):
+            key = _escape(key)
+        if isinstance(value, Mapping):
+            write(f'{indent}"{key}"\n{indent}{{\n')
+            _dump_level(value, write, inner)  # type: ignore
+            write(f"{indent}}}\n")
+        else:
+            if isinstance(value, str):
+                value = _escape(value)
+            write(f'{indent}"{key}" "{value}"\n')
+
+
+def dump(obj: Mapping[Any, Any], fp: TextIO):
+    """Same output as vdf.dump(obj, fp, pretty=True)"""
+    _dump_level(obj, fp.write, "")
+
+
+def dumps(obj: Mapping[Any, Any]) -> str:
+    chunks: list[str] = []
+    _dump_level(obj, chunks.append, "")
+    return "".join(chunks)
@@ -23,6 +23,14 @@ class LuaChoiceReturnCode(Enum):
 class AppListChoice(Enum):
     ADD = "Add IDs"
     DELETE = "View/Delete IDs"
+    PROFILES = "Profiles"
+
+
+class AppListProfileChoice(Enum):
+    ACTIVATE = "Switch to a profile"
+    SAVE = "Save the current AppList as a profile"
+    SPLIT = "Split a profile that's over the ID limit"
+    DELETE = "Delete a profile"
 
 
 class LuaEndpoint(Enum):
@@ -127,6 +135,27 @@ DepotManifestMap = NewType("DepotManifestMap", dict[str, str])
 "Depot IDs mapped to Manifest IDs"
 
 
+class ManifestJob(NamedTuple):
+    """A manifest that still needs to be downloaded"""
+
+    slot: int
+    "Position of the manifest in the list returned by download_manifests"
+    depot_id: str
+    manifest_id: str
+    decryption_key: str
+    dest: Path
+    "Where the manifest gets saved"
+
+
+class BatchManifestResult(NamedTuple):
+    """How the manifests of one game went in a batch download"""
+
+    manifests: list[Path]
+    "Manifests that made it to depotcache"
+    missing: list[str]
+    "Depot IDs whose manifest couldn't be found or downloaded"
+
+
 class ManifestGetModes(Enum):
     AUTO = "Auto"
     MANUAL = "Manual"
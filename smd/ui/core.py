@@ -8,11 +8,14 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 from colorama import Fore, Style
+from rich.console import Console
+from rich.table import Column, Table
 
 from smd.app_injector.applist import AppListManager
 from smd.app_injector.sls import SLSManager
 from smd.game_specific import GameHandler
 from smd.helpers.ddm import run_ddm
+from smd.lua.batch import app_names, load_luas
 from smd.lua.manager import LuaManager
 from smd.lua.writer import ACFWriter, ConfigVDFWriter
 from smd.manifest.downloader import ManifestDownloader
@@ -35,6 +38,7 @@ from smd.structs import (
     ContextMenuOptions,
     LoggedInUser,
     LuaChoice,
+    LuaParsedInfo,
     MainReturnCode,
     OSType,
     ReleaseType,
@@ -367,6 +371,21 @@ class UI:
         print(Style.RESET_ALL)
         return MainReturnCode.LOOP
 
+    def _zip_for_accela(self, parsed_lua: LuaParsedInfo, manifests: list[Path]):
+        """ZIPs the manifests and lua to the Downloads folder, returns the ZIP"""
+        unique_name = f"{parsed_lua.app_id}_{time.time()}"
+        # TODO: this tmp dir really isnt needed
+        dst = Path.home() / f"Downloads/{unique_name}"
+        dst.mkdir(parents=True, exist_ok=True)
+        for m_file in manifests:
+            shutil.move(m_file, dst / m_file.name)
+        with (dst / f"{parsed_lua.app_id}.lua").open("w", encoding="utf-8") as f:
+            f.write(parsed_lua.contents)
+        target_zip = dst.parent / f"{unique_name}.zip"
+        zip_folder(dst, target_zip)
+        shutil.rmtree(dst)
+        return target_zip
+
     @music_toggle_decorator
     def process_lua_full(self, file: Path | None = None) -> MainReturnCode:
         """Processes a .lua file and goes through all the usual steps"""
@@ -410,17 +429,7 @@ class UI:
             run_ddm(parsed_lua, manifests, lib_path)
 
         if self.sls_man:
-            unique_name = f"{parsed_lua.app_id}_{time.time()}"
-            # TODO: this tmp dir really isnt needed
-            dst = Path.home() / f"Downloads/{unique_name}"
-            dst.mkdir(parents=True, exist_ok=True)
-            for m_file in manifests:
-                shutil.move(m_file, dst / m_file.name)
-            with (dst / f"{parsed_lua.app_id}.lua").open("w", encoding="utf-8") as f:
-                f.write(parsed_lua.contents)
-            target_zip = dst.parent / f"{unique_name}.zip"
-            zip_folder(dst, target_zip)
-            shutil.rmtree(dst)
+            target_zip = self._zip_for_accela(parsed_lua, manifests)
             print(
                 f"{Fore.GREEN}SUCCESS!{Style.RESET_ALL}"
                 "\nFiles have been zipped to:"
@@ -450,6 +459,114 @@ class UI:
             )
         return MainReturnCode.LOOP
 
+    @music_toggle_decorator
+    def process_lua_batch(self, paths: list[Path]) -> MainReturnCode:
+        """process_lua_full for lots of luas (or folders of them) without any
+        prompts. AppList/SLSsteam, config.vdf and the app info request only
+        happen once for all of them, and every manifest downloads together"""
+        luas, skipped = load_luas(paths)
+        for path, reason in skipped.items():
+            print(Fore.RED + f"Skipped {path}: {reason}" + Style.RESET_ALL)
+        if not luas:
+            print("None of the files had a usable lua.")
+            return MainReturnCode.EXIT
+        print(f"Processing {len(luas)} game(s)...")
+
+        lib_path = get_steam_libs(self.steam_path)[0]
+        print(f"Using the Steam library in {lib_path}")
+        lua_manager = LuaManager(self.os_type)
+        downloader = ManifestDownloader(self.provider, self.steam_path)
+        config = ConfigVDFWriter(self.steam_path)
+        acf = ACFWriter(lib_path)
+
+        app_info = self.provider.get_app_info([int(x.app_id) for x in luas])
+        names = app_names(luas, app_info)
+        all_ids = list(
+            dict.fromkeys(int(pair.depot_id) for x in luas for pair in x.depots)
+        )
+        for lua in luas:
+            set_stats_and_achievements(int(lua.app_id))
+            lua_manager.backup_lua(lua)
+        if self.app_list_man:
+            print(Fore.YELLOW + "\nAdding to AppList folder:" + Style.RESET_ALL)
+            self.app_list_man.add_ids(all_ids)
+        elif self.sls_man:
+            print(Fore.YELLOW + "\nAdding to SLSSteam config:" + Style.RESET_ALL)
+            self.sls_man.add_ids(all_ids)
+
+        keys_added: dict[str, int] = {}
+        acf_written: dict[str, bool] = {}
+        if self.app_list_man:
+            print(Fore.YELLOW + "\nAdding Decryption Keys:" + Style.RESET_ALL)
+            keys_added = config.add_decryption_keys_to_config(luas)
+            print(Fore.YELLOW + "\nACF Writing:" + Style.RESET_ALL)
+            for lua in luas:
+                # An existing .acf means it's an update, so leave it alone
+                acf_written[lua.app_id] = acf.write_acf(
+                    lua, names[lua.app_id], overwrite=False
+                )
+
+        print(Fore.YELLOW + "\nDownloading Manifests:" + Style.RESET_ALL)
+        results = downloader.download_manifests_batch(luas)
+
+        use_ddm = get_or_default_setting(Settings.SEND_TO_DDM, False)
+        zips: dict[str, Path] = {}
+        for lua in luas:
+            manifests = results[lua.app_id].manifests
+            if use_ddm:
+                run_ddm(lua, manifests, lib_path)
+            if self.sls_man:
+                zips[lua.app_id] = self._zip_for_accela(lua, manifests)
+
+        bool_map: dict[bool | None, str] = {
+            True: "[green]O[/green]",
+            False: "[yellow]Kept[/yellow]",
+            None: "N/A",
+        }
+        table = Table(
+            "App ID",
+            "Name",
+            Column(header="IDs", justify="right"),
+            Column(header="Keys Added", justify="right"),
+            Column(header="ACF Written?", justify="center"),
+            Column(header="Manifests", justify="right"),
+        )
+        for lua in luas:
+            result = results[lua.app_id]
+            done = len(result.manifests)
+            total = done + len(result.missing)
+            color = "green" if not result.missing else "red"
+            table.add_row(
+                lua.app_id,
+                names[lua.app_id],
+                str(len(lua.depots)),
+                str(keys_added.get(lua.app_id, 0)) if self.app_list_man else "N/A",
+                bool_map[acf_written.get(lua.app_id)],
+                f"[{color}]{done}/{total}[/{color}]",
+            )
+        print()
+        Console().print(table)
+        for lua in luas:
+            if missing := results[lua.app_id].missing:
+                print(
+                    Fore.RED + f"{lua.app_id} is missing manifests for depots: "
+                    f"{', '.join(missing)}" + Style.RESET_ALL
+                )
+        if zips:
+            print("ZIPs for ACCELA:")
+            for app_id, target_zip in zips.items():
+                print(f"{names[app_id]}: {Fore.YELLOW}{target_zip}{Style.RESET_ALL}")
+            print(
+                "Paste this when ACCELA asks for a folder:\n"
+                f"{Fore.YELLOW}{lib_path.resolve()}{Style.RESET_ALL}"
+            )
+        if self.app_list_man:
+            print(
+                Fore.GREEN + "\nDone! Restart Steam (and GreenLuma) "
+                "for the games to show up." + Style.RESET_ALL
+            )
+        return MainReturnCode.EXIT
+
     def manage_context_menu(self) -> MainReturnCode:
         choice: ContextMenuOptions | None = prompt_select(
             "Select an operation for the context menu:",
@@ -534,6 +651,7 @@ class UI:
         else:
             raise Exception("Unreachable code.")
 
+        self.provider.refresh_changed()
         lua_manager = LuaManager(self.os_type)
         downloader = ManifestDownloader(self.provider, self.steam_path)
         steam_proc = (
@@ -165,6 +165,46 @@ class Settings(Enum):
         SettingCustomTypes.FILE,
         "The directory where DDM downloads the games"
     )
+    REFRESH_APP_INFO = SettingItem(
+        "refresh_app_info",
+        "Always Refresh App Info",
+        False,
+        bool,
+        "Ignore the saved app info cache and always ask Steam for the latest data. "
+        "Enable this if game info looks outdated.",
+    )
+    MANIFEST_WORKERS = SettingItem(
+        "manifest_workers",
+        "Manifest Download Workers",
+        False,
+        str,
+        "How many manifests to download at the same time. "
+        "Set it to 1 to download them one by one.",
+    )
+    PRODUCT_INFO_BATCH_SIZE = SettingItem(
+        "product_info_batch_size",
+        "App Info Batch Size",
+        False,
+        str,
+        "How many apps to ask Steam about per request. Big lists get split into "
+        "batches of this size that are sent at the same time.",
+    )
+    USE_FZF = SettingItem(
+        "use_fzf",
+        "Search Games with fzf",
+        False,
+        bool,
+        "Use fzf instead of the built-in search when looking for games. "
+        "fzf has to be installed for this to work.",
+    )
+    PARALLEL_DECRYPT_THRESHOLD = SettingItem(
+        "parallel_decrypt_threshold",
+        "Multi-core Decryption Threshold",
+        False,
+        str,
+        "Manifests with at least this many files get decrypted using all CPU cores. "
+        "Set it to 0 to always decrypt on a single core.",
+    )
 
     @property
     def key_name(self) -> str:
@@ -1,4 +1,3 @@
-import asyncio
 import json
 import os
 import shutil
@@ -7,10 +6,11 @@ import zipfile
 from pathlib import Path
 from typing import Any
 
-import httpx
 from colorama import Fore, Style
 
+from smd.http_clients import get_client, run_async
 from smd.http_utils import get_request
+from smd.segmented_download import download_file
 from smd.strings import GITHUB_USERNAME, REPO_NAME, VERSION
 from smd.utils import root_folder
 
@@ -20,7 +20,7 @@ class Updater:
     def get_latest_stable() -> dict[str, Any]:
         resp = None
         while resp is None:
-            resp = asyncio.run(
+            resp = run_async(
                 get_request(
                     "https://api.github.com/repos/"
                     f"{GITHUB_USERNAME}/{REPO_NAME}/releases/latest",
@@ -34,7 +34,7 @@ class Updater:
         """Returns none of prerelease newer than current version can't be found"""
         url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{REPO_NAME}/releases"
         while True:
-            resp = httpx.get(url)
+            resp = get_client(url).get(url)
             releases = json.loads(resp.text)
             for release in releases:
                 tag = release.get("tag_name")
@@ -49,23 +49,10 @@ class Updater:
 
     @staticmethod
     def download_for_windows(download_url: str):
-        aria2c_exe = root_folder() / "third_party/aria2c/aria2c.exe"
-        subprocess.run(
-            [
-                aria2c_exe,
-                "-x",
-                "64",
-                "-k",
-                "1K",
-                "-s",
-                "64",
-                "-d",
-                str(Path.cwd().resolve()),
-                download_url,
-            ],
-            check=True,
-        )
         zip_name = Path(download_url).name
+        if not download_file(download_url, Path.cwd() / zip_name):
+            print("Can't download update.")
+            return
         print(
             Fore.GREEN
             + "\n\nThe cursed update is about to begin. Prepare yourself."
@@ -107,13 +94,11 @@ class Updater:
 
     @staticmethod
     def download_for_linux(download_url: str):
-        axel = shutil.which("axel")
-        if not axel:
-            print("axel is not installed. Can't download update.")
-            return
         cwd = root_folder(True)
-        subprocess.run([axel, "-n", "64", download_url], cwd=cwd, check=True)
         zip_name = Path(download_url).name
+        if not download_file(download_url, cwd / zip_name):
+            print("Can't download update.")
+            return
         tmp_dir = cwd / "tmp"
         tmp_dir.mkdir(exist_ok=True)
         zip_path = cwd / zip_name
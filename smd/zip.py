@@ -1,3 +1,4 @@
+import shutil
 import zipfile
 from io import BytesIO
 from pathlib import Path
@@ -67,6 +68,18 @@ def read_nth_file_from_zip_bytes(nth: int, bytes: bytes):
         return
 
 
+def extract_nth_file_from_zip_bytes(nth: int, bytes: bytes, dest: Path) -> bool:
+    """Streams a file in a ZIP straight to `dest` without holding it in memory.
+    Returns False if it's an invalid ZIP file"""
+    try:
+        with zipfile.ZipFile(BytesIO(bytes)) as f:
+            with f.open(f.filelist[nth]) as src, dest.open("wb") as out:
+                shutil.copyfileobj(src, out)
+        return True
+    except zipfile.BadZipFile:
+        return False
+
+
 def zip_folder(folder_path: Path, output_path: Path):
     """ZIPs to a BytesIO then to the actual file to prevent infinite recursion"""
     tmp = BytesIO()
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pytest
+
+from smd.app_injector.applist import AppListManager
+from smd.app_injector.applist_index import AppListIndex
+from smd.storage.applist_profiles import AppListProfiles
+
+
+@pytest.fixture
+def applist_manager(tmp_path: Path) -> AppListManager:
+    """AppListManager on an empty folder. Skips __init__, which asks for the
+    folder and touches settings"""
+    folder = tmp_path / "AppList"
+    folder.mkdir()
+    manager = AppListManager.__new__(AppListManager)
+    manager.max_id_limit = 134
+    manager.applist_folder = folder
+    manager.index = AppListIndex(folder)
+    manager.profiles = AppListProfiles(tmp_path / "profiles.bin")
+    return manager
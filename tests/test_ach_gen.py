@@ -0,0 +1,44 @@
+import asyncio
+import hashlib
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from smd import ach_gen
+
+
+def test_fetch_icons(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cached = hashlib.sha1(b"cached").hexdigest()  # noqa: S324
+    (tmp_path / f"{cached}.jpg").write_bytes(b"cached")
+    (tmp_path / "old.png").write_bytes(b"old")
+    contents = {
+        f"https://a/{cached.upper()}.jpg": b"cached",
+        "https://a/old.png": b"newer",
+        "https://a/icon.png": b"one",
+        "https://b/icon.png": b"two",
+        "https://c/copy.png": b"one",
+    }
+    fetched: list[str] = []
+
+    class Client:
+        async def get(self, url: str, follow_redirects: bool = False):
+            fetched.append(url)
+            return SimpleNamespace(status_code=200, content=contents[url])
+
+    monkeypatch.setattr(ach_gen, "get_async_client", lambda url: Client())
+    paths = asyncio.run(ach_gen.fetch_icons(list(contents), tmp_path))
+
+    # Already there by hash or by name
+    assert f"https://a/{cached.upper()}.jpg" not in fetched
+    assert "https://a/old.png" not in fetched
+    assert paths["https://a/old.png"] == "img/old.png"
+    # Same name, different image, so neither gets overwritten
+    two = hashlib.sha1(b"two").hexdigest()  # noqa: S324
+    assert paths["https://a/icon.png"] == "img/icon.png"
+    assert paths["https://b/icon.png"] == f"img/{two}.png"
+    assert (tmp_path / "icon.png").read_bytes() == b"one"
+    assert (tmp_path / f"{two}.png").read_bytes() == b"two"
+    # Same image, different name, so it's only saved once
+    assert paths["https://c/copy.png"] == "img/icon.png"
+    assert not (tmp_path / "copy.png").exists()
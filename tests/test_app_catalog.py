@@ -0,0 +1,70 @@
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+from tqdm import tqdm  # type: ignore
+
+from smd.storage import app_catalog
+
+
+def apps(*app_ids: int) -> list[dict[str, Any]]:
+    return [{"appid": x, "name": str(x)} for x in app_ids]
+
+
+def test_fetch_range_without_last_appid(monkeypatch: pytest.MonkeyPatch):
+    pages = [
+        {"apps": apps(1, 2), "have_more_results": True},
+        {"apps": apps(3), "have_more_results": True, "last_appid": 3},
+        {"apps": [], "have_more_results": True},
+    ]
+    cursors: list[str] = []
+
+    def get_page(params: dict[str, str]) -> dict[str, Any]:
+        cursors.append(params["last_appid"])
+        return pages.pop(0)
+
+    monkeypatch.setattr(app_catalog, "_get_page", get_page)
+    with tqdm(disable=True) as pbar:
+        result = app_catalog._fetch_range("key", 0, 10, pbar)
+    assert [x["appid"] for x in result] == [1, 2, 3]
+    assert cursors == ["0", "2", "3"]
+
+
+def test_probe_uses_concurrency_limit(monkeypatch: pytest.MonkeyPatch):
+    lock = threading.Lock()
+    running = 0
+    most = 0
+    release = threading.Event()
+
+    def get_page(params: dict[str, str]) -> dict[str, Any]:
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+            if running == 2:
+                release.set()
+        release.wait(1)
+        with lock:
+            running -= 1
+        return {"apps": apps(1) if int(params["last_appid"]) < 1_000_000 else []}
+
+    monkeypatch.setattr(app_catalog, "_get_page", get_page)
+    assert app_catalog._probe_max_app_id("key", 2) == 1_000_000
+    assert most == 2
+
+
+def test_legacy_file_kept_until_saved(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    legacy = tmp_path / "all_games.txt"
+    legacy.write_text("Half-Life [ID=70]\nPortal [ID=400]\n", encoding="utf-8")
+    monkeypatch.setattr(app_catalog, "LEGACY_GAMES_FILE", legacy)
+
+    # The catalog's folder doesn't exist, so saving fails
+    catalog = app_catalog.AppCatalog(tmp_path / "missing" / "app_catalog.bin")
+    assert catalog.apps == {70: "Half-Life", 400: "Portal"}
+    assert legacy.exists()
+
+    catalog = app_catalog.AppCatalog(tmp_path / "app_catalog.bin")
+    assert catalog.apps == {70: "Half-Life", 400: "Portal"}
+    assert not legacy.exists()
+    assert app_catalog.AppCatalog(tmp_path / "app_catalog.bin").apps == catalog.apps
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from smd.app_injector.applist import AppListManager
+from smd.app_injector.applist_index import AppListIndex
+
+
+def test_index_stays_in_sync(tmp_path: Path):
+    for idx, app_id in [(0, 10), (1, 20), (2, 20)]:
+        (tmp_path / f"{idx}.txt").write_text(str(app_id))
+    (tmp_path / "readme.txt").write_text("hi")
+    index = AppListIndex(tmp_path)
+    assert index.last_idx == 2
+    assert index.paths_of({20}) == [tmp_path / "1.txt", tmp_path / "2.txt"]
+
+    (tmp_path / "3.txt").write_text("30")
+    index.record_write(3, 30)
+    (tmp_path / "0.txt").unlink()
+    index.record_delete(0)
+    (tmp_path / "3.txt").rename(tmp_path / "0.txt")
+    index.record_rename(3, 0)
+    assert [(x.path.name, x.app_id) for x in index.entries(sort=True)] == [
+        ("0.txt", 30),
+        ("1.txt", 20),
+        ("2.txt", 20),
+    ]
+    assert 10 not in index
+    assert index.last_idx == 2
+
+
+def test_index_notices_outside_changes(tmp_path: Path):
+    (tmp_path / "0.txt").write_text("10")
+    index = AppListIndex(tmp_path)
+    assert index.app_ids() == {10}
+    (tmp_path / "1.txt").write_text("20")
+    assert index.app_ids() == {10, 20}
+
+
+def test_plan_fills_gaps(tmp_path: Path):
+    for idx, app_id in enumerate([10, 20, 30, 40, 50]):
+        (tmp_path / f"{idx}.txt").write_text(str(app_id))
+    plan = AppListIndex(tmp_path).plan(add=[10, 60], remove=[20, 30])
+    # 50 moves into the first gap and 60 takes the second one,
+    # nothing else gets touched
+    assert plan.renames == [(4, 1)]
+    assert plan.writes == {2: 60}
+    assert plan.deletes == []
+    assert plan.already_in == [10]
+    assert plan.count == 4
+
+
+def test_apply_changes(applist_manager: AppListManager):
+    manager = applist_manager
+    folder = manager.applist_folder
+    for idx, app_id in enumerate([10, 20, 30, 40, 50, 60, 70]):
+        (folder / f"{idx}.txt").write_text(str(app_id))
+    (folder / "007.txt").write_text("75")
+    (folder / "8.txt").write_text("85")
+
+    plan = manager.apply_changes(add=[90, 10, 100], remove=[20, 30, 60, 85, 99])
+    assert plan.added == [90, 100]
+    assert plan.already_in == [10]
+    assert sorted(plan.removed) == [20, 30, 60, 85]
+
+    on_disk = {x.name: int(x.read_text()) for x in folder.iterdir()}
+    assert on_disk == {
+        "0.txt": 10,
+        "1.txt": 75,
+        "2.txt": 90,
+        "3.txt": 40,
+        "4.txt": 50,
+        "5.txt": 100,
+        "6.txt": 70,
+    }
+    expected = [(x.path, x.app_id) for x in AppListIndex(folder).entries(sort=True)]
+    assert [(x.path, x.app_id) for x in manager.index.entries(sort=True)] == expected
+    assert manager.last_idx == 6
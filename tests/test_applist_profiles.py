@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from smd.app_injector.applist import AppListManager
+from smd.storage.applist_profiles import AppListProfiles
+
+
+def test_profiles_round_trip(tmp_path: Path):
+    path = tmp_path / "profiles.bin"
+    profiles = AppListProfiles(path)
+    profiles.set("Shooters", [730, 10, 2_000_000])
+    profiles.set("Empty", [])
+    profiles.active = "Shooters"
+    profiles.track(added=[440], removed=[10])
+    profiles.save()
+
+    loaded = AppListProfiles(path)
+    assert loaded.names() == ["Empty", "Shooters"]
+    assert loaded.get("Shooters") == {440, 730, 2_000_000}
+    assert loaded.active == "Shooters"
+    loaded.delete("Shooters")
+    assert loaded.active is None
+
+
+def folder_ids(manager: AppListManager) -> list[int]:
+    return [int(x.read_text()) for x in sorted(manager.applist_folder.iterdir())]
+
+
+def test_activate_profile(applist_manager: AppListManager):
+    manager = applist_manager
+    manager.apply_changes(add=[10, 20, 30])
+    manager.profiles.set("Other", [30, 40])
+
+    plan = manager.activate_profile("Other")
+    assert plan is not None
+    assert plan.added == [40] and sorted(plan.removed) == [10, 20]
+    assert sorted(folder_ids(manager)) == [30, 40]
+    assert manager.profiles.active == "Other"
+    # Changes to the folder from now on go into the active profile
+    manager.add_ids(50)
+    assert manager.profiles.get("Other") == {30, 40, 50}
+
+
+def test_over_the_limit_profile_gets_split(applist_manager: AppListManager):
+    manager = applist_manager
+    manager.apply_changes(add=[1, 2])
+    manager.profiles.set("Big", range(1000, 1300))
+
+    assert manager.activate_profile("Big") is None
+    assert folder_ids(manager) == [1, 2]
+    assert manager.profiles.active is None
+
+    assert manager.split_profile("Big") == ["Big (1)", "Big (2)", "Big (3)"]
+    assert "Big" not in manager.profiles
+    assert [len(manager.profiles.get(x)) for x in manager.profiles.names()] == [
+        134,
+        134,
+        32,
+    ]
+    assert manager.activate_profile("Big (3)") is not None
+    assert sorted(folder_ids(manager)) == list(range(1268, 1300))
+    assert AppListProfiles(manager.profiles.path).active == "Big (3)"
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from smd.storage.config_vdf import ConfigVDF, read_depots
+from smd.storage.vdf import vdf_dump, vdf_load
+from smd.structs import DepotKeyPair
+
+
+def make_config(path: Path):
+    vdf_dump(
+        path,
+        {
+            "InstallConfigStore": {
+                "Software": {
+                    "valve": {"Steam": {"depots": {"11": {"DecryptionKey": "aa"}}}}
+                }
+            }
+        },
+    )
+
+
+def test_add_keys(tmp_path: Path):
+    path = tmp_path / "config.vdf"
+    make_config(path)
+    with ConfigVDF(path) as config:
+        added = config.add_keys(
+            [
+                DepotKeyPair("11", "zz"),
+                DepotKeyPair("12", "bb"),
+                DepotKeyPair("13", ""),
+            ]
+        )
+    assert added == [DepotKeyPair("12", "bb")]
+    assert (tmp_path / "config.vdf.backup").exists()
+    depots = vdf_load(path)["InstallConfigStore"]["Software"]["valve"]["Steam"][
+        "depots"
+    ]
+    assert depots == {"11": {"DecryptionKey": "aa"}, "12": {"DecryptionKey": "bb"}}
+    assert ConfigVDF(path).has_key(12)
+
+
+def test_no_write_without_changes(tmp_path: Path):
+    path = tmp_path / "config.vdf"
+    make_config(path)
+    mtime = path.stat().st_mtime_ns
+    with ConfigVDF(path) as config:
+        assert not config.add_key("11", "aa")
+    assert path.stat().st_mtime_ns == mtime
+    assert not (tmp_path / "config.vdf.backup").exists()
+
+
+def test_read_depots(tmp_path: Path):
+    path = tmp_path / "config.vdf"
+    make_config(path)
+    depots = read_depots(path)
+    assert "11" in depots and "12" not in depots
+    assert depots["11"]["DecryptionKey"] == "aa"
@@ -0,0 +1,77 @@
+import base64
+import os
+import struct
+from pathlib import Path
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from steam.protobufs.content_manifest_pb2 import (
+    ContentManifestMetadata,
+    ContentManifestPayload,
+)
+
+from smd.manifest import crypto
+from smd.manifest.reader import PROTOBUF_METADATA_MAGIC, PROTOBUF_PAYLOAD_MAGIC
+
+KEY = bytes(range(32))
+
+
+def encrypt_filename(name: str) -> str:
+    iv = os.urandom(16)
+    ciphertext = AES.new(KEY, AES.MODE_CBC, iv).encrypt(pad(name.encode(), 16))
+    encrypted_iv = AES.new(KEY, AES.MODE_ECB).encrypt(iv)
+    return base64.b64encode(encrypted_iv + ciphertext).decode()
+
+
+def make_manifest(count: int) -> bytes:
+    payload = ContentManifestPayload()
+    for i in range(count):
+        mapping = payload.mappings.add()
+        mapping.filename = encrypt_filename(f"folder/file_{i}.bin")
+        mapping.size = i
+        if i % 10 == 0:
+            mapping.linktarget = encrypt_filename(f"target_{i}")
+    payload_bytes = payload.SerializeToString()
+    metadata = ContentManifestMetadata(filenames_encrypted=True)
+    metadata_bytes = metadata.SerializeToString()
+    return (
+        struct.pack("<II", PROTOBUF_PAYLOAD_MAGIC, len(payload_bytes))
+        + payload_bytes
+        + struct.pack("<II", PROTOBUF_METADATA_MAGIC, len(metadata_bytes))
+        + metadata_bytes
+    )
+
+
+def test_batched_filename_decryption():
+    names = [encrypt_filename(f"dir/é_{i}") for i in range(100)]
+    names += ["", "not base64!", base64.b64encode(os.urandom(40)).decode()]
+    expected = [crypto.decrypt_filename(x, KEY) for x in names]
+    assert crypto.decrypt_filenames(names, KEY) == expected
+
+
+def test_sharded_decryption_is_identical(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(crypto.os, "cpu_count", lambda: 3)
+    monkeypatch.setattr(crypto, "MIN_MAPPINGS_PER_SHARD", 100)
+    manifest = make_manifest(500)
+    crypto.decrypt_and_save_manifest(
+        manifest, tmp_path / "serial", KEY.hex(), parallel_threshold=0
+    )
+    crypto.decrypt_and_save_manifest(
+        manifest, tmp_path / "sharded", KEY.hex(), parallel_threshold=1
+    )
+    assert (tmp_path / "serial").read_bytes() == (tmp_path / "sharded").read_bytes()
+
+
+def test_sharded_decrypts_share_a_pool(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(crypto.os, "cpu_count", lambda: 3)
+    monkeypatch.setattr(crypto, "MIN_MAPPINGS_PER_SHARD", 100)
+    manifest = make_manifest(300)
+    crypto.decrypt_and_save_manifest(
+        manifest, tmp_path / "first", KEY.hex(), parallel_threshold=1
+    )
+    pool = crypto._pool
+    assert pool is not None
+    crypto.decrypt_and_save_manifest(
+        manifest, tmp_path / "second", KEY.hex(), parallel_threshold=1
+    )
+    assert crypto._pool is pool
@@ -0,0 +1,74 @@
+import zipfile
+from pathlib import Path
+
+from smd.lua.batch import app_names, load_luas
+from smd.lua.parser import AddToken, LuaCall, SetManifestId, parse_lua
+from smd.structs import DepotKeyPair, LuaParsedInfo
+
+LUA = """-- comment
+addappid(1245620) -- Elden Ring
+addappid(1245621, 1, "a1b2c3")
+  addappid( 1245622 , 0 , ' ffee ' )
+addappid("1245623", 1, "0011")
+setManifestid(1245621, "7166838406052479279", 0)
+addtoken(1245620, "1234567890")
+addappid(1245624, 1)
+--[[
+addappid(999, 1, "deadbeef")
+]]
+-- addappid(888)
+addappid(2000)
+setStat(1, true, nil, 1.5, "a, b")
+"""
+
+
+def test_parse_lua():
+    parsed = parse_lua(LUA)
+    assert parsed.base_app_id == "1245620"
+    assert parsed.depot_keys == [
+        DepotKeyPair("1245621", "a1b2c3"),
+        DepotKeyPair("1245622", "ffee"),
+        DepotKeyPair("1245623", "0011"),
+    ]
+    assert parsed.ids_without_key == ["1245620", "2000"]
+    assert parsed.manifests == [
+        SetManifestId("1245621", "7166838406052479279", 0)
+    ]
+    assert parsed.tokens == [AddToken("1245620", "1234567890")]
+    assert parsed.other == [LuaCall("setStat", (1, True, None, 1.5, "a, b"))]
+
+
+def test_no_app_id():
+    parsed = parse_lua("print('hi')\n")
+    assert parsed.base_app_id is None
+    assert parsed.depot_keys == []
+
+
+def test_load_luas(tmp_path: Path):
+    (tmp_path / "1.lua").write_text('addappid(1)\naddappid(2, 1, "ab")\naddappid(3)\n')
+    with zipfile.ZipFile(tmp_path / "4.zip", "w") as f:
+        f.writestr("4.lua", 'addappid(4)\naddappid(5, 1, "cd")\n')
+    (tmp_path / "copy.lua").write_text('addappid(1)\naddappid(2, 1, "ab")\n')
+    (tmp_path / "nokeys.lua").write_text("addappid(6)\n")
+    (tmp_path / "readme.txt").write_text("addappid(7)\n")
+
+    luas, skipped = load_luas([tmp_path])
+    assert [x.app_id for x in luas] == ["1", "4"]
+    assert luas[0].depots == [
+        DepotKeyPair("2", "ab"),
+        DepotKeyPair("1", ""),
+        DepotKeyPair("3", ""),
+    ]
+    assert skipped == {
+        tmp_path / "copy.lua": "Same game as 1.lua",
+        tmp_path / "nokeys.lua": "Decryption keys not found",
+    }
+
+
+def test_app_names_with_bad_product_info():
+    luas = [
+        LuaParsedInfo(Path(f"{x}.lua"), "", x, [DepotKeyPair(x, "ab")])
+        for x in ("1", "2", "3")
+    ]
+    app_info = {1: {"common": {"name": "Game"}}, 2: False}
+    assert app_names(luas, app_info) == {"1": "Game", "2": "App 2", "3": "App 3"}
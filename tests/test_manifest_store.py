@@ -0,0 +1,92 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from smd.manifest import downloader, store
+from smd.manifest.downloader import ManifestDownloader
+from smd.manifest.store import ManifestStore
+from smd.structs import ManifestJob
+
+
+@pytest.fixture
+def manifest(tmp_path: Path) -> Path:
+    path = tmp_path / "10_20.manifest"
+    path.write_bytes(b"manifest contents")
+    return path
+
+
+def test_add_and_materialize(tmp_path: Path, manifest: Path):
+    manifests = ManifestStore(tmp_path / "store")
+    obj = manifests.add(manifest, "10", "20")
+    assert obj.read_bytes() == b"manifest contents"
+    assert manifests.get("10", "20", decrypted=True) is None
+
+    dest = tmp_path / "depotcache" / "10_20.manifest"
+    assert manifests.materialize("10", "20", dest)
+    assert os.path.samefile(obj, dest)
+    assert not manifests.materialize("10", "21", tmp_path / "10_21.manifest")
+
+
+def test_copies_when_hardlinks_fail(
+    tmp_path: Path, manifest: Path, monkeypatch: pytest.MonkeyPatch
+):
+    def no_link(src: Path, dest: Path):
+        raise OSError("no hardlinks here")
+
+    monkeypatch.setattr(store.os, "link", no_link)
+    manifests = ManifestStore(tmp_path / "store")
+    obj = manifests.add(manifest, "10", "20")
+    dest = tmp_path / "depotcache" / "10_20.manifest"
+    assert manifests.materialize("10", "20", dest)
+    assert dest.read_bytes() == b"manifest contents"
+    assert not os.path.samefile(obj, dest)
+
+
+def test_corrupt_entry_is_evicted(tmp_path: Path, manifest: Path):
+    manifests = ManifestStore(tmp_path / "store")
+    obj = manifests.add(manifest, "10", "20")
+    manifests.add(manifest, "10", "20", decrypted=True)
+    # Same size, so only the hash can tell
+    obj.write_bytes(b"manifest CONTENTS")
+
+    reloaded = ManifestStore(tmp_path / "store")
+    assert reloaded.get("10", "20") is None
+    assert reloaded.get("10", "20", decrypted=True) is None
+    assert not obj.exists()
+    assert ManifestStore(tmp_path / "store").index == {}
+
+
+def test_index_is_appended_to(tmp_path: Path, manifest: Path):
+    manifests = ManifestStore(tmp_path / "store")
+    manifests.add(manifest, "10", "20")
+    before = manifests.index_file.read_bytes()
+    other = tmp_path / "other.manifest"
+    other.write_bytes(b"other contents")
+    manifests.add(other, "30", "40")
+
+    after = manifests.index_file.read_bytes()
+    assert after.startswith(before) and len(after) > len(before)
+    assert ManifestStore(tmp_path / "store").index == manifests.index
+
+
+def test_decrypting_stores_the_original(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    def fake_decrypt(encrypted_file: Path, output_filepath: Path, dec_key: str):
+        output_filepath.write_bytes(encrypted_file.read_bytes().upper())
+
+    monkeypatch.setattr(downloader, "decrypt_and_save_manifest", fake_decrypt)
+    manifests = ManifestStore(tmp_path / "store")
+    manifest_downloader = ManifestDownloader.__new__(ManifestDownloader)
+    manifest_downloader.store = manifests
+    dest = tmp_path / "depotcache" / "10_20.manifest"
+    dest.parent.mkdir()
+    job = ManifestJob(0, "10", "20", "ab" * 32, dest)
+
+    manifest_downloader._save_manifest(b"encrypted", False, job, decrypt=True)
+
+    assert dest.read_bytes() == b"ENCRYPTED"
+    original = manifests.get("10", "20")
+    assert original is not None and original.read_bytes() == b"encrypted"
+    assert list(dest.parent.iterdir()) == [dest]
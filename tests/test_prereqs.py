@@ -55,17 +55,6 @@ def test_steamless():
     ), f'"{file.relative_to(root_folder(True))!s}" is not executable.'
 
 
-def test_downloader():
-    if sys.platform == "win32":
-        file = (root_folder() / "third_party/aria2c/aria2c.exe")
-        assert (
-            file.exists()
-        ), f'"{file.relative_to(root_folder(True))!s}" does not exist. '
-        'Please install it to that location'
-    elif sys.platform == "linux":
-        assert shutil.which("axel") is not None, "axel is missing. Please install it"
-
-
 def test_midi():
     files = [(root_folder() / "c/midi_player_lib.dll"),
              (root_folder() / "c/Extended_Super_Mario_64_Soundfont.sf2"),
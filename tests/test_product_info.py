@@ -0,0 +1,82 @@
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from smd import steam_client
+from smd.steam_client import SteamInfoProvider
+from smd.storage.product_info import ProductInfoCache
+from smd.structs import ProductInfo
+
+
+class FakeSteam:
+    """Stands in for the PICS requests, with each app at some change number"""
+
+    def __init__(self, change_numbers: dict[int, int]):
+        self.change_numbers = change_numbers
+        self.fetched: list[int] = []
+        self.responses: list[Any] = []
+
+    def changes_since(self, client: Any, change_number: int) -> Any:
+        return self.responses.pop(0)
+
+    def product_info(
+        self,
+        client: Any,
+        app_ids: list[int],
+        meta_data_only: bool = False,
+        on_batch: Any = None,
+    ) -> ProductInfo:
+        apps = {
+            x: {"_change_number": self.change_numbers[x], "common": {"name": str(x)}}
+            for x in app_ids
+        }
+        if not meta_data_only:
+            self.fetched.extend(app_ids)
+        info = ProductInfo({"apps": apps, "packages": {}})
+        if on_batch is not None:
+            on_batch(app_ids, info)
+        return info
+
+
+def changes(current: int, app_ids: tuple[int, ...] = (), force_full: bool = False):
+    return SimpleNamespace(
+        current_change_number=current,
+        app_changes=[SimpleNamespace(appid=x) for x in app_ids],
+        force_full_update=force_full,
+        force_full_app_update=False,
+    )
+
+
+@pytest.fixture
+def steam(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FakeSteam:
+    fake = FakeSteam({10: 100, 20: 100})
+    monkeypatch.setattr(steam_client, "_get_changes_since", fake.changes_since)
+    monkeypatch.setattr(steam_client, "_get_product_info", fake.product_info)
+    monkeypatch.setattr(steam_client, "get_setting", lambda *args: None)
+    monkeypatch.setattr(SteamInfoProvider, "_client", object())
+    monkeypatch.setattr(SteamInfoProvider, "_cache", {})
+    monkeypatch.setattr(
+        SteamInfoProvider, "_disk_cache", ProductInfoCache(tmp_path / "info.bin")
+    )
+    return fake
+
+
+def test_force_full_update_then_delta(steam: FakeSteam):
+    provider = SteamInfoProvider()
+    provider.get_app_info([10, 20])
+    assert steam.fetched == [10, 20]
+
+    # 10 changes somewhere in the gap Steam wouldn't give a delta for
+    steam.change_numbers[10] = 150
+    steam.responses = [changes(200, force_full=True), changes(210)]
+    provider.refresh_changed()
+    SteamInfoProvider._cache.clear()
+    provider.refresh_changed()
+
+    steam.fetched.clear()
+    info = provider.get_app_info([10, 20])
+    assert steam.fetched == [10]
+    assert info[10]["_change_number"] == 150
+    assert info[20]["_change_number"] == 100
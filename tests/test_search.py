@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from smd.search import SearchIndex, normalize
+
+APPS = [
+    (70, "Half-Life"),
+    (220, "Half-Life 2"),
+    (380, "Half-Life 2: Episode One"),
+    (292030, "The Witcher® 3: Wild Hunt"),
+    (1, "Pokémon Café"),
+    (10, "Counter-Strike"),
+]
+
+
+def test_normalize():
+    assert normalize("  Pokémon: Café ReMix!! ") == "pokemon cafe remix"
+
+
+def test_search_ranking():
+    index = SearchIndex.build(APPS)
+    assert [x.app_id for x in index.search("half life", 3)] == [70, 220, 380]
+    assert index.search("witcher 3")[0].app_id == 292030
+    assert index.search("pokemon")[0].app_id == 1
+    assert index.search("wtcher")[0].app_id == 292030  # typo
+    assert {x.app_id for x in index.search("c")} == {1, 10}
+    assert index.search("zzzz") == []
+
+
+def test_index_roundtrip(tmp_path: Path):
+    index = SearchIndex.build(APPS, "abc")
+    index.save(tmp_path / "index.bin")
+    loaded = SearchIndex.load(tmp_path / "index.bin")
+    assert loaded is not None
+    assert loaded.revision == "abc"
+    assert loaded.search("half life 2") == index.search("half life 2")
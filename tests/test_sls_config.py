@@ -0,0 +1,73 @@
+from pathlib import Path
+
+import pytest
+
+from smd.storage.sls_config import SLSConfig
+
+CONFIG = """# SLSsteam config
+DisableFamilyShareLock: yes
+AdditionalApps:
+  # games
+  - 10
+  - 20
+# Unlocks DLCs
+PlayNotOwnedGames: no
+"""
+
+
+def test_save_only_touches_additional_apps(tmp_path: Path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    config = SLSConfig(path)
+    assert config.add([20, 30]) == ([30], [20])
+    assert config.remove([10, 99]) == [10]
+    assert config.save()
+    assert path.read_text() == CONFIG.replace(
+        "AdditionalApps:\n  # games\n  - 10\n  - 20\n",
+        "AdditionalApps:\n  - 20\n  - 30\n",
+    )
+    assert not config.save()
+
+    config.add([40])
+    config.save()
+    assert SLSConfig(path).ids() == [20, 30, 40]
+
+
+def test_missing_and_flow_lists(tmp_path: Path):
+    path = tmp_path / "config.yaml"
+    path.write_text("PlayNotOwnedGames: no")
+    config = SLSConfig(path)
+    config.add([1])
+    config.save()
+    assert path.read_text() == "PlayNotOwnedGames: no\nAdditionalApps:\n- 1\n"
+
+    path.write_text("AdditionalApps: [1, 2] # inline\n")
+    assert 2 in config
+    config.remove([1])
+    config.save()
+    assert path.read_text() == "AdditionalApps: [2] # inline\n"
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        # Not a list, but the key after it has to stay on its own line
+        ("AdditionalApps:\n  a: 1\nX: 2\n", "AdditionalApps:\n- 30\nX: 2\n"),
+        (
+            "AdditionalApps:\n  a:\n    - 1\n# note\nX: 2\n",
+            "AdditionalApps:\n- 30\n# note\nX: 2\n",
+        ),
+        ("AdditionalApps:\nX: 2\n", "AdditionalApps:\n- 30\nX: 2\n"),
+        (
+            "AdditionalApps:\n  - 10\nX: 2\n",
+            "AdditionalApps:\n  - 10\n  - 30\nX: 2\n",
+        ),
+    ],
+)
+def test_key_after_additional_apps(tmp_path: Path, text: str, expected: str):
+    path = tmp_path / "config.yaml"
+    path.write_text(text)
+    config = SLSConfig(path)
+    config.add([30])
+    config.save()
+    assert path.read_text() == expected
@@ -0,0 +1,51 @@
+import pytest
+import vdf  # type: ignore
+
+from smd.storage import vdf_text
+
+TEXT = """\ufeff// made by Steam
+"AppState"
+{
+\t"appid"\t\t"10"
+\t"name"\t\t"Some \\"Game\\""
+\t"path"\t\t"C:\\\\Games"
+\tunquoted value
+\t"InstalledDepots"
+\t{
+\t\t"11" { "manifest" "123" }
+\t}
+\t"InstalledDepots"
+\t{
+\t\t"12"
+\t\t{
+\t\t\t"manifest"\t\t"456"
+\t\t}
+\t}
+\t"empty"\t\t""
+}
+"""
+
+
+@pytest.mark.parametrize("mapper", [dict, vdf.VDFDict])
+def test_same_as_vdf_package(mapper: type[dict]):  # type: ignore
+    # The vdf package wants braces on their own line
+    text = TEXT.replace('"11" { "manifest" "123" }', '"11"\n{\n"manifest" "123"\n}')
+    expected = vdf.loads(text, mapper=mapper)
+    parsed = vdf_text.loads(TEXT, mapper=mapper)
+    assert parsed == expected
+    assert vdf_text.dumps(parsed) == vdf.dumps(expected, pretty=True)
+
+
+def test_lazy():
+    parsed = vdf_text.loads(TEXT, lazy=True)
+    app_state = parsed["AppState"]
+    assert isinstance(app_state, vdf_text.LazyVDFDict)
+    assert dict.__len__(app_state["InstalledDepots"]) == 0
+    assert parsed == vdf_text.loads(TEXT)
+    assert sorted(app_state["InstalledDepots"]) == ["11", "12"]
+
+
+@pytest.mark.parametrize("text", ['"a" {', '"a" "b', '"a" }', "}", '"a"'])
+def test_syntax_errors(text: str):
+    with pytest.raises(SyntaxError):
+        vdf_text.loads(text)